@@ -29,6 +29,8 @@ main() {
 # Create app file using pyinstaller
 #################################################
 build() {
+    # Don't build if the launch options got slower (see scripts/check_startup.py)
+    python3 ./scripts/check_startup.py || exit 1
     # Remove existing build data
     rm -rf ./build/* ./dist/*
     pyinstaller --name 'GitWriting' \
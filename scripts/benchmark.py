@@ -0,0 +1,375 @@
+"""Times the backend operations behind GitWriting's menus on large synthetic repos, offline.
+    The repo (commits, deep folder trees, untracked files, stashes & branches) is generated
+    with 'git fast-import', deterministically, and can be kept between runs (--work-dir).
+    Prints the results as JSON, compared with a stored baseline (see --save-baseline).
+    Exits with 1 if an operation got slower than the baseline allows (--max-regression)."""
+import os
+import sys
+import json
+import random
+import platform
+import argparse
+import statistics
+import tempfile
+import subprocess
+import time
+
+SOURCE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+    os.pardir, "src", "gitwriting")
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+    "benchmark-baseline.json")
+RESULTS_VERSION = 1
+# The repo at scale 1 (see --scale)
+REPO_SIZE = {
+    "commits": 100_000,
+    "files": 50_000,
+    "untracked": 20_000,
+    "modified": 500,
+    "stashes": 200,
+    "branches": 100,
+}
+# Folders per file path, and files per leaf folder (50k files: 3,125 folders 8 levels deep)
+TREE_DEPTH = 8
+TREE_FAN_OUT = 8
+FILES_PER_FOLDER = 16
+PAGE_SIZE = 50
+DEFAULT_RUNS = 5
+# Slowest median allowed, relative to the baseline's
+DEFAULT_MAX_REGRESSION = 1.5
+# Slower by less than this isn't a regression (timer & scheduling noise)
+MIN_REGRESSION_MS = 1
+SEED = 20240101
+START_DATE = 1_600_000_000
+WORDS = ("the", "quiet", "river", "ran", "past", "old", "stone", "walls", "while", "we",
+    "wrote", "another", "chapter", "about", "light", "and", "memory", "in", "winter", "rain")
+
+def log(message):
+    """Prints progress (to stderr: stdout is for the results)"""
+    print(message, file=sys.stderr, flush=True)
+
+def get_repo_size(scale):
+    """Returns the repo size at a scale (at least 1 of everything)"""
+    return {name: max(1, int(count * scale)) for name, count in REPO_SIZE.items()}
+
+def get_file_path(i):
+    """Returns the path of tracked file i, in a tree TREE_DEPTH folders deep"""
+    folder = i // FILES_PER_FOLDER
+    parts = []
+    for _ in range(TREE_DEPTH):
+        folder, digit = divmod(folder, TREE_FAN_OUT)
+        parts.append(f"part{digit}")
+    return "/".join(reversed(parts)) + f"/note-{i}.md"
+
+def get_text(rng, title, lines=4):
+    """Returns a small, random markdown note"""
+    body = "\n".join(" ".join(rng.choice(WORDS) for _ in range(rng.randint(6, 14)))
+        for _ in range(lines))
+    return f"# {title}\n\n{body}\n"
+
+def git(repo, *args, **kwargs):
+    """Runs a Git command in repo (failing loudly). Returns its output."""
+    return subprocess.run(["git", *args], cwd=repo, check=True, stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE, text=True, **kwargs).stdout
+
+class FastImportStream:
+    """Writes a 'git fast-import' stream"""
+    def __init__(self, stdin):
+        self.stdin = stdin
+        self.marks = 0
+        self.date = START_DATE
+
+    def write(self, text):
+        """Writes raw stream text"""
+        self.stdin.write(text.encode("utf-8"))
+
+    def write_data(self, text):
+        """Writes a data block"""
+        data = text.encode("utf-8")
+        self.stdin.write(f"data {len(data)}\n".encode("utf-8") + data + b"\n")
+
+    def commit(self, ref, message, changes, parents=()):
+        """Writes a commit of {path: text} on ref (from parents' marks). Returns its mark."""
+        self.marks += 1
+        self.date += 600
+        self.write(f"commit {ref}\nmark :{self.marks}\n"
+            f"committer Bench <bench@example.com> {self.date} +0000\n")
+        self.write_data(message)
+        for i, parent in enumerate(parents):
+            self.write(f"{'from' if i == 0 else 'merge'} :{parent}\n")
+        for path, text in changes.items():
+            self.write(f"M 100644 inline {path}\n")
+            self.write_data(text)
+        return self.marks
+
+def generate_repo(repo, size):
+    """Generates the repo (history, branches & stashes, then the working tree changes)"""
+    rng = random.Random(SEED)
+    git(repo, "init", "-q", "-b", "master")
+    marks_path = os.path.join(repo, ".git", "bench-marks")
+    with subprocess.Popen(["git", "fast-import", "--quiet", "--force",
+            f"--export-marks={marks_path}"], cwd=repo, stdin=subprocess.PIPE) as proc:
+        stream = FastImportStream(proc.stdin)
+        # Every file in the first commit, then one or two edited (or added) files per commit
+        head = stream.commit("refs/heads/master", "Add the notes",
+            {get_file_path(i): get_text(rng, f"Note {i}") for i in range(size["files"])})
+        branch_every = max(1, size["commits"] // size["branches"])
+        for n in range(1, size["commits"]):
+            changes = {get_file_path(rng.randrange(size["files"])): get_text(rng, f"Rev {n}")
+                for _ in range(rng.randint(1, 2))}
+            head = stream.commit("refs/heads/master", f"Edit notes ({n})", changes, (head,))
+            if (n + 1) % branch_every == 0:
+                stream.write(f"reset refs/heads/branch-{(n + 1) // branch_every}\n"
+                    f"from :{head}\n\n")
+        # Stashes: an index commit, then the stash commit (parents: HEAD & the index commit)
+        stashes = []
+        for n in range(size["stashes"]):
+            path = get_file_path(rng.randrange(size["files"]))
+            index = stream.commit("refs/bench/stash-index", f"index on master: stash {n}",
+                {path: get_text(rng, f"Staged {n}")}, (head,))
+            stashes.append((stream.commit("refs/stash", f"On master: stash {n}",
+                {path: get_text(rng, f"Stashed {n}")}, (head, index)), n))
+        proc.stdin.close()
+    if proc.returncode:
+        raise RuntimeError(f"git fast-import failed with code {proc.returncode}")
+    git(repo, "update-ref", "-d", "refs/bench/stash-index")
+    with open(marks_path, encoding="utf-8") as f:
+        oids = dict(line.split() for line in f)
+    # 'git stash list' reads the stash reflog
+    previous = "0" * 40
+    with open(os.path.join(repo, ".git", "logs", "refs", "stash"), "w", encoding="utf-8") as f:
+        for mark, n in stashes:
+            oid = oids[f":{mark}"]
+            f.write(f"{previous} {oid} Bench <bench@example.com> {START_DATE + n} +0000\t"
+                f"On master: stash {n}\n")
+            previous = oid
+    git(repo, "reset", "-q", "--hard", "master")
+    # Uncommitted changes: modified files (half of them staged), then untracked files,
+    # half in one big folder and half spread across new folders
+    modified = [get_file_path(i) for i in rng.sample(range(size["files"]), size["modified"])]
+    for path in modified:
+        with open(os.path.join(repo, path), "a", encoding="utf-8") as f:
+            f.write(get_text(rng, "More"))
+    git(repo, "add", "--", *modified[:len(modified) // 2])
+    for i in range(size["untracked"]):
+        folder = "inbox" if i % 2 else f"drafts/{i % 97}/{i % 13}"
+        os.makedirs(os.path.join(repo, folder), exist_ok=True)
+        with open(os.path.join(repo, folder, f"draft-{i}.md"), "w", encoding="utf-8") as f:
+            f.write(get_text(rng, f"Draft {i}", lines=2))
+
+def get_repo(work_dir, scale):
+    """Returns the path of the repo at a scale, generating it unless it already exists"""
+    size = get_repo_size(scale)
+    repo = os.path.join(work_dir, f"repo-{scale:g}")
+    marker = os.path.join(repo, ".git", "bench-size.json")
+    try:
+        with open(marker, encoding="utf-8") as f:
+            if json.load(f) == size:
+                log(f"Reusing {repo}")
+                return repo, size
+    except (OSError, ValueError):
+        pass
+    if os.path.exists(repo):
+        raise SystemExit(f"'{repo}' exists but isn't a complete benchmark repo. "
+            "Delete it (or pick another --work-dir).")
+    os.makedirs(repo)
+    log(f"Generating {repo}: {size}")
+    start = time.perf_counter()
+    generate_repo(repo, size)
+    with open(marker, "w", encoding="utf-8") as f:
+        json.dump(size, f)
+    log(f"Generated in {time.perf_counter() - start:.1f} s")
+    return repo, size
+
+def measure(function, runs, setup=None):
+    """Times function (after setup, untimed) runs times. Returns its timings."""
+    timings = []
+    for _ in range(runs):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        function()
+        timings.append((time.perf_counter() - start) * 1000)
+    return {"median_ms": round(statistics.median(timings), 3),
+        "min_ms": round(min(timings), 3), "runs": runs}
+
+def run_benchmarks(repo, size, runs, home):
+    """Times each operation. Returns {name: timings}."""
+    # The app's config, history & caches go to home (read when the modules are imported)
+    os.environ["XDG_CONFIG_HOME"] = os.path.join(home, "config")
+    os.environ["XDG_CACHE_HOME"] = os.path.join(home, "cache")
+    config_dir = os.path.join(home, "config", "GitWriting")
+    os.makedirs(config_dir, exist_ok=True)
+    with open(os.path.join(config_dir, "gitwriting.ini"), "w", encoding="utf-8") as f:
+        f.write(f"[PATHS]\nworking_directory = {repo}\neditor = \n\n[FLAGS]\n"
+            "file_watcher = off\n")
+    sys.path.insert(0, os.path.abspath(SOURCE_DIR))
+    os.chdir(repo)
+    import commands
+    import file_utils
+    import git_workers
+    import history
+    from commit_cursor import CommitCursor
+    from commit_index import CommitIndex
+    from config import get_app_config
+
+    pools = []
+    def fresh():
+        """Returns a GitCommand with nothing cached (no snapshot, memoized output nor loaded
+            commit index)"""
+        commands.GitCommand.invalidate()
+        for commit_index in commands.GitCommand._commit_indexes.values():
+            commit_index.close()
+        commands.GitCommand._commit_indexes.clear()
+        pools.append(git_workers.GitWorkerPool())
+        return commands.GitCommand(backend=pools[-1])
+
+    git_cmd = fresh()
+    deep_page = size["commits"] // 2
+    results = {}
+    def bench(name, function, setup=None, times=runs):
+        log(f"  {name}")
+        results[name] = measure(function, times, setup)
+
+    bench("get_changes", lambda: fresh().get_changes())
+    bench("get_changes (cached)", git_cmd.get_changes, setup=git_cmd.get_changes)
+    bench("get_changes (names, with stats)",
+        lambda: fresh().get_changes(names_only=True, with_stats=True))
+    bench("get_stashes", lambda: fresh().get_stashes())
+    bench("get_branches", lambda: fresh().get_branches())
+    bench("get_commits (first page)", lambda: fresh().get_commits(limit=PAGE_SIZE))
+    bench(f"get_commits (page at {deep_page:,})",
+        lambda: fresh().get_commits(index=deep_page, limit=PAGE_SIZE))
+    def read_cursor_pages():
+        cursor = CommitCursor()
+        for index in range(0, 10 * PAGE_SIZE, PAGE_SIZE):
+            cursor.get_commits(index=index, limit=PAGE_SIZE)
+        cursor.close()
+    bench("commit cursor (10 pages)", read_cursor_pages)
+    def build_commit_index():
+        commit_index = CommitIndex(git_cmd, repo, "master")
+        commit_index.update()
+        commit_index.close()
+    # A new (empty) cache folder per build
+    new_cache = lambda: os.environ.update(XDG_CACHE_HOME=tempfile.mkdtemp(dir=home))
+    bench("commit index (first build)", build_commit_index, setup=new_cache)
+    commit_index = git_cmd.get_commit_index()
+    bench(f"commit index (page at {deep_page:,})",
+        lambda: commit_index.get_commits(index=deep_page, limit=PAGE_SIZE))
+    # 'git rev-list --count', then the count of the (loaded) commit index
+    bench("get_total_commits", lambda: fresh().get_total_commits())
+    bench("get_total_commits (commit index)", git_cmd.get_total_commits,
+        setup=git_cmd.get_commit_index)
+    history_path = os.path.join(home, "history.json")
+    def clear_history():
+        for path in (history_path, f"{history_path}.log"):
+            if os.path.exists(path):
+                os.remove(path)
+    def add_to_history():
+        store = history.HistoryStore(history_path, f"{history_path}.log")
+        for i in range(1000):
+            store.add(os.path.join(repo, get_file_path(i % size["files"])))
+    bench("history.add (1,000 files)", add_to_history, setup=clear_history)
+    app_cfg = get_app_config(quiet=True)
+    app_cfg.read()
+    def set_values():
+        for i in range(200):
+            app_cfg.set_value("PATHS", "editor", f"editor-{i}")
+    bench("Config.set_value (200 values)", set_values)
+    inbox = os.path.join(repo, "inbox")
+    bench(f"directory listing ({size['untracked'] // 2:,} entries)",
+        lambda: list(file_utils.DirectoryListing(inbox).get_names()))
+    bench("directory listing (cached)",
+        lambda: list(file_utils.get_directory_listing(inbox).get_names()),
+        setup=lambda: file_utils.get_directory_listing(inbox))
+    deep_folders = [os.path.join(repo, *os.path.dirname(get_file_path(0)).split("/")[:depth])
+        for depth in range(TREE_DEPTH + 1)]
+    bench(f"directory listing ({TREE_DEPTH} levels down)",
+        lambda: [list(file_utils.DirectoryListing(folder).get_names())
+            for folder in deep_folders])
+    for pool in pools:
+        pool.close()
+    return results
+
+def compare(results, baseline, max_regression):
+    """Returns the comparison of the results with a baseline (None: no baseline)"""
+    if baseline is None:
+        return None
+    benchmarks = {}
+    regressions = []
+    for name, timings in results["results"].items():
+        base = baseline["results"].get(name)
+        if base is None or not base["median_ms"]:
+            continue
+        ratio = round(timings["median_ms"] / base["median_ms"], 3)
+        benchmarks[name] = {"baseline_ms": base["median_ms"],
+            "median_ms": timings["median_ms"], "ratio": ratio}
+        if ratio > max_regression and timings["median_ms"] - base["median_ms"] > MIN_REGRESSION_MS:
+            regressions.append(name)
+    return {"max_regression": max_regression, "benchmarks": benchmarks,
+        "regressions": regressions}
+
+def load_baseline(path, size):
+    """Returns the baseline's results (None if missing, or measured on another repo size)"""
+    try:
+        with open(path, encoding="utf-8") as f:
+            baseline = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if baseline.get("version") != RESULTS_VERSION or baseline.get("repo") != size:
+        log(f"Not comparing with '{path}': measured on another repo size (see --scale)")
+        return None
+    return baseline
+
+def main():
+    """Generates the repo (if needed) & runs the benchmarks. Returns the exit code."""
+    parser = argparse.ArgumentParser(description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", type=float, default=1.0,
+        help="repo size, relative to 100k commits & 50k files (default: 1)")
+    parser.add_argument("--runs", type=int, default=DEFAULT_RUNS,
+        help=f"runs per operation, the median is compared (default: {DEFAULT_RUNS})")
+    parser.add_argument("--work-dir",
+        help="where the generated repos are kept between runs (default: a temporary folder)")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE,
+        help="the results to compare with (default: scripts/benchmark-baseline.json)")
+    parser.add_argument("--save-baseline", action="store_true",
+        help="store the results as the baseline")
+    parser.add_argument("--max-regression", type=float, default=DEFAULT_MAX_REGRESSION,
+        help="fail if a median exceeds the baseline's by this factor "
+            f"(default: {DEFAULT_MAX_REGRESSION:g})")
+    parser.add_argument("--output", help="write the results to a file (default: stdout)")
+    args = parser.parse_args()
+    size = get_repo_size(args.scale)
+    with tempfile.TemporaryDirectory() as temp_dir:
+        work_dir = os.path.abspath(args.work_dir or temp_dir)
+        repo, size = get_repo(work_dir, args.scale)
+        log("Running the benchmarks:")
+        timings = run_benchmarks(repo, size, args.runs, os.path.join(temp_dir, "home"))
+        os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    git_version = subprocess.run(["git", "--version"], stdout=subprocess.PIPE, text=True,
+        check=False).stdout.strip()
+    results = {"version": RESULTS_VERSION, "repo": size, "environment": {
+        "python": platform.python_version(), "git": git_version, "platform": platform.platform()},
+        "results": timings}
+    results["comparison"] = compare(results, load_baseline(args.baseline, size),
+        args.max_regression)
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    if args.save_baseline:
+        baseline = {key: value for key, value in results.items() if key != "comparison"}
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(baseline, f, indent=2)
+            f.write("\n")
+        log(f"Saved the baseline to '{args.baseline}'")
+    comparison = results["comparison"]
+    if comparison and comparison["regressions"]:
+        log(f"Slower than the baseline: {', '.join(comparison['regressions'])}")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,91 @@
+"""Checks the startup cost of GitWriting's fast launch options (run before building the app).
+    Fails if a launch option imports a module it shouldn't need (e.g. curses for --version),
+    or if its imports take longer than the budget."""
+import os
+import sys
+import argparse
+import tempfile
+import subprocess
+
+MAIN_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+    os.pardir, "src", "gitwriting", "main.py")
+# Never needed before the TUI starts
+TUI_MODULES = ("_curses", "curses", "picker", "pickers", "menus", "sqlite3")
+# Launch option => modules it must not import
+FAST_PATHS = {
+    "-v": TUI_MODULES + ("readchar", "config", "commands", "prompts"),
+    "-h": TUI_MODULES + ("readchar", "config", "commands", "prompts"),
+    "-c": TUI_MODULES + ("commands",),
+}
+# Import time allowed per launch option, on top of the interpreter's own imports
+DEFAULT_BUDGET_MS = 50
+# The fastest of these runs is kept (the others are mostly noise)
+DEFAULT_RUNS = 5
+
+def get_imports(args, env):
+    """Runs Python with -X importtime. Returns (module => cumulative time in us
+        for the top-level imports, every imported module name, stderr)"""
+    result = subprocess.run([sys.executable, "-X", "importtime", *args], env=env,
+        stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+        text=True, check=False)
+    top_level = {}
+    modules = set()
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        modules.add(name.strip())
+        if not name.startswith("  "):
+            top_level[name.strip()] = int(cumulative)
+    return top_level, modules, result.stderr
+
+def measure(option, runs, env):
+    """Returns (the import time of a launch option in ms, its imported modules, its errors)"""
+    best = None
+    modules = set()
+    errors = ""
+    for _ in range(runs):
+        baseline, _, _ = get_imports(["-c", "pass"], env)
+        top_level, modules, stderr = get_imports([MAIN_PATH, option], env)
+        if "Traceback" in stderr:
+            errors = stderr[stderr.index("Traceback"):]
+        total = sum(us for name, us in top_level.items() if name not in baseline) / 1000
+        best = total if best is None else min(best, total)
+    return best, modules, errors
+
+def main():
+    """Checks every fast launch option. Returns the exit code."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS,
+        help=f"import time allowed per launch option (default: {DEFAULT_BUDGET_MS})")
+    parser.add_argument("--runs", type=int, default=DEFAULT_RUNS,
+        help=f"runs per launch option (default: {DEFAULT_RUNS})")
+    args = parser.parse_args()
+    failed = False
+    with tempfile.TemporaryDirectory() as config_home:
+        # Give '-c' a config to show (instead of prompting to create one)
+        config_dir = os.path.join(config_home, "GitWriting")
+        os.makedirs(config_dir)
+        with open(os.path.join(config_dir, "gitwriting.ini"), "w", encoding="utf-8") as f:
+            f.write(f"[PATHS]\nworking_directory = {config_home}\n")
+        env = dict(os.environ, XDG_CONFIG_HOME=config_home)
+        for option, forbidden in FAST_PATHS.items():
+            total, modules, errors = measure(option, args.runs, env)
+            problems = []
+            if errors:
+                problems.append(f"crashed:\n{errors}")
+            unexpected = sorted(modules.intersection(forbidden))
+            if unexpected:
+                problems.append(f"imports {', '.join(unexpected)}")
+            if total > args.budget_ms:
+                problems.append(f"over the {args.budget_ms:g} ms budget")
+            print(f"{option}: {total:.1f} ms" + (f" ({'; '.join(problems)})" if problems else ""))
+            failed = failed or bool(problems)
+    if failed:
+        print("Startup check failed.")
+        return 1
+    print("Startup check passed.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,20 +2,22 @@
 import os
 import sys
 import time
-from readchar import readkey
-import appdirs
+import hashlib
 
 APP_NAME = "GitWriting"
 VERSION = "0.8.8"
 PROJECT_URL = "https://github.com/tmscott88/GitWriting"
 
 def clear(delay=0):
-    """Clears the console. Recommended for ue when """
+    """Clears the console (and its scrollback), optionally waiting for delay seconds afterwards"""
     if platform_is_windows():
         os.system('cls')
     elif platform_is_unix():
-        os.system('clear')
-    time.sleep(delay)
+        # Same as the 'clear' command, without spawning it: home, erase screen, erase scrollback
+        sys.stdout.write("\033[H\033[2J\033[3J")
+        sys.stdout.flush()
+    if delay:
+        time.sleep(delay)
 
 def change_working_directory(new_directory):
     """Change the working directory using os.chdir()."""
@@ -42,11 +44,27 @@ def get_system_app(app_type):
         case _:
             print_error(f"App type '{app_type}' is not supported.")
 
+def readkey():
+    """Reads one key press (readchar is only imported when a key is first needed)"""
+    import readchar
+    return readchar.readkey()
+
 def get_user_config_resource_path(fname):
     """Returns the absolute path to a user config resource, if it exists"""
+    import appdirs
     return os.path.join(
         appdirs.user_config_dir(appname=APP_NAME, appauthor=False), fname)
 
+def get_user_cache_resource_path(fname, repo_root=None):
+    """Returns the absolute path to a user cache resource.
+        If repo_root is given, the resource is stored in a folder specific to that repo."""
+    import appdirs
+    cache_dir = appdirs.user_cache_dir(appname=APP_NAME, appauthor=False)
+    if repo_root:
+        digest = hashlib.sha1(os.path.normcase(repo_root).encode("utf-8")).hexdigest()[:16]
+        cache_dir = os.path.join(cache_dir, "repos", digest)
+    return os.path.join(cache_dir, fname)
+
 def get_python_resource_path(relative_path):
     """Returns the absolute path to a resource (if the resource exists in the app data)
         Works for dev and for PyInstaller.
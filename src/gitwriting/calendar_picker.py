@@ -0,0 +1,122 @@
+"""A curses month calendar to pick a day, marking the days that have a daily note"""
+import curses
+import calendar
+from datetime import date, timedelta
+from picker import KEYS_UP, KEYS_DOWN, KEYS_LEFT, KEYS_RIGHT, KEY_ESC, CONFIRM_KEYS
+
+KEYS_QUIT = (KEY_ESC, ord("q"))
+KEYS_PREVIOUS_MONTH = (curses.KEY_PPAGE, ord("["))
+KEYS_NEXT_MONTH = (curses.KEY_NPAGE, ord("]"))
+KEYS_PREVIOUS_NOTE = (ord("p"),)
+KEYS_NEXT_NOTE = (ord("n"),)
+KEYS_TODAY = (ord("t"),)
+HELP = ("(esc|q - quit, enter - open, arrows|wasd - day/week, [/] - month, "
+    "p/n - prev/next note, t - today)")
+CELL_WIDTH = 5
+
+class CalendarPicker:
+    """Pick a day from a month calendar. notes: {date: (path, size)} (see DailyNotesIndex)."""
+    def __init__(self, notes, title="[Daily Notes]", selected=None):
+        self.notes = notes
+        self.title = title
+        self.selected = selected or date.today()
+        self._note_days = sorted(notes)
+
+    def show(self):
+        """Shows the calendar. Returns the picked day, or None if quit."""
+        return curses.wrapper(self.__run)
+
+    def __move_to_note(self, step):
+        """Selects the previous (step -1) or next (step 1) day with a note, if any"""
+        candidates = [day for day in self._note_days
+            if (day < self.selected if step < 0 else day > self.selected)]
+        if candidates:
+            self.selected = candidates[-1] if step < 0 else candidates[0]
+
+    def __move_months(self, months):
+        """Selects the same day (or the month's last) a number of months away"""
+        month_index = self.selected.year * 12 + self.selected.month - 1 + months
+        year, month = divmod(month_index, 12)
+        if not date.min.year <= year <= date.max.year:
+            return
+        last_day = calendar.monthrange(year, month + 1)[1]
+        self.selected = date(year, month + 1, min(self.selected.day, last_day))
+
+    def handle_key(self, key):
+        """Applies one key press. Returns False to quit."""
+        try:
+            if key in KEYS_LEFT:
+                self.selected -= timedelta(days=1)
+            elif key in KEYS_RIGHT:
+                self.selected += timedelta(days=1)
+            elif key in KEYS_UP:
+                self.selected -= timedelta(weeks=1)
+            elif key in KEYS_DOWN:
+                self.selected += timedelta(weeks=1)
+            elif key in KEYS_PREVIOUS_MONTH:
+                self.__move_months(-1)
+            elif key in KEYS_NEXT_MONTH:
+                self.__move_months(1)
+            elif key in KEYS_PREVIOUS_NOTE:
+                self.__move_to_note(-1)
+            elif key in KEYS_NEXT_NOTE:
+                self.__move_to_note(1)
+            elif key in KEYS_TODAY:
+                self.selected = date.today()
+        except OverflowError:
+            pass
+        return key not in KEYS_QUIT
+
+    def draw(self, screen):
+        """Draws the selected day's month: days with a note are bold and marked with '*'"""
+        max_y, max_x = screen.getmaxyx()
+        screen.erase()
+        screen.addnstr(0, 0, self.title, max_x - 1)
+        screen.addnstr(2, 0, f"{self.selected:%B %Y}".center(CELL_WIDTH * 7), max_x - 1,
+            curses.A_BOLD)
+        header = "".join(f"{name:>{CELL_WIDTH - 1}} " for name in calendar.day_abbr)
+        screen.addnstr(3, 0, header, max_x - 1)
+        weeks = calendar.Calendar().monthdayscalendar(self.selected.year, self.selected.month)
+        today = date.today()
+        for row, week in enumerate(weeks):
+            for column, day_number in enumerate(week):
+                if not day_number:
+                    continue
+                day = self.selected.replace(day=day_number)
+                has_note = day in self.notes
+                text = f"{'*' if has_note else ' '}{day_number:>2}{'.' if day == today else ' '}"
+                attribute = curses.A_BOLD if has_note else curses.A_NORMAL
+                if day == self.selected:
+                    attribute |= curses.A_REVERSE
+                screen.addnstr(4 + row, column * CELL_WIDTH, text, max_x - 1 - column * CELL_WIDTH,
+                    attribute)
+        note = self.notes.get(self.selected)
+        month_notes = sum(1 for day in self._note_days
+            if (day.year, day.month) == (self.selected.year, self.selected.month))
+        status = (f"{self.selected:%a %Y-%m-%d}: " + (f"{note[1]:,} bytes" if note else "no note")
+            + f" ({month_notes} note{'' if month_notes == 1 else 's'} this month, "
+            f"{len(self._note_days)} in total)")
+        screen.addnstr(5 + len(weeks), 0, status, max_x - 1)
+        screen.addnstr(7 + len(weeks), 0, HELP, max_x - 1)
+        screen.refresh()
+
+    def __run(self, screen):
+        """The curses loop. Returns the picked day, or None."""
+        try:
+            curses.use_default_colors()
+            curses.curs_set(0)
+            if hasattr(curses, "set_escdelay"):
+                curses.set_escdelay(25)
+        except curses.error:
+            pass
+        while True:
+            try:
+                self.draw(screen)
+            except curses.error:
+                # Terminal too small
+                pass
+            key = screen.getch()
+            if key in CONFIRM_KEYS:
+                return self.selected
+            if not self.handle_key(key):
+                return None
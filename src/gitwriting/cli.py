@@ -0,0 +1,269 @@
+"""Non-interactive commands (e.g. 'gitwriting status --json'), for scripts, hooks & cron jobs.
+    They skip the splash, the menus and curses entirely."""
+import os
+import sys
+import json
+import argparse
+import app_utils as app
+import history
+from commands import get_git_command, get_app_command
+from config import get_app_config
+
+DEFAULT_LOG_LIMIT = 20
+DEFAULT_RECENT_LIMIT = 20
+
+def __print_error(message):
+    """Prints an error on stderr (stdout may be parsed by the caller)"""
+    print(f"\u274C {message}", file=sys.stderr)
+
+def __print_json(data):
+    """Prints data as JSON on stdout"""
+    json.dump(data, sys.stdout, indent=2)
+    print()
+
+def __read_config():
+    """Returns the app config, or None (with an error) if there is no valid config file"""
+    app_cfg = get_app_config(quiet=True)
+    try:
+        app_cfg.read()
+    except (OSError, ValueError) as e:
+        __print_error(f"Could not read the config file ({e}). "
+            f"Run '{app.APP_NAME} -c' to create one.")
+        return None
+    return app_cfg
+
+def __apply_history_capacity():
+    """Applies the configured history capacity, if there is a config file"""
+    app_cfg = get_app_config(quiet=True)
+    try:
+        app_cfg.read()
+        history.set_capacity(app_cfg.get_history_capacity())
+    except (OSError, ValueError):
+        pass
+
+def __enter_repo():
+    """Moves to the Git repo to work on: the one containing the current directory,
+        otherwise the configured working directory's. Returns the repo root (None if not found)."""
+    git_cmd = get_git_command()
+    root = git_cmd.get_repo_root()
+    if root is None:
+        app_cfg = get_app_config(quiet=True)
+        try:
+            app_cfg.read()
+            working_dir = app_cfg.get_default_working_directory()
+            if working_dir and os.path.isdir(working_dir):
+                os.chdir(working_dir)
+                root = git_cmd.get_repo_root()
+        except (OSError, ValueError):
+            pass
+    if root is None:
+        __print_error("Not in a Git repo (nor is the configured working directory).")
+        return None
+    os.chdir(root)
+    return root
+
+def __status(args):
+    """Prints the repo's branch & changes"""
+    if __enter_repo() is None:
+        return 1
+    snapshot = get_git_command().get_snapshot()
+    if snapshot is None:
+        __print_error("Could not get the repo status.")
+        return 1
+    if args.json:
+        __print_json(snapshot.to_dict())
+    else:
+        print(f"## {snapshot.branch or '(detached)'}")
+        for line in snapshot.get_short_status():
+            print(line)
+    return 0
+
+def __log(args):
+    """Prints the latest commits"""
+    if __enter_repo() is None:
+        return 1
+    git_cmd = get_git_command()
+    entries = git_cmd.get_log_entries(limit=args.limit) if git_cmd.has_commits() else []
+    if entries is None:
+        __print_error("Could not get the commit history.")
+        return 1
+    if args.json:
+        __print_json([{"hash": commit_hash, "author": author, "date": date, "subject": subject}
+            for commit_hash, author, date, subject in entries])
+    else:
+        for commit_hash, _, _, subject in entries:
+            print(f"{commit_hash[:7]} {subject}")
+    return 0
+
+def __commit(args):
+    """Commits the staged changes (or every change, with --all)"""
+    if __enter_repo() is None:
+        return 1
+    git_cmd = get_git_command()
+    if args.all and not git_cmd.run(["git", "add", "-A"]):
+        __print_error("Could not stage the changes.")
+        return 1
+    return 0 if git_cmd.commit_changes(args.message) else 1
+
+def __stash(args):
+    """Stashes the changes, or pops a stash"""
+    if __enter_repo() is None:
+        return 1
+    git_cmd = get_git_command()
+    if args.operation == "push":
+        if args.staged:
+            is_success = git_cmd.stash_staged_changes(args.message)
+        else:
+            is_success = git_cmd.stash_all_changes(args.message)
+    else:
+        if not git_cmd.get_stashes():
+            __print_error("No stashes to pop.")
+            return 1
+        is_success = git_cmd.existing_stash_operation("pop", args.stash)
+    return 0 if is_success else 1
+
+def __daily_note(args):
+    """Creates today's note if needed, then prints its path or opens it in the editor"""
+    app_cfg = __read_config()
+    if app_cfg is None:
+        return 1
+    if not app_cfg.is_daily_notes_enabled():
+        __print_error("Daily Notes disabled. See Main Menu -> Settings to enable this feature.")
+        return 1
+    fpath = app_cfg.get_today_note_path()
+    if not os.path.isfile(fpath):
+        try:
+            os.makedirs(os.path.dirname(fpath), exist_ok=True)
+            with open(fpath, 'a', encoding="utf-8"):
+                pass
+        except OSError as e:
+            __print_error(f"Failed to create file '{fpath}'. {e}")
+            return 1
+    if args.print_path:
+        print(fpath)
+        return 0
+    editor = app_cfg.get_app("editor")
+    if not editor:
+        __print_error("No editor configured.")
+        return 1
+    get_app_command().open_editor(editor, fpath)
+    return 0
+
+def __recent(args):
+    """Prints the recent files, most relevant first"""
+    __apply_history_capacity()
+    files = history.read(reverse_for_display=True, limit=args.limit)
+    if args.json:
+        __print_json(files)
+    else:
+        for fpath in files:
+            print(fpath)
+    return 0
+
+def __workspace(args):
+    """Runs an operation on every workspace repo, printing each result as soon as it's ready"""
+    import workspace
+    app_cfg = __read_config()
+    if app_cfg is None:
+        return 1
+    repos = app_cfg.get_workspace_repos()
+    if not repos:
+        __print_error("No repos in the workspace. Add some from Main Menu -> Workspace.")
+        return 1
+    failures = 0
+    for result in workspace.Workspace(repos, app_cfg.get_workspace_jobs()).run(args.operation):
+        if not result.is_success:
+            failures += 1
+        if args.json:
+            # One JSON object per line, as the results come in
+            print(json.dumps(result.to_dict()), flush=True)
+        else:
+            print(f"{'ok' if result.is_success else 'failed'}\t{result.path}\t"
+                f"{result.get_summary()}", flush=True)
+    return 1 if failures else 0
+
+def __words(args):
+    """Prints the words written (net) per commit, or per file with --files"""
+    if __enter_repo() is None:
+        return 1
+    git_cmd = get_git_command()
+    word_history = git_cmd.get_word_history() if git_cmd.has_commits() else None
+    if word_history is None:
+        __print_error("Could not read the word history.")
+        return 1
+    if args.files:
+        files = word_history.get_file_deltas(limit=args.limit)
+        if args.json:
+            __print_json([{"path": path, "words": words} for path, words in files])
+        else:
+            for path, words in files:
+                print(f"{words:+}\t{path}")
+        return 0
+    commits = word_history.get_commit_deltas(limit=args.limit)
+    if args.json:
+        __print_json([{"hash": commit_hash, "date": date, "subject": subject, "words": words}
+            for commit_hash, date, subject, words in commits])
+    else:
+        for commit_hash, _, subject, words in commits:
+            print(f"{commit_hash[:7]} {words:+}\t{subject}")
+    return 0
+
+def __get_parser():
+    """Returns the argument parser of every command"""
+    parser = argparse.ArgumentParser(prog=app.APP_NAME.lower(),
+        description="Run a GitWriting command without the menus.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    status = commands.add_parser("status", help="show the branch and changes")
+    status.add_argument("--json", action="store_true", help="print as JSON")
+    status.set_defaults(handler=__status)
+
+    log = commands.add_parser("log", help="show the latest commits")
+    log.add_argument("--limit", type=int, default=DEFAULT_LOG_LIMIT,
+        help=f"number of commits (default: {DEFAULT_LOG_LIMIT})")
+    log.add_argument("--json", action="store_true", help="print as JSON")
+    log.set_defaults(handler=__log)
+
+    commit = commands.add_parser("commit", help="commit the staged changes")
+    commit.add_argument("-m", "--message", required=True, help="commit message")
+    commit.add_argument("-a", "--all", action="store_true", help="stage every change first")
+    commit.set_defaults(handler=__commit)
+
+    stash = commands.add_parser("stash", help="stash the changes or pop a stash")
+    operations = stash.add_subparsers(dest="operation", required=True)
+    push = operations.add_parser("push", help="stash every change (including untracked files)")
+    push.add_argument("-m", "--message", default=f"{app.APP_NAME} stash", help="stash message")
+    push.add_argument("--staged", action="store_true", help="only stash the staged changes")
+    pop = operations.add_parser("pop", help="apply and drop a stash")
+    pop.add_argument("stash", nargs="?", default="stash@{0}", help="stash (default: the latest)")
+    stash.set_defaults(handler=__stash)
+
+    daily_note = commands.add_parser("daily-note", help="open today's note (created if needed)")
+    daily_note.add_argument("--print-path", action="store_true",
+        help="print the note's path instead of opening it")
+    daily_note.set_defaults(handler=__daily_note)
+
+    recent = commands.add_parser("recent", help="show the recent files")
+    recent.add_argument("--limit", type=int, default=DEFAULT_RECENT_LIMIT,
+        help=f"number of files (default: {DEFAULT_RECENT_LIMIT})")
+    recent.add_argument("--json", action="store_true", help="print as JSON")
+    recent.set_defaults(handler=__recent)
+
+    workspace = commands.add_parser("workspace", help="status, fetch or pull every workspace repo")
+    workspace.add_argument("operation", choices=("status", "fetch", "pull"))
+    workspace.add_argument("--json", action="store_true",
+        help="print one JSON object per repo (per line)")
+    workspace.set_defaults(handler=__workspace)
+
+    words = commands.add_parser("words", help="show the words written per commit (or file)")
+    words.add_argument("--files", action="store_true", help="total the words per file instead")
+    words.add_argument("--limit", type=int, default=DEFAULT_LOG_LIMIT,
+        help=f"number of commits or files (default: {DEFAULT_LOG_LIMIT}, -1 for all)")
+    words.add_argument("--json", action="store_true", help="print as JSON")
+    words.set_defaults(handler=__words)
+    return parser
+
+def run(argv):
+    """Runs the command given by argv (e.g. ['log', '--limit', '5']). Returns the exit code."""
+    args = __get_parser().parse_args(argv)
+    return args.handler(args)
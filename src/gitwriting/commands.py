@@ -1,46 +1,340 @@
-"""Contains subprocess functions and classes to hold Git & App-specific commands"""
+"""Contains subprocess functions and classes to hold Git & App-specific commands.
+    Every command goes through execute(), which returns a CommandResult, except the processes
+    read (or stopped) while they run, which use subprocess.Popen directly:
+    the diff viewer (diff_viewer), the diff stats (diff_stats), the commit cursor
+    (commit_cursor), the commit index & word history logs (commit_index, word_history),
+    the cat-file workers (git_workers) and the background fetch (fetch_scheduler)."""
 import os
+import shlex
+import signal
 import subprocess
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import List, Optional
 import app_utils as app
+import diff_stats
+import fetch_scheduler
+import git_workers
 import history
+import tracing
+from repo_snapshot import RepoSnapshot, STATUS_COMMAND
+
+# Seconds before a command is stopped, by kind (None: no limit, e.g. an editor)
+QUERY_TIMEOUT = 60
+NETWORK_TIMEOUT = 600
+# Seconds a stopped command gets to exit before it is killed
+STOP_GRACE_PERIOD = 2
+# Exit codes of a command interrupted by Ctrl-C (by the signal, or through a shell)
+INTERRUPTED_CODES = (-signal.SIGINT, 128 + signal.SIGINT)
+
+@dataclass
+class CommandResult:
+    """The outcome of a command run by execute()"""
+    argv: List[str]
+    # None if the command didn't start or didn't finish (timed out or cancelled)
+    returncode: Optional[int] = None
+    # The captured output (empty if the output went to the terminal)
+    stdout: bytes = b""
+    stderr: str = ""
+    # Seconds from start to exit
+    duration: float = 0.0
+    timeout: Optional[float] = None
+    is_timed_out: bool = False
+    is_cancelled: bool = False
+    # Why the command couldn't start (e.g. not found)
+    error: Optional[str] = None
+
+    def is_success(self):
+        """Returns whether the command ran and exited with code 0"""
+        return self.returncode == 0
+
+    def get_text(self):
+        """Returns the captured output as text"""
+        return self.stdout.decode("utf-8", errors="surrogateescape")
+
+    def get_lines(self):
+        """Returns the captured output as text lines"""
+        return self.get_text().splitlines()
+
+    def get_error_message(self):
+        """Returns why the command failed, for the user"""
+        name = " ".join(self.argv[:2])
+        if self.error:
+            return self.error
+        if self.is_timed_out:
+            return f"'{name}' timed out after {self.timeout}s."
+        if self.is_cancelled:
+            return f"'{name}' was cancelled."
+        return git_workers.get_error_message(self.stderr,
+            f"'{name}' exited with code {self.returncode}.")
+
+
+@contextmanager
+def __leave_interrupts_to_command():
+    """Ignores Ctrl-C while an interactive command runs (the command handles it by itself)"""
+    if threading.current_thread() is not threading.main_thread():
+        yield
+        return
+    previous = signal.signal(signal.SIGINT, signal.SIG_IGN)
+    try:
+        yield
+    finally:
+        signal.signal(signal.SIGINT, previous)
+
+def __stop(process):
+    """Stops a command (terminated, then killed if it doesn't exit in time)"""
+    process.terminate()
+    try:
+        process.wait(timeout=STOP_GRACE_PERIOD)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+    # Not reading the rest: a child of the command (e.g. git's ssh) may still hold the pipes
+    for pipe in (process.stdout, process.stderr):
+        if pipe is not None:
+            pipe.close()
+
+def __stream(process, on_output, timeout):
+    """Passes each chunk of stdout to on_output as it arrives. Returns (stdout, stderr)."""
+    stderr = []
+    reader = threading.Thread(target=lambda: stderr.append(process.stderr.read()), daemon=True)
+    reader.start()
+    expired = threading.Event()
+    def expire():
+        expired.set()
+        process.kill()
+    timer = threading.Timer(timeout, expire) if timeout else None
+    if timer is not None:
+        timer.start()
+    chunks = []
+    try:
+        while True:
+            chunk = process.stdout.read1(64 * 1024)
+            if not chunk:
+                break
+            chunks.append(chunk)
+            on_output(chunk)
+        process.wait()
+        reader.join()
+    finally:
+        if timer is not None:
+            timer.cancel()
+    if expired.is_set():
+        raise subprocess.TimeoutExpired(process.args, timeout)
+    return b"".join(chunks), b"".join(stderr)
+
+def execute(argv, capture=True, timeout=None, on_output=None, cwd=None, env=None,
+        is_shell=False):
+    """Runs a command (an argument list, never split or parsed by a shell unless is_shell)
+        and returns its CommandResult. Never raises, even on Ctrl-C.
+        capture: collect stdout (bytes) & stderr. Otherwise the command uses the terminal
+            (interactive): Ctrl-C is left to the command, then the app carries on.
+        timeout: seconds before the command is stopped (None: no limit).
+        on_output: called with each chunk of stdout as it arrives (when capturing)."""
+    result = CommandResult(list(argv), timeout=timeout)
+    start = time.perf_counter()
+    pipe = subprocess.PIPE if capture else None
+    try:
+        process = subprocess.Popen(result.argv, cwd=cwd, env=env, shell=is_shell,
+            stdin=subprocess.DEVNULL if capture else None, stdout=pipe, stderr=pipe)
+    except OSError as e:
+        result.error = f"Could not run '{result.argv[0]}'. {e}"
+        return result
+    try:
+        if not capture:
+            with __leave_interrupts_to_command():
+                process.wait(timeout=timeout)
+            result.is_cancelled = process.returncode in INTERRUPTED_CODES
+        elif on_output is None:
+            result.stdout, stderr = process.communicate(timeout=timeout)
+            result.stderr = stderr.decode("utf-8", errors="replace")
+        else:
+            result.stdout, stderr = __stream(process, on_output, timeout)
+            result.stderr = stderr.decode("utf-8", errors="replace")
+        if not result.is_cancelled:
+            result.returncode = process.returncode
+    except subprocess.TimeoutExpired:
+        result.is_timed_out = True
+        __stop(process)
+    except KeyboardInterrupt:
+        result.is_cancelled = True
+        __stop(process)
+    finally:
+        result.duration = time.perf_counter() - start
+    return result
+
 
 class Command:
     """Base class for the commands module.
-        Simply used to run commands or get command output using subprocess"""
-    def __init__(self, quiet=True):
+        Runs commands (argument lists) through execute().
+        An optional backend (see git_workers.GitWorkerPool) can serve read-only queries."""
+    def __init__(self, quiet=True, backend=None):
         self.quiet = quiet
-
-    def run(self, command, has_input_message=False, is_shell=False):
-        """Execute a command. If has_input_message is True,
-            you MUST pass the command as an array with explicit arguments
-            (e.g. ['git', 'commit', '-m', f"{message}"])
-            """
-        try:
-            if has_input_message:
-                subprocess.run(command, text=True, check=True, shell=is_shell)
-            else:
-                subprocess.run(command.split(), text=True, check=True, shell=is_shell)
-        except subprocess.CalledProcessError as e:
+        self.backend = backend
+
+    def run(self, argv, timeout=None, is_shell=False):
+        """Runs a command in the terminal (interactive). Returns whether it succeeded.
+            Ctrl-C (or the timeout) stops the command and returns to the app."""
+        result = execute(argv, capture=False, timeout=timeout, is_shell=is_shell)
+        if result.is_cancelled or result.is_timed_out or result.error:
+            app.print_warning(result.get_error_message())
+        elif not result.is_success() and not self.quiet:
+            app.print_error(f"Failed to run command '{' '.join(argv)}': "
+                f"exited with code {result.returncode}")
+        return result.is_success()
+
+    def query(self, argv, timeout=QUERY_TIMEOUT):
+        """Runs a command, capturing its output. Returns the CommandResult."""
+        result = execute(argv, timeout=timeout)
+        if not result.is_success() and not self.quiet:
+            app.print_error(f"Failed to get output from command '{' '.join(argv)}': "
+                f"{result.get_error_message()}")
+        return result
+
+    def get_output(self, argv, read_only=False):
+        """Returns the output lines of a command, or None on failure.
+            If read_only is True, the backend (if any) may answer from its memoized output."""
+        if read_only and self.backend is not None:
+            return self.backend.get_output(argv, runner=self.__get_query_lines)
+        return self.__get_query_lines(argv)
+
+    def __get_query_lines(self, argv, cwd=None):
+        """Returns the output lines of a command, or None on failure"""
+        result = execute(argv, timeout=QUERY_TIMEOUT, cwd=cwd)
+        if not result.is_success():
             if not self.quiet:
-                app.print_error(f"Failed to run command '{command}: {e}'")
+                app.print_error(f"Failed to get output from command '{' '.join(argv)}': "
+                    f"{result.get_error_message()}")
+            return None
+        return result.get_lines()
 
-    def get_output(self, command):
-        """Verify and return the array output of a command."""
-        try:
-            return subprocess.check_output(
-                command.split(),
-                text=True,
-                stderr=subprocess.DEVNULL).splitlines()
-        except subprocess.CalledProcessError as e:
-            if not self.quiet:
-                app.print_error(f"Failed to get output from command '{command}: {e}'")
-        return None
+    def get_raw_output(self, argv):
+        """Return the unsplit output of a command, or None on failure.
+            Use this for NUL-separated (-z) output."""
+        result = self.query(argv)
+        return result.get_text() if result.is_success() else None
 
 class GitCommand(Command):
     """Runs Git commands"""
+    # Shared by every instance: working directory => (RepoSnapshot, repo state stamp)
+    _snapshots = {}
+    # Working directories whose snapshot must be verified before it is reused
+    _expired = set()
+    # Repo root => watcher.Watcher (only when enabled, see enable_watcher)
+    _watchers = {}
+    _use_watcher = False
+    # (repo root, branch) => CommitIndex
+    _commit_indexes = {}
+    # (repo root, branch) => WordHistory
+    _word_histories = {}
+    # Working directory => (the _snapshots entry they were read for, {path: DiffStat})
+    _diff_stats = {}
+    # Above this many changed paths, one full 'git status' beats a pathspec-limited one
+    MAX_PARTIAL_PATHS = 64
+
+    def get_snapshot(self):
+        """Returns the repo snapshot, running 'git status' only if it was invalidated.
+            Returns None when the working directory is not within a Git repo."""
+        cwd = os.getcwd()
+        cached = self._snapshots.get(cwd)
+        if cached is not None and cwd in self._expired:
+            self._expired.discard(cwd)
+            cached = self.__verify_snapshot(cwd, *cached)
+        tracing.count_cache("repo snapshot", cached is not None)
+        if cached is None:
+            cached = self.__load_snapshot(cwd)
+        if cached is None:
+            return None
+        return cached[0]
+
+    def __load_snapshot(self, cwd):
+        """Runs a full 'git status' and caches the resulting snapshot"""
+        root = self.get_repo_root()
+        if root is None:
+            return None
+        repo_watcher = self.__get_watcher(root)
+        if repo_watcher is not None:
+            # Everything up to now is covered by the status below
+            repo_watcher.collect_changes()
+        status = self.get_raw_output(STATUS_COMMAND)
+        if status is None:
+            return None
+        stashes = self.get_output(["git", "stash", "list"], read_only=True)
+        # 'git status' may refresh the index, so only stamp the state afterwards
+        cached = (RepoSnapshot.parse(root, status, stashes), self.__get_state_stamp())
+        self._snapshots[cwd] = cached
+        return cached
+
+    def __verify_snapshot(self, cwd, snapshot, stamp):
+        """Reuses an expired snapshot if the watcher saw no changes,
+            or refreshes only the changed paths. Returns None if a full refresh is needed."""
+        repo_watcher = self._watchers.get(snapshot.root)
+        if repo_watcher is None or stamp is None or stamp != self.__get_state_stamp():
+            return None
+        changes = repo_watcher.collect_changes()
+        if changes is None or "." in changes or len(changes) > self.MAX_PARTIAL_PATHS:
+            return None
+        # A .gitignore may (un)ignore untracked files anywhere below it
+        if any(os.path.basename(path) == ".gitignore" for path in changes):
+            return None
+        if changes:
+            pathspecs = [f":(literal){path}" for path in sorted(changes)]
+            status = self.get_raw_output(STATUS_COMMAND + ["--"] + pathspecs)
+            if status is None:
+                return None
+            snapshot.replace_paths(changes, RepoSnapshot.parse(snapshot.root, status))
+            stamp = self.__get_state_stamp()
+        cached = (snapshot, stamp)
+        self._snapshots[cwd] = cached
+        return cached
+
+    def __get_state_stamp(self):
+        """Returns the backend's fingerprint of the refs & index, or None without a backend"""
+        if self.backend is None:
+            return None
+        return self.backend.get_state_stamp()
+
+    def __get_watcher(self, root):
+        """Returns the working tree watcher for the repo root (started on first use)"""
+        if not self._use_watcher:
+            return None
+        if root not in self._watchers:
+            import watcher
+            self._watchers[root] = watcher.create_watcher(root)
+        return self._watchers[root]
+
+    @classmethod
+    def enable_watcher(cls, enabled=True):
+        """Enables (or disables) watching the working tree to avoid redundant 'git status' calls"""
+        cls._use_watcher = enabled
+        if not enabled:
+            for repo_watcher in cls._watchers.values():
+                repo_watcher.close()
+            cls._watchers.clear()
+
+    @classmethod
+    def expire(cls):
+        """Marks the cached snapshot(s) as possibly outdated.
+            Without a watcher, the next snapshot request runs a full 'git status'."""
+        cls._expired.update(cls._snapshots)
+
+    @classmethod
+    def invalidate(cls):
+        """Drops the cached repo snapshot(s) & memoized output.
+            Call after anything that may change the repo."""
+        cls._snapshots.clear()
+        cls._expired.clear()
+        cls._diff_stats.clear()
+        git_workers.forget_outputs()
+
     def get_repo_root(self):
         """Returns the root of the Git repo"""
-        output = self.get_output("git rev-parse --show-toplevel")
+        if self.backend is not None:
+            # Discovered once per folder, along with the git dirs
+            return self.backend.get_repo_root()
+        output = self.get_output(["git", "rev-parse", "--show-toplevel"], read_only=True)
         if output is None:
             return None
         try:
@@ -51,188 +345,404 @@ class GitCommand(Command):
 
     def get_branch(self):
         """Returns the current branch."""
-        branch = self.get_output("git rev-parse --abbrev-ref HEAD")
-        if branch is None:
+        snapshot = self.get_snapshot()
+        if snapshot is None:
             return None
-        return branch[0]
+        return snapshot.branch
 
     def get_branch_index(self):
         """Returns the current branch's index (relative to other branches)."""
-        branches = self.get_branches()
-        for i, b in enumerate(branches):
-            if "*" in b:
-                return i
-        return None
+        branches = self.get_branches(remove_indicator=True)
+        branch = self.get_branch()
+        if not branches or branch not in branches:
+            return None
+        return branches.index(branch)
 
     def get_branches(self, remove_indicator=False):
         """Returns the list of branches, with the current branch marked."""
-        branches = self.get_output("git branch")
+        branches = self.get_output(["git", "branch"], read_only=True)
         if branches is None:
             return None
         if not remove_indicator:
             return branches
         return [b.replace("*", "").strip() for b in branches]
 
-    def get_changes(self, names_only=False, full_paths=False):
+    def get_changes(self, names_only=False, full_paths=False, with_stats=False):
         """Returns the Git repo's uncommitted changes 
-        (names_only removes the status icon, full_paths returns the absolute path)"""
-        changes = self.get_output("git status -s -u")
-        if changes and names_only:
-            if full_paths:
-                return [os.path.abspath(fname[3:]) for fname in changes]
-            return [fname[3:] for fname in changes]
-        return changes
+        (names_only removes the status icon, full_paths returns the absolute path,
+        with_stats returns picker Options described by their added/removed lines & words)"""
+        snapshot = self.get_snapshot()
+        if snapshot is None:
+            return None
+        if names_only:
+            paths = snapshot.get_changed_paths()
+            labels = [snapshot.get_full_path(p) for p in paths] if full_paths else paths
+            return self.__get_stat_options(paths, labels) if with_stats else labels
+        return snapshot.get_short_status()
+
+    def get_diff_stats(self):
+        """Returns {path: DiffStat} of every change (see diff_stats), read with one 'git diff'
+            per snapshot. Untracked files are counted directly. None when not in a Git repo."""
+        snapshot = self.get_snapshot()
+        if snapshot is None:
+            return None
+        cwd = os.getcwd()
+        cached = self._snapshots.get(cwd)
+        entry = self._diff_stats.get(cwd)
+        is_cached = entry is not None and entry[0] is cached
+        tracing.count_cache("diff stats", is_cached)
+        if is_cached:
+            return entry[1]
+        stats = diff_stats.read_diff_stats(snapshot.root, snapshot.oid) or {}
+        for path in snapshot.untracked:
+            stat = diff_stats.DiffStat.read_untracked(snapshot.get_full_path(path))
+            if stat is not None:
+                stats[path] = stat
+        self._diff_stats[cwd] = (cached, stats)
+        return stats
+
+    def __get_stat_options(self, paths, labels):
+        """Returns a picker Option per path (valued & labeled by labels), described by its stats"""
+        from picker import Option
+        stats = self.get_diff_stats() or {}
+        options = []
+        for path, label in zip(paths, labels):
+            stat = stats.get(path)
+            options.append(Option(label, label,
+                description=stat.get_description() if stat is not None else None))
+        return options
 
     def get_commits(self, hashes_only=False, index=0, limit=-1):
         """Returns the Git repo's commit history (full or hashes only)"""
-        commits = self.get_output(f"git log --oneline --skip={index} -n {limit}")
+        commits = self.get_output(
+            ["git", "log", "--oneline", f"--skip={index}", "-n", str(limit)], read_only=True)
         if commits and hashes_only:
             return [c[:7] for c in commits]
         return commits
 
+    def get_log_entries(self, limit=-1):
+        """Returns the commit history as (hash, author, date (ISO 8601), subject) tuples,
+            newest first, or None on failure"""
+        output = self.get_raw_output(["git", "log", "-z", "--format=%H%x1f%an%x1f%aI%x1f%s",
+            "-n", str(limit)])
+        if output is None:
+            return None
+        return [tuple(record.split("\x1f", 3)) for record in output.split("\0") if record]
+
+    def get_commit_cursor(self):
+        """Returns a cursor streaming the commit history (see get_commits for the format)"""
+        from commit_cursor import CommitCursor
+        return CommitCursor()
+
+    def get_commit_index(self, is_loaded_only=False):
+        """Returns the persistent commit index of the current branch, updated to HEAD.
+            Returns None if the index is unavailable (e.g. outside of a repo),
+            or not loaded yet when is_loaded_only is True."""
+        # The commit index (and sqlite3) is only loaded when first needed
+        import sqlite3
+        from commit_index import CommitIndex
+        snapshot = self.get_snapshot()
+        if snapshot is None or not snapshot.branch:
+            return None
+        key = (snapshot.root, snapshot.branch)
+        if is_loaded_only and key not in self._commit_indexes:
+            return None
+        try:
+            if key not in self._commit_indexes:
+                self._commit_indexes[key] = CommitIndex(self, snapshot.root, snapshot.branch)
+            self._commit_indexes[key].update()
+            return self._commit_indexes[key]
+        except (sqlite3.Error, OSError) as e:
+            if not self.quiet:
+                app.print_error(f"Failed to update the commit index. {e}")
+            self._commit_indexes.pop(key, None)
+        return None
+
+    def get_word_history(self):
+        """Returns the persistent word history of the current branch, updated to HEAD.
+            Returns None if the history is unavailable (e.g. outside of a repo)."""
+        import sqlite3
+        from word_history import WordHistory
+        snapshot = self.get_snapshot()
+        if snapshot is None or not snapshot.branch:
+            return None
+        key = (snapshot.root, snapshot.branch)
+        try:
+            if key not in self._word_histories:
+                self._word_histories[key] = WordHistory(self, snapshot.root, snapshot.branch)
+            self._word_histories[key].update()
+            return self._word_histories[key]
+        except (sqlite3.Error, OSError) as e:
+            if not self.quiet:
+                app.print_error(f"Failed to update the word history. {e}")
+            self._word_histories.pop(key, None)
+        return None
+
     def get_total_commits(self):
         """Returns the total number of commits in the repo's history (not counting merges)"""
-        count = self.get_output("git rev-list HEAD --count --no-merges")
+        if not self.has_commits():
+            return None
+        # Loading (or first building) the commit index just to count would be slower
+        commit_index = self.get_commit_index(is_loaded_only=True)
+        if commit_index is not None:
+            return str(commit_index.count(no_merges=True))
+        count = self.get_output(["git", "rev-list", "HEAD", "--count", "--no-merges"],
+            read_only=True)
         if count is None:
             return None
         return count[0]
 
+    def resolve_object(self, rev):
+        """Returns the full object ID of a revision (e.g. 'HEAD'), or None if it doesn't exist"""
+        if self.backend is not None:
+            worker = self.backend.get_worker("--batch-check")
+            if worker is None:
+                return None
+            result = worker.query(rev)
+            return result[0] if result else None
+        oid = self.get_output(["git", "rev-parse", "--verify", "--quiet", f"{rev}^{{object}}"])
+        if not oid:
+            return None
+        return oid[0]
+
+    def read_object(self, rev):
+        """Returns the raw contents of a Git object (e.g. a blob), or None if it doesn't exist"""
+        if self.backend is not None:
+            worker = self.backend.get_worker("--batch")
+            if worker is None:
+                return None
+            result = worker.query(rev)
+            return result[3] if result else None
+        result = execute(["git", "cat-file", "-p", rev], timeout=QUERY_TIMEOUT)
+        return result.stdout if result.is_success() else None
+
+    def has_commits(self):
+        """Returns whether the current branch has any commit history"""
+        return self.resolve_object("HEAD") is not None
+
     def get_stashes(self, names_only=False):
         """Returns the Git repo's local stashes (full or names only)"""
-        stashes = self.get_output("git stash list")
+        snapshot = self.get_snapshot()
+        if snapshot is None:
+            return None
+        stashes = snapshot.stashes
         if stashes and names_only:
             return [name.split(":")[0] for name in stashes]
         return stashes
 
     def get_staged_changes(self):
         """Returns the Git repo's local staged changes"""
-        return self.get_output("git diff --name-status --cached")
+        snapshot = self.get_snapshot()
+        if snapshot is None:
+            return None
+        return [f"{status}\t{path}" for path, status in sorted(snapshot.staged.items())]
 
-    def get_diff_options(self):
-        """Returns the Git repo's local changes, compared to their previous commit if available"""
-        return self.get_output("git diff --name-only")
+    def get_diff_options(self, with_stats=False):
+        """Returns the Git repo's local changes, compared to their previous commit if available
+            (with_stats returns picker Options described by their added/removed lines & words)"""
+        snapshot = self.get_snapshot()
+        if snapshot is None:
+            return None
+        paths = sorted(snapshot.unstaged)
+        return self.__get_stat_options(paths, paths) if with_stats else paths
 
     def push_changes(self):
         """Pushes all pending changes from the local repo to the Git remote"""
-        self.run("git push")
+        with self.__hold_fetches() as is_held:
+            if is_held:
+                self.run(["git", "push"], timeout=NETWORK_TIMEOUT)
+        self.invalidate()
 
     def pull_changes(self):
         """Fetches all pending changes from the Git remote, updat es the local repo"""
-        self.run("git pull")
+        with self.__hold_fetches() as is_held:
+            if is_held:
+                self.run(["git", "pull"], timeout=NETWORK_TIMEOUT)
+        self.invalidate()
+
+    @contextmanager
+    def __hold_fetches(self):
+        """Keeps the background fetch (if any) from overlapping a command using the remote.
+            Yields False if the command must not run (cancelled while stopping the fetch)."""
+        scheduler = fetch_scheduler.get_fetch_scheduler(self.get_repo_root())
+        if scheduler is None:
+            yield True
+            return
+        with scheduler.hold() as is_held:
+            yield is_held
+        # The remote-tracking refs may have changed
+        scheduler.refresh_ahead_behind()
 
     def stage_all_changes(self):
         """Stages all local changes (including untracked)"""
-        self.run("git add -A")
+        self.run(["git", "add", "-A"])
+        self.invalidate()
         self.show_changes()
 
     def unstage_all_changes(self):
         """Unstages all local changes (including untracked)"""
-        self.run("git restore --staged .")
+        self.run(["git", "restore", "--staged", "."])
+        self.invalidate()
         self.show_changes()
 
     def stage_interactive(self):
         """Opens Git's interactive staging menu"""
-        self.run("git add -i")
+        self.run(["git", "add", "-i"])
+        self.invalidate()
         self.show_changes()
 
     def commit_changes(self, message):
-        """Commits all staged local changes"""
-        self.run(['git', 'commit', '-m', f"{message}"], has_input_message=True)
+        """Commits all staged local changes. Returns whether the commit succeeded."""
+        is_success = self.run(["git", "commit", "-m", message])
+        self.invalidate()
+        return is_success
 
     def stash_all_changes(self, message):
-        """Stashes all local changes"""
-        self.run(['git', 'stash', 'push', '-u', '-m', f"{message}"], has_input_message=True)
+        """Stashes all local changes. Returns whether the stash succeeded."""
+        is_success = self.run(["git", "stash", "push", "-u", "-m", message])
+        self.invalidate()
+        return is_success
 
     def stash_staged_changes(self, message):
-        """Stashes all staged local changes"""
-        self.run(['git', 'stash', 'push', '--staged', '-m', f"{message}"], has_input_message=True)
+        """Stashes all staged local changes. Returns whether the stash succeeded."""
+        is_success = self.run(["git", "stash", "push", "--staged", "-m", message])
+        self.invalidate()
+        return is_success
 
     def existing_stash_operation(self, operation, stash):
-        """Executes the Git stash operation on the specified stash (apply, pop, or drop)"""
-        match(operation):
-            case "apply":
-                self.run(f"git stash apply {stash}")
-            case "pop":
-                self.run(f"git stash pop {stash}")
-            case "drop":
-                self.run(f"git stash drop {stash}")
+        """Executes the Git stash operation on the specified stash (apply, pop, or drop).
+            Returns whether it succeeded."""
+        is_success = False
+        if operation in ("apply", "pop", "drop"):
+            is_success = self.run(["git", "stash", operation, stash])
+        self.invalidate()
+        return is_success
 
     def checkout_patch(self):
         """Opens Git's interactive checkout menu"""
-        self.run("git checkout -p")
+        self.run(["git", "checkout", "-p"])
+        self.invalidate()
 
     def clean_interactive(self):
         """Opens Git's interactive cleaning menu"""
-        self.run("git clean -i -d")
+        self.run(["git", "clean", "-i", "-d"])
+        self.invalidate()
 
     def reset(self, reset_type, commit):
         """Opens Git's interactive cleaning menu"""
-        self.run(f"git reset --{reset_type} {commit}")
+        self.run(["git", "reset", f"--{reset_type}", commit])
+        self.invalidate()
 
     def switch_branch(self, branch):
         """Attempts to switch the Git branch"""
-        self.run(f"git switch {branch}")
+        self.run(["git", "switch", branch])
+        self.invalidate()
 
     def show_changes(self):
         """Displays all local changes in a compact list"""
-        if self.get_changes():
+        changes = self.get_changes()
+        if changes:
             print("\n[Changes]")
-            self.run("git status -s -u")
+            for change in changes:
+                print(change)
 
     def show_stashes(self):
         """Displays all local stashes in a compact list"""
-        if self.get_stashes():
+        stashes = self.get_stashes()
+        if stashes:
             print("\n[Stashes]")
-            self.run("git stash list")
+            for stash in stashes:
+                print(stash)
 
     def show_status(self):
-        """Fetches and displays the full Git status"""
-        self.run("git fetch")
-        self.run("git status")
+        """Displays the full Git status (as of the latest background fetch, see show_fetch_state)
+            and asks for a new fetch in the background"""
+        self.run(["git", "status"])
+        self.show_fetch_state()
+        scheduler = fetch_scheduler.get_fetch_scheduler(self.get_repo_root())
+        if scheduler is not None:
+            scheduler.request()
+
+    def show_fetch_state(self):
+        """Displays the ahead/behind counts published by the background fetch (never waits)"""
+        scheduler = fetch_scheduler.get_fetch_scheduler(self.get_repo_root())
+        if scheduler is None:
+            return
+        state = scheduler.state
+        if state.fetched_at is None:
+            print("Remote: fetching...")
+            return
+        if state.upstream is None:
+            summary = "no upstream branch"
+        else:
+            summary = f"{state.upstream} \u2191{state.ahead} \u2193{state.behind}"
+        age = "fetching..." if state.is_fetching else (
+            f"fetched {fetch_scheduler.format_age(state.fetched_at)}")
+        print(f"Remote: {summary} ({age})")
+        if state.error:
+            app.print_warning(f"Last fetch failed: {state.error}", new_line=False)
 
     def show_log(self):
         """Displays the commit history in a compact list"""
-        if self.get_total_commits() is None:
+        if not self.has_commits():
             app.print_warning("No commit history available.")
             return
-        self.run("git log --oneline --graph --name-status")
+        self.run(["git", "log", "--oneline", "--graph", "--name-status"])
 
     def show_diff_for_file(self, file):
-        """Shows the Git diff for the specified file"""
-        self.run(f"git diff {file}")
+        """Shows the Git diff in the diff viewer, starting at the specified file"""
+        from diff_viewer import show_diff
+        try:
+            show_diff(file, cwd=self.get_repo_root())
+        except OSError as e:
+            app.print_error(f"Could not run 'git diff'. {e}")
 
     def show_commit_details(self, commit_hash):
         """Shows more details for the specified Git commit"""
-        self.run(f"git show {commit_hash}")
+        self.run(["git", "show", commit_hash])
 
     def show_repo_summary(self):
         """Shows local Git stashes and changes"""
-        repo = self.get_repo_root()
-        branch = self.get_branch()
-        print(f"\nREPO: {os.path.basename(repo)}")
-        print(f"Branch: {branch}")
+        snapshot = self.get_snapshot()
+        if snapshot is None:
+            return
+        print(f"\nREPO: {os.path.basename(snapshot.root)}")
+        print(f"Branch: {snapshot.branch}")
+        self.show_fetch_state()
         self.show_stashes()
         self.show_changes()
 
+def split_app_command(command):
+    """Returns the argument list of a configured app (e.g. 'code -w' => ['code', '-w'])"""
+    if not app.platform_is_windows():
+        return shlex.split(command)
+    # Windows paths keep their backslashes (non-POSIX mode), but also their quotes
+    return [__unquote(token) for token in shlex.split(command, posix=False)]
+
+def __unquote(token):
+    """Returns a token without its surrounding quotes, if any"""
+    if len(token) >= 2 and token[0] == token[-1] and token[0] in "\"'":
+        return token[1:-1]
+    return token
+
 class AppCommand(Command):
     """Command class for app-specific commands"""
-    git_cmd = GitCommand()
     def open_browser(self, browser):
         """Opens the specified browser"""
-        self.run(browser)
+        self.run(split_app_command(browser))
 
     def open_editor(self, editor, fpath):
         """Opens the specified file in the specified editor."""
         history.add(fpath)
-        self.run(f"{editor} {fpath}")
+        self.run(split_app_command(editor) + [fpath])
 
     def view_file(self, fpath):
         """Opens the specified file in read-only mode"""
         history.add(fpath)
         if app.platform_is_windows():
-            self.run(f"more {fpath}", is_shell=True)
+            self.run(["more", fpath], is_shell=True)
         else:
-            self.run(f"less {fpath}")
+            self.run(["less", fpath])
 
     def show_changelog(self):
         """Fetches the app's changelog path"""
@@ -245,3 +755,21 @@ class AppCommand(Command):
         path = app.get_python_resource_path("README.md")
         if path:
             self.view_file(path)
+
+
+__git_command = None
+__app_command = None
+
+def get_git_command():
+    """Returns the session's shared GitCommand (backed by the default worker pool)"""
+    global __git_command
+    if __git_command is None:
+        __git_command = GitCommand(backend=git_workers.get_default_pool())
+    return __git_command
+
+def get_app_command():
+    """Returns the session's shared AppCommand"""
+    global __app_command
+    if __app_command is None:
+        __app_command = AppCommand()
+    return __app_command
@@ -0,0 +1,63 @@
+"""Streams the commit history once, so paging never re-walks commits that were already read"""
+import subprocess
+import threading
+
+LOG_COMMAND = ["git", "log", "--oneline"]
+
+class CommitCursor:
+    """Reads 'git log' output lazily from one long-running process.
+        Every commit read so far is kept, so going back to a previous page is free."""
+    def __init__(self, command=None, cwd=None):
+        self.command = command or LOG_COMMAND
+        self.cwd = cwd
+        self._commits = []
+        self._proc = None
+        self._is_exhausted = False
+        self._lock = threading.Lock()
+
+    def _read_until(self, count):
+        """Reads from the stream until count commits are available (or the history ends)"""
+        if self._proc is None and not self._is_exhausted:
+            self._proc = subprocess.Popen(
+                self.command,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+                text=True,
+                errors="replace",
+                cwd=self.cwd)
+        while not self._is_exhausted and (count < 0 or len(self._commits) < count):
+            line = self._proc.stdout.readline()
+            if not line:
+                self._is_exhausted = True
+                self._proc.stdout.close()
+                self._proc.wait()
+                self._proc = None
+                break
+            self._commits.append(line.rstrip("\n"))
+
+    def get_commits(self, index=0, limit=-1):
+        """Returns up to limit commits starting at index (same format as GitCommand.get_commits)"""
+        with self._lock:
+            self._read_until(-1 if limit < 0 else index + limit)
+            if limit < 0:
+                return self._commits[index:]
+            return self._commits[index:index + limit]
+
+    def prefetch(self, index=0, limit=-1):
+        """Reads the requested commits in a background thread"""
+        def read():
+            with self._lock:
+                self._read_until(-1 if limit < 0 else index + limit)
+        if not self._is_exhausted:
+            threading.Thread(target=read, daemon=True).start()
+
+    def close(self):
+        """Stops the underlying 'git log' process (if still running)"""
+        with self._lock:
+            if self._proc is not None:
+                self._proc.kill()
+                self._proc.stdout.close()
+                self._proc.wait()
+                self._proc = None
+            # Keep what was read, but never restart the stream
+            self._is_exhausted = True
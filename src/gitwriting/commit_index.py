@@ -0,0 +1,127 @@
+"""A persistent, incrementally updated index of the commit history (one SQLite file per branch)"""
+import os
+import sqlite3
+import subprocess
+import hashlib
+import app_utils as app
+import commands
+
+# oid, parents, author, author date (unix time), subject
+LOG_FORMAT = "--format=%H%x1f%P%x1f%an%x1f%at%x1f%s"
+SCHEMA_VERSION = "1"
+
+class CommitIndex:
+    """Commit metadata (oid, parents, author, date, subject), newest first.
+        Only commits added since the last indexed HEAD are read from Git on update.
+        A rewritten history (the old HEAD is no longer an ancestor) triggers a rebuild."""
+    def __init__(self, git_cmd, root, branch):
+        self.git_cmd = git_cmd
+        self.root = root
+        key = hashlib.sha1(branch.encode("utf-8")).hexdigest()[:12]
+        self.path = app.get_user_cache_resource_path(f"commits-{key}.sqlite3", repo_root=root)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._db = sqlite3.connect(self.path)
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+            CREATE TABLE IF NOT EXISTS commits (
+                seq INTEGER PRIMARY KEY,
+                oid TEXT NOT NULL UNIQUE,
+                parents TEXT NOT NULL,
+                author TEXT NOT NULL,
+                date INTEGER NOT NULL,
+                subject TEXT NOT NULL);
+            """)
+        if self.__get_meta("version") != SCHEMA_VERSION:
+            self.__clear()
+            self.__set_meta("version", SCHEMA_VERSION)
+            self._db.commit()
+
+    def __get_meta(self, key):
+        """Returns a value from the meta table (or None)"""
+        row = self._db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def __set_meta(self, key, value):
+        """Sets a value in the meta table"""
+        self._db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def __clear(self):
+        """Forgets every indexed commit"""
+        self._db.execute("DELETE FROM commits")
+        self._db.execute("DELETE FROM meta WHERE key = 'head'")
+
+    def __stream_log(self, revision_range):
+        """Yields (oid, parents, author, date, subject) for each commit in the range,
+            newest first"""
+        with subprocess.Popen(
+                ["git", "log", LOG_FORMAT, revision_range],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+                text=True,
+                errors="replace",
+                cwd=self.root) as proc:
+            for line in proc.stdout:
+                fields = line.rstrip("\n").split("\x1f", 4)
+                if len(fields) == 5:
+                    yield fields[0], fields[1], fields[2], int(fields[3] or 0), fields[4]
+
+    def __is_ancestor(self, old, new):
+        """Returns whether commit old is reachable from commit new"""
+        result = commands.execute(["git", "merge-base", "--is-ancestor", old, new],
+            cwd=self.root, timeout=commands.QUERY_TIMEOUT)
+        return result.is_success()
+
+    def update(self):
+        """Ingests the commits added since the last update. Returns the number of new commits."""
+        head = self.git_cmd.resolve_object("HEAD")
+        indexed_head = self.__get_meta("head")
+        if head == indexed_head:
+            return 0
+        if head is None:
+            self.__clear()
+            self._db.commit()
+            return 0
+        if indexed_head and self.__is_ancestor(indexed_head, head):
+            commits = list(self.__stream_log(f"{indexed_head}..{head}"))
+            top = self._db.execute("SELECT COALESCE(MAX(seq), 0) FROM commits").fetchone()[0]
+            # Newer commits get higher sequence numbers, so 'ORDER BY seq DESC' is newest first
+            rows = ((top + len(commits) - i, *commit) for i, commit in enumerate(commits))
+        else:
+            # First run, or the history was rewritten (rebase, reset, amend...)
+            self.__clear()
+            rows = ((-i, *commit) for i, commit in enumerate(self.__stream_log(head)))
+        with self._db:
+            cursor = self._db.executemany(
+                "INSERT OR REPLACE INTO commits (seq, oid, parents, author, date, subject) "
+                "VALUES (?, ?, ?, ?, ?, ?)", rows)
+            self.__set_meta("head", head)
+        return cursor.rowcount
+
+    def get_entries(self, index=0, limit=-1):
+        """Returns up to limit indexed commits as dicts, newest first"""
+        rows = self._db.execute(
+            "SELECT oid, parents, author, date, subject FROM commits "
+            "ORDER BY seq DESC LIMIT ? OFFSET ?", (limit, index))
+        return [{"oid": oid, "parents": parents.split(), "author": author,
+            "date": date, "subject": subject} for oid, parents, author, date, subject in rows]
+
+    def get_commits(self, index=0, limit=-1):
+        """Returns up to limit commits in 'git log --oneline' format, newest first"""
+        return [f"{entry['oid'][:7]} {entry['subject']}"
+            for entry in self.get_entries(index=index, limit=limit)]
+
+    def get_head(self):
+        """Returns the last indexed HEAD"""
+        return self.__get_meta("head")
+
+    def count(self, no_merges=False):
+        """Returns the number of indexed commits (optionally not counting merges)"""
+        if no_merges:
+            query = "SELECT COUNT(*) FROM commits WHERE parents NOT LIKE '% %'"
+        else:
+            query = "SELECT COUNT(*) FROM commits"
+        return self._db.execute(query).fetchone()[0]
+
+    def close(self):
+        """Closes the index file"""
+        self._db.close()
@@ -2,24 +2,56 @@
 # Python modules
 import os
 import configparser
+from contextlib import contextmanager
 from datetime import datetime
 # My modules
 import app_utils as app
-from commands import GitCommand
+import history
+import tracing
 
 class Config:
-    """The base config class"""
-    parser = configparser.ConfigParser()
+    """The base config class.
+        Every instance shares one snapshot of its config file per process,
+        only read again when the file changes (see read())"""
     _path = ""
+    # Per config file path: the parsed snapshot, the file's stat() stamp when it was
+    # last read or written, and the open batches ([depth, has pending changes, has failed])
+    _parsers = {}
+    _stamps = {}
+    _batches = {}
 
     def __init__(self, quiet=False):
         self.quiet = quiet
 
+    @property
+    def parser(self):
+        """The (shared) parsed config"""
+        if self._path not in self._parsers:
+            self._parsers[self._path] = configparser.ConfigParser()
+        return self._parsers[self._path]
+
+    def __get_stamp(self):
+        """Returns the config file's stat() stamp (None if missing)"""
+        try:
+            st = os.stat(self._path)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size, st.st_ino)
+
     def read(self):
-        """Tries to read the config file using configparser"""
+        """Tries to read the config file using configparser.
+            Does nothing if the file didn't change since it was last read (or written)."""
+        stamp = self.__get_stamp()
+        is_unchanged = stamp is not None and stamp == self._stamps.get(self._path)
+        tracing.count_cache("config file", is_unchanged)
+        if is_unchanged:
+            return
         try:
+            parser = configparser.ConfigParser()
             with open(self._path, 'r', encoding="utf-8") as f:
-                self.parser.read_file(f)
+                parser.read_file(f)
+            self._parsers[self._path] = parser
+            self._stamps[self._path] = stamp
         except FileNotFoundError:
             if not self.quiet:
                 app.print_warning(f"Could not find a valid config file at '{self._path}'.")
@@ -29,9 +61,12 @@ class Config:
                 app.print_error(f"Error while reading config file. {e}")
             raise
 
-    def get_value(self, section, option):
-        """Reads a value from the config file using configparser"""
+    def get_value(self, section, option, fallback=None):
+        """Reads a value from the config file using configparser.
+            If a fallback is given, it is returned when the option is missing."""
         try:
+            if fallback is not None:
+                return self.parser.get(section, option, fallback=fallback)
             return self.parser.get(section, option)
         except ValueError:
             app.print_error(f"Failed to retrieve ['{section}', '{option}'] from '{self._path}'. "
@@ -42,9 +77,26 @@ class Config:
             app.print_info(f"Please verify that '{self._path}' is setup correctly.")
         return None
 
-    def get_bool(self, section, option):
+    def get_int(self, section, option, fallback=None):
+        """Similar to get_value, except using ConfigParser's integer coercing"""
+        try:
+            if fallback is not None:
+                return self.parser.getint(section, option, fallback=fallback)
+            return self.parser.getint(section, option)
+        except ValueError:
+            app.print_error(f"Failed to retrieve ['{section}', '{option}'] from '{self._path}'. "
+                f"'{option}' is not a valid number.")
+        except configparser.Error as e:
+            app.print_error(f"Failed to retrieve ['{section}', '{option}'] "
+                f"from '{self._path}'. {e}")
+            app.print_info(f"Please verify that '{self._path}' is setup correctly.")
+        return None
+
+    def get_bool(self, section, option, fallback=None):
         """Similar to get_value, except using ConfigParser's boolean coercing"""
         try:
+            if fallback is not None:
+                return self.parser.getboolean(section, option, fallback=fallback)
             return self.parser.getboolean(section, option)
         except ValueError:
             app.print_error(f"Failed to retrieve ['{section}', '{option}'] from '{self._path}'. "
@@ -56,30 +108,78 @@ class Config:
         return None
 
     def set_value(self, section, option, value):
-        """Updates a value in the config file using configparser"""
+        """Updates a value in the config file using configparser.
+            The file isn't written if the value is unchanged."""
+        message = "" if self.quiet else f"Set ['{section}', '{option}'] = '{value}'"
         try:
+            if (self.parser.has_option(section, option)
+                    and self.parser.get(section, option, raw=True) == value):
+                if message:
+                    app.print_success(message)
+                return
             self.parser.set(section, option, value)
-            if self.quiet:
-                self.save()
-            else:
-                self.save(f"Set ['{section}', '{option}'] = '{value}'")
+            self.save(message)
         except (configparser.NoSectionError, TypeError) as e:
             app.print_error(f"Failed to set ['{section}', '{option}'] = '{value}' "
                 f"in '{self._path}'. {e}")
 
+    @contextmanager
+    def batch(self):
+        """Coalesces every save made within the block into one write of the config file.
+            If the block (or a nested one) fails or is interrupted, nothing is written
+            and the changes made within it are dropped."""
+        state = self._batches.setdefault(self._path, [0, False, False])
+        state[0] += 1
+        try:
+            yield self
+        except BaseException:
+            state[2] = True
+            raise
+        finally:
+            state[0] -= 1
+            if state[0] == 0:
+                del self._batches[self._path]
+                if state[2]:
+                    self.__discard_changes()
+                elif state[1]:
+                    self.save()
+
+    def __discard_changes(self):
+        """Drops the unsaved changes: the config file is read again (if there is one)"""
+        self._parsers.pop(self._path, None)
+        self._stamps.pop(self._path, None)
+        quiet, self.quiet = self.quiet, True
+        try:
+            self.read()
+        except (OSError, configparser.Error):
+            pass
+        finally:
+            self.quiet = quiet
+
     def save(self, message=""):
-        """Writes and saves a value to the config file using configparser"""
+        """Writes and saves a value to the config file using configparser.
+            The file is replaced atomically (written to a temporary file first).
+            Within batch(), the write is deferred until the batch ends."""
+        if self._path in self._batches:
+            self._batches[self._path][1] = True
+            if message != "":
+                app.print_success(message)
+            return
+        temp_path = f"{self._path}.tmp"
         try:
             # Only make new directory/directories if the file path forms a directory.
             if os.path.dirname(self._path) != "":
                 os.makedirs(os.path.dirname(self._path), exist_ok=True)
-            with open(self._path, "w", encoding="utf-8") as newfile:
+            with open(temp_path, "w", encoding="utf-8") as newfile:
                 self.parser.write(newfile)
+            os.replace(temp_path, self._path)
+            # What was just written is the current snapshot, don't read it again
+            self._stamps[self._path] = self.__get_stamp()
             if message != "":
                 app.print_success(message)
         except FileNotFoundError:
             app.print_error(f"Could not find a valid config file at '{self._path}'.")
-        except configparser.Error as e:
+        except (OSError, configparser.Error) as e:
             app.print_error(f"Failed to save the config file. {e}")
 
     def show(self):
@@ -104,7 +204,12 @@ class AppConfig(Config):
 
     def generate(self):
         """Generate a new config file if it doesn't exist already"""
-        git_cmd = GitCommand()
+        # Imported here, so reading the config doesn't load the Git commands
+        import commands
+        import dashboard
+        import fetch_scheduler
+        import workspace
+        git_cmd = commands.get_git_command()
         try:
             # Default new working dir to system "Home" folder as a starting point
             working_dir = os.path.expanduser("~")
@@ -129,25 +234,35 @@ class AppConfig(Config):
                     'daily_notes': daily_notes}
             self.parser['FLAGS'] = {
                 'browser_hidden_files': 'off',
-                'daily_notes': 'off'}
+                'daily_notes': 'off',
+                'file_watcher': 'on'}
+            self.parser['HISTORY'] = {
+                'capacity': str(history.DEFAULT_CAPACITY)}
+            self.parser['FETCH'] = {
+                'interval': str(fetch_scheduler.DEFAULT_INTERVAL)}
+            self.parser['WORKSPACE'] = {
+                'repos': '',
+                'jobs': str(workspace.DEFAULT_JOBS)}
+            self.parser['DASHBOARD'] = {
+                'daily_target': str(dashboard.DEFAULT_DAILY_TARGET)}
             self.save(f"A new config file '{self._path}' was generated with these defaults.")
         except (FileNotFoundError, configparser.Error) as e:
             app.print_error(f"Could not generate '{self._path}' config file. {e}")
             raise
 
     def get_today_note_path(self):
-        """Returns a file path based on the current date,
-            ordered by each year and month
+        """Returns the path of today's daily note (see get_note_path)"""
+        return self.get_note_path(datetime.now())
+
+    def get_note_path(self, day):
+        """Returns the path of a day's (date or datetime) daily note, ordered by year and month
             (Default: DAILY_NOTES_ROOT/YEAR/YEAR-MONTH/YEAR-MONTH-DAY.md)
         """
         root = self.get_daily_notes_root_path()
-        now = datetime.now().strftime("%F")
-        # ['YEAR', 'MONTH', 'DAY']
-        date_arr = now.split("-")
-        year_month = f"{date_arr[0]}-{date_arr[1]}"
-        note_filename = f"{date_arr[0]}-{date_arr[1]}-{date_arr[2]}.md"
-        full_note_path = os.path.abspath(os.path.join(root, date_arr[0], year_month, note_filename))
-        return full_note_path
+        year = f"{day.year:04}"
+        year_month = f"{year}-{day.month:02}"
+        note_filename = f"{year_month}-{day.day:02}.md"
+        return os.path.abspath(os.path.join(root, year, year_month, note_filename))
 
     def is_daily_notes_enabled(self):
         """Returns whether the default browser should display hidden files"""
@@ -157,6 +272,37 @@ class AppConfig(Config):
         """Returns whether the default browser should display hidden files"""
         return bool(self.get_browser_hidden_files_status())
 
+    def is_file_watcher_enabled(self):
+        """Returns whether the working tree should be watched to skip redundant 'git status' calls.
+            Enabled by default (older config files may not define this flag)."""
+        return bool(self.get_bool('FLAGS', 'file_watcher', fallback=True))
+
+    def get_history_capacity(self):
+        """Returns how many recent files are remembered
+            (older config files may not define it)"""
+        return self.get_int('HISTORY', 'capacity', fallback=history.DEFAULT_CAPACITY)
+
+    def get_fetch_interval(self):
+        """Returns the seconds between background fetches (0: disabled)"""
+        import fetch_scheduler
+        return self.get_int('FETCH', 'interval', fallback=fetch_scheduler.DEFAULT_INTERVAL)
+
+    def get_workspace_repos(self):
+        """Returns the paths of the workspace's repos, one per line in the config file
+            (older config files may not define any)"""
+        value = self.get_value('WORKSPACE', 'repos', fallback="")
+        return [path.strip() for path in (value or "").splitlines() if path.strip()]
+
+    def get_workspace_jobs(self):
+        """Returns how many workspace repos are processed at the same time"""
+        import workspace
+        return self.get_int('WORKSPACE', 'jobs', fallback=workspace.DEFAULT_JOBS)
+
+    def get_daily_target(self):
+        """Returns the daily word target of the dashboard (0: none)"""
+        import dashboard
+        return self.get_int('DASHBOARD', 'daily_target', fallback=dashboard.DEFAULT_DAILY_TARGET)
+
     def get_app(self, app_type):
         """Returns the specified app as defined in the config file"""
         return self.get_value('PATHS', app_type)
@@ -193,17 +339,38 @@ class AppConfig(Config):
         """Sets the browser hidden files visiblity flag in the config file"""
         self.set_value('FLAGS', 'browser_hidden_files', new_status)
 
+    def set_fetch_interval(self, seconds):
+        """Sets the seconds between background fetches (0: disabled) in the config file"""
+        if not self.parser.has_section('FETCH'):
+            self.parser.add_section('FETCH')
+        self.set_value('FETCH', 'interval', str(seconds))
+
+    def set_workspace_repos(self, repos):
+        """Sets the paths of the workspace's repos in the config file"""
+        if not self.parser.has_section('WORKSPACE'):
+            self.parser.add_section('WORKSPACE')
+        # One path per line (the first line is left empty, for readability)
+        self.set_value('WORKSPACE', 'repos', "".join(f"\n{path}" for path in repos))
+
+    def set_daily_target(self, words):
+        """Sets the daily word target of the dashboard (0: none) in the config file"""
+        if not self.parser.has_section('DASHBOARD'):
+            self.parser.add_section('DASHBOARD')
+        self.set_value('DASHBOARD', 'daily_target', str(words))
+
     def set_default_working_directory(self, new_path):
         """Sets the default working directory in the config file"""
         self.set_value('PATHS', 'working_directory', new_path)
 
-    def set_working_directory_to_repo(self):
-        """Sets the default working directory to the git repo."""
-        git_cmd = GitCommand()
-        root = git_cmd.get_repo_root()
+    def set_working_directory_to_repo(self, root=None):
+        """Sets the default working directory to the git repo (root, if already known)."""
+        if root is None:
+            import commands
+            root = commands.get_git_command().get_repo_root()
         self.set_default_working_directory(root)
         # Defaults to git repo root if it exists
-        app.change_working_directory(root)
+        if os.getcwd() != root:
+            app.change_working_directory(root)
 
     def factory_reset(self):
         """Deletes the existing config file, returning the app to its default state"""
@@ -218,3 +385,12 @@ class AppConfig(Config):
         except (OSError, FileNotFoundError) as e:
             app.print_error(f"Could not perform factory reset: {e}")
             app.prompt_exit()
+
+
+__app_configs = {}
+
+def get_app_config(quiet=False):
+    """Returns the session's shared AppConfig (one per quiet flag)"""
+    if quiet not in __app_configs:
+        __app_configs[quiet] = AppConfig(quiet=quiet)
+    return __app_configs[quiet]
@@ -0,0 +1,134 @@
+"""An index of the daily notes (YEAR/YEAR-MONTH/YEAR-MONTH-DAY.md under the daily notes root):
+    day => (path, size). Persisted between sessions; only the folders whose mtime changed
+    (a note was added, removed or renamed) are listed again."""
+import os
+import re
+import json
+from datetime import date
+import app_utils as app
+
+YEAR_PATTERN = re.compile(r"\d{4}")
+MONTH_PATTERN = re.compile(r"(\d{4})-(\d{2})")
+NOTE_PATTERN = re.compile(r"(\d{4})-(\d{2})-(\d{2})\.md")
+CACHE_VERSION = 1
+
+class DailyNotesIndex:
+    """The daily notes under root, by day. A folder is listed again only when its mtime changed
+        (the current month always is, so the size of today's note stays current)."""
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+        self.cache_path = app.get_user_cache_resource_path("daily-notes.json",
+            repo_root=self.root)
+        # year => (mtime_ns, [month folder names])
+        self._years = {}
+        # 'YEAR/YEAR-MONTH' => (mtime_ns, {'YEAR-MONTH-DAY': (file name, size)})
+        self._months = {}
+        self.__load()
+
+    def __load(self):
+        """Loads the notes indexed in a previous session (if any)"""
+        try:
+            with open(self.cache_path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if not isinstance(data, dict) or data.get("version") != CACHE_VERSION:
+            return
+        self._years = {year: (mtime, months) for year, (mtime, months) in data["years"].items()}
+        self._months = {month: (mtime, {day: tuple(note) for day, note in notes.items()})
+            for month, (mtime, notes) in data["months"].items()}
+
+    def __save(self):
+        """Writes the index to the cache file (atomically)"""
+        data = {"version": CACHE_VERSION, "years": self._years, "months": self._months}
+        temp_path = f"{self.cache_path}.tmp"
+        try:
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, separators=(",", ":"))
+            os.replace(temp_path, self.cache_path)
+        except OSError:
+            pass
+
+    @staticmethod
+    def __get_mtime(path):
+        """Returns the mtime (ns) of a folder, or None if it doesn't exist"""
+        try:
+            return os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+
+    @staticmethod
+    def __list(path, pattern, files=False):
+        """Returns the folders (or files, with their size) of path whose name matches pattern"""
+        entries = {}
+        try:
+            with os.scandir(path) as it:
+                for entry in it:
+                    if not pattern.fullmatch(entry.name):
+                        continue
+                    if files and entry.is_file():
+                        entries[entry.name] = entry.stat().st_size
+                    elif not files and entry.is_dir():
+                        entries[entry.name] = None
+        except OSError:
+            pass
+        return entries
+
+    def refresh(self, today=None):
+        """Brings the index up to date. Returns whether anything changed."""
+        today = today or date.today()
+        current_month = f"{today:%Y}/{today:%Y-%m}"
+        years = {}
+        months = {}
+        for year in sorted(self.__list(self.root, YEAR_PATTERN)):
+            year_path = os.path.join(self.root, year)
+            mtime = self.__get_mtime(year_path)
+            known = self._years.get(year)
+            if known is not None and known[0] == mtime:
+                month_names = known[1]
+            else:
+                month_names = sorted(name for name in self.__list(year_path, MONTH_PATTERN)
+                    if name.startswith(f"{year}-"))
+            years[year] = (mtime, month_names)
+            for month_name in month_names:
+                month = f"{year}/{month_name}"
+                month_path = os.path.join(year_path, month_name)
+                mtime = self.__get_mtime(month_path)
+                known = self._months.get(month)
+                if known is not None and known[0] == mtime and month != current_month:
+                    months[month] = known
+                    continue
+                notes = {}
+                for name, size in self.__list(month_path, NOTE_PATTERN, files=True).items():
+                    day = name[:-len(".md")]
+                    if day.startswith(f"{month_name}-"):
+                        notes[day] = (name, size)
+                months[month] = (mtime, notes)
+        is_changed = years != self._years or months != self._months
+        self._years, self._months = years, months
+        if is_changed:
+            self.__save()
+        return is_changed
+
+    def get_notes(self):
+        """Returns {date: (path, size)} of every indexed note"""
+        notes = {}
+        for month, (_, month_notes) in self._months.items():
+            for day, (name, size) in month_notes.items():
+                try:
+                    notes[date.fromisoformat(day)] = (
+                        os.path.join(self.root, month.replace("/", os.sep), name), size)
+                except ValueError:
+                    continue
+        return notes
+
+
+__indexes = {}
+
+def get_daily_notes_index(root):
+    """Returns the (shared) daily notes index of a daily notes root"""
+    root = os.path.abspath(root)
+    if root not in __indexes:
+        __indexes[root] = DailyNotesIndex(root)
+    return __indexes[root]
@@ -0,0 +1,86 @@
+"""The writing dashboard: words written per day & week, streaks and progress to a daily target.
+    Built from the word history's daily totals, plus today's uncommitted changes."""
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from typing import Dict, List, Tuple
+
+DEFAULT_DAILY_TARGET = 500
+DAYS_SHOWN = 7
+WEEKS_SHOWN = 8
+BAR_WIDTH = 30
+
+@dataclass
+class DashboardStats:
+    """Words written (net) recently, and the writing streaks"""
+    today: int = 0
+    # Monday to today
+    this_week: int = 0
+    # Consecutive days with words written, up to today (or yesterday, until today has some)
+    streak: int = 0
+    best_streak: int = 0
+    # (day, words), oldest first
+    days: List[Tuple[date, int]] = field(default_factory=list)
+    # (monday, words), oldest first
+    weeks: List[Tuple[date, int]] = field(default_factory=list)
+
+    @classmethod
+    def build(cls, daily_words, uncommitted=0, today=None):
+        """Builds the stats from {'YYYY-MM-DD': words} (see WordHistory.get_daily_words)
+            and the words of the uncommitted changes (counted as today's)"""
+        today = today or date.today()
+        words: Dict[date, int] = {}
+        for day, day_words in daily_words.items():
+            try:
+                words[date.fromisoformat(day)] = day_words
+            except ValueError:
+                continue
+        words[today] = words.get(today, 0) + uncommitted
+        stats = cls(today=words[today])
+        monday = today - timedelta(days=today.weekday())
+        stats.this_week = sum(words.get(monday + timedelta(days=i), 0)
+            for i in range((today - monday).days + 1))
+        stats.days = [(day, words.get(day, 0))
+            for day in (today - timedelta(days=i) for i in reversed(range(DAYS_SHOWN)))]
+        for i in reversed(range(WEEKS_SHOWN)):
+            start = monday - timedelta(weeks=i)
+            stats.weeks.append((start, sum(words.get(start + timedelta(days=d), 0)
+                for d in range(7))))
+        # Streaks: runs of consecutive days with words written
+        run = 0
+        previous = None
+        for day in sorted(day for day, day_words in words.items() if day_words > 0):
+            run = run + 1 if previous is not None and day - previous == timedelta(days=1) else 1
+            stats.best_streak = max(stats.best_streak, run)
+            previous = day
+        if previous is not None and today - previous <= timedelta(days=1):
+            stats.streak = run
+        return stats
+
+
+def __get_bar(value, maximum, width=BAR_WIDTH):
+    """Returns a horizontal bar of value out of maximum"""
+    filled = 0 if maximum <= 0 else round(width * min(max(value, 0), maximum) / maximum)
+    return "█" * filled + "░" * (width - filled)
+
+def show(stats, target=DEFAULT_DAILY_TARGET, note_words=None):
+    """Prints the dashboard. note_words: the words of today's daily note (if any)."""
+    print("\n[Dashboard]:")
+    if target > 0:
+        percent = int(100 * max(stats.today, 0) / target)
+        print(f"Today: {stats.today:,} / {target:,} words "
+            f"{__get_bar(stats.today, target, width=20)} {percent}%")
+    else:
+        print(f"Today: {stats.today:,} words")
+    if note_words is not None:
+        print(f"Daily Note: {note_words:,} words")
+    print(f"This Week: {stats.this_week:,} words")
+    print(f"Streak: {stats.streak} day{'' if stats.streak == 1 else 's'} "
+        f"(best: {stats.best_streak})")
+    most = max([words for _, words in stats.days] + [target])
+    print(f"\nLast {DAYS_SHOWN} Days:")
+    for day, words in stats.days:
+        print(f"  {day:%a %m-%d} {words:>8,} {__get_bar(words, most)}")
+    most = max(words for _, words in stats.weeks)
+    print(f"\nLast {WEEKS_SHOWN} Weeks:")
+    for monday, words in stats.weeks:
+        print(f"  {monday:%Y-%m-%d} {words:>8,} {__get_bar(words, most)}")
@@ -0,0 +1,159 @@
+"""Added/removed lines and words of every changed file, from one 'git diff' call
+    (numstat for the line counts, followed by a zero-context patch for the words)"""
+import os
+import subprocess
+from dataclasses import dataclass
+
+# Staged & unstaged changes compared to a commit (or tree): '<added>\t<removed>\t<path>\0'
+# records (renames: '<added>\t<removed>\t\0<old path>\0<new path>\0'), an empty record,
+# then the patch of every file, in the same order
+DIFF_STATS_COMMAND = ["git", "diff", "--numstat", "-z", "--patch", "--unified=0",
+    "--no-color", "--no-ext-diff"]
+# Compared to when there's no commit yet
+EMPTY_TREE = "4b825dc642cb6eb9a060e54bf8d69288fbee4904"
+READ_SIZE = 256 * 1024
+# Untracked files are read directly, up to this size
+MAX_UNTRACKED_SIZE = 1024 * 1024
+# Words are only counted up to this much patch (e.g. not for a bulk reformat), lines always are
+MAX_PATCH_SIZE = 16 * 1024 * 1024
+
+def count_words(data):
+    """Returns the number of whitespace-separated words of a bytes or str value"""
+    return len(data.split())
+
+def is_binary(data):
+    """Returns whether file contents (bytes) look binary, like Git decides (a NUL early on)"""
+    return b"\0" in data[:8000]
+
+@dataclass
+class DiffStat:
+    """The size of one file's changes"""
+    added: int = 0
+    removed: int = 0
+    words_added: int = 0
+    words_removed: int = 0
+    is_binary: bool = False
+    is_untracked: bool = False
+    # False when the patch was too big to count the words
+    has_word_counts: bool = True
+
+    def get_word_delta(self):
+        """Returns the net number of words written (negative if more were removed)"""
+        return self.words_added - self.words_removed
+
+    def get_description(self):
+        """Returns a one-line summary, e.g. '+12 -3 lines, +85 words'"""
+        if self.is_binary:
+            return "Binary file"
+        description = f"+{self.added} -{self.removed} lines"
+        if self.has_word_counts:
+            description += f", {self.get_word_delta():+,} words"
+        return f"{description} (untracked)" if self.is_untracked else description
+
+    @classmethod
+    def read_untracked(cls, fpath):
+        """Counts the lines & words of an untracked (new) file. None if too big or unreadable."""
+        try:
+            if os.path.getsize(fpath) > MAX_UNTRACKED_SIZE:
+                return None
+            with open(fpath, "rb") as file:
+                data = file.read()
+        except OSError:
+            return None
+        if is_binary(data):
+            return cls(is_binary=True, is_untracked=True)
+        return cls(added=len(data.splitlines()), words_added=count_words(data),
+            is_untracked=True)
+
+
+def __read_numstat(stream):
+    """Reads the numstat records. Returns ([(path, DiffStat)], the bytes read past them)."""
+    buffer = b""
+    start = 0
+    while True:
+        end = buffer.find(b"\0\0", start)
+        if end != -1:
+            break
+        data = stream.read1(READ_SIZE)
+        if not data:
+            end = len(buffer)
+            break
+        start = max(0, len(buffer) - 1)
+        buffer += data
+    records = [record for record in buffer[:end].split(b"\0") if record]
+    entries = []
+    i = 0
+    while i < len(records):
+        added, removed, path = records[i].split(b"\t", 2)
+        i += 1
+        if not path:
+            # Rename (or copy): the old path, then the new one
+            path = records[i + 1]
+            i += 2
+        is_binary = added == b"-"
+        entries.append((path.decode("utf-8", errors="surrogateescape"), DiffStat(
+            0 if is_binary else int(added), 0 if is_binary else int(removed),
+            is_binary=is_binary)))
+    return entries, buffer[end + 2:]
+
+def __iter_lines(head, stream):
+    """Yields the lines of head followed by the rest of the stream"""
+    partial = head
+    while True:
+        data = stream.read1(READ_SIZE)
+        if not data:
+            break
+        lines = (partial + data).split(b"\n")
+        partial = lines.pop()
+        yield from lines
+    yield from partial.split(b"\n")
+
+def __count_patch_words(entries, lines):
+    """Adds the words of the added & removed lines of each file's patch to its DiffStat.
+        Returns False if the patch is over MAX_PATCH_SIZE (counts are then incomplete)."""
+    index = -1
+    is_in_hunk = False
+    stat = None
+    size = 0
+    for line in lines:
+        size += len(line) + 1
+        if size > MAX_PATCH_SIZE:
+            return False
+        if line.startswith(b"diff --git "):
+            index += 1
+            is_in_hunk = False
+            stat = entries[index][1] if index < len(entries) else None
+        elif line.startswith(b"@@"):
+            is_in_hunk = True
+        elif is_in_hunk and stat is not None:
+            if line.startswith(b"+"):
+                stat.words_added += count_words(line[1:])
+            elif line.startswith(b"-"):
+                stat.words_removed += count_words(line[1:])
+    return True
+
+def read_diff_stats(root, oid=None):
+    """Returns {path: DiffStat} of the staged & unstaged changes of the repo at root,
+        compared to the commit oid (None before the first commit). Paths are relative to root.
+        Returns None if 'git diff' failed."""
+    try:
+        process = subprocess.Popen(DIFF_STATS_COMMAND + [oid or EMPTY_TREE, "--"], cwd=root,
+            stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    except OSError:
+        return None
+    with process:
+        try:
+            entries, head = __read_numstat(process.stdout)
+            if not __count_patch_words(entries, __iter_lines(head, process.stdout)):
+                process.kill()
+                for _, stat in entries:
+                    stat.words_added = stat.words_removed = 0
+                    stat.has_word_counts = False
+                return dict(entries)
+        except ValueError:
+            # Unexpected output
+            process.kill()
+            return None
+    if process.returncode != 0:
+        return None
+    return dict(entries)
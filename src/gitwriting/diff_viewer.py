@@ -0,0 +1,303 @@
+"""A curses viewer for 'git diff', reading the diff incrementally from a single process.
+    Only the visible lines are read back and drawn, so huge diffs open right away."""
+import curses
+import tempfile
+import subprocess
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from picker import KEYS_UP, KEYS_DOWN, KEYS_LEFT, KEYS_RIGHT, KEY_ESC
+
+# Every change of the working tree (the same files as GitCommand.get_diff_options)
+DIFF_COMMAND = ["git", "-c", "core.quotePath=false", "diff", "--no-color", "--no-ext-diff"]
+FILE_HEADER = b"diff --git "
+HUNK_HEADER = b"@@"
+TAB_SIZE = 4
+
+KEYS_QUIT = (KEY_ESC, ord("q"))
+KEYS_PAGE_DOWN = (curses.KEY_NPAGE, ord(" "))
+KEYS_PAGE_UP = (curses.KEY_PPAGE, ord("b"))
+KEYS_TOP = (curses.KEY_HOME, ord("g"))
+KEYS_BOTTOM = (curses.KEY_END, ord("G"))
+KEYS_NEXT_FILE = KEYS_RIGHT + (ord("]"),)
+KEYS_PREVIOUS_FILE = KEYS_LEFT + (ord("["),)
+KEYS_NEXT_HUNK = (ord("n"),)
+KEYS_PREVIOUS_HUNK = (ord("p"), ord("N"))
+HELP = ("(esc|q - quit, w/s - scroll, space/b - page, a/d - prev/next file, "
+    "p/n - prev/next hunk, g/G - top/end)")
+
+def get_file_name(header):
+    """Returns the path of a 'diff --git a/<path> b/<path>' header line (decoded)"""
+    body = header[len(FILE_HEADER):].rstrip(b"\r")
+    # Same path on both sides (no rename): 'a/' + path + ' b/' + path
+    length = (len(body) - 5) // 2
+    if length > 0 and body[2:2 + length] == body[-length:]:
+        body = body[2:2 + length]
+    return body.decode("utf-8", errors="replace")
+
+
+class DiffStream:
+    """The output of a diff command, read on demand into a temporary (spool) file.
+        Only a sparse index of line offsets and the positions of the file & hunk headers
+        are kept in memory, plus a few recently read blocks of lines."""
+    CHECKPOINT_LINES = 256
+    READ_SIZE = 256 * 1024
+    MAX_CACHED_BLOCKS = 8
+
+    def __init__(self, command=None, cwd=None):
+        self._process = subprocess.Popen(command or DIFF_COMMAND, cwd=cwd,
+            stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        self._spool = tempfile.TemporaryFile()
+        self._partial = b""
+        # Offset of the next (complete) line in the spool
+        self._next_offset = 0
+        # Offset of every CHECKPOINT_LINES-th line
+        self._checkpoints = array("Q")
+        # block index => decoded lines
+        self._blocks = OrderedDict()
+        self.line_count = 0
+        self.is_complete = False
+        # Line numbers of the file & hunk headers, and the path of each file
+        self.file_lines = array("Q")
+        self.file_names = []
+        self.hunk_lines = array("Q")
+
+    def __add_line(self, line):
+        """Indexes one complete line"""
+        if self.line_count % self.CHECKPOINT_LINES == 0:
+            self._checkpoints.append(self._next_offset)
+        if line.startswith(FILE_HEADER):
+            self.file_lines.append(self.line_count)
+            self.file_names.append(get_file_name(line))
+        elif line.startswith(HUNK_HEADER):
+            self.hunk_lines.append(self.line_count)
+        self._next_offset += len(line) + 1
+        self.line_count += 1
+
+    def read_more(self):
+        """Reads the next chunk of the diff. Returns False once everything was read."""
+        if self.is_complete:
+            return False
+        data = self._process.stdout.read1(self.READ_SIZE)
+        if not data:
+            if self._partial:
+                # Last line without a newline
+                self._spool.seek(0, 2)
+                self._spool.write(b"\n")
+                self.__add_line(self._partial)
+                self._partial = b""
+            self.close_process()
+            self.is_complete = True
+            return False
+        self._spool.seek(0, 2)
+        self._spool.write(data)
+        lines = (self._partial + data).split(b"\n")
+        self._partial = lines.pop()
+        for line in lines:
+            self.__add_line(line)
+        return True
+
+    def read_until(self, line_count):
+        """Reads until at least line_count lines are available (or the end)"""
+        while self.line_count < line_count and self.read_more():
+            pass
+
+    def __get_block(self, index):
+        """Returns the lines of a block (CHECKPOINT_LINES lines, from the spool)"""
+        lines = self._blocks.get(index)
+        if lines is not None:
+            self._blocks.move_to_end(index)
+            return lines
+        start = self._checkpoints[index]
+        end = (self._checkpoints[index + 1] if index + 1 < len(self._checkpoints)
+            else self._next_offset)
+        self._spool.seek(start)
+        data = self._spool.read(end - start)
+        lines = data.decode("utf-8", errors="replace").split("\n")[:-1]
+        # Only complete blocks are cached (the last one may still grow)
+        if len(lines) == self.CHECKPOINT_LINES:
+            self._blocks[index] = lines
+            if len(self._blocks) > self.MAX_CACHED_BLOCKS:
+                self._blocks.popitem(last=False)
+        return lines
+
+    def get_lines(self, start, count):
+        """Returns up to count lines from line start"""
+        self.read_until(start + count)
+        end = min(start + count, self.line_count)
+        lines = []
+        index = start
+        while index < end:
+            block = self.__get_block(index // self.CHECKPOINT_LINES)
+            offset = index % self.CHECKPOINT_LINES
+            lines.extend(block[offset:offset + end - index])
+            index = start + len(lines)
+        return lines
+
+    def find_next(self, positions, line):
+        """Returns the first position after line, reading as needed (or None)"""
+        while True:
+            index = bisect_right(positions, line)
+            if index < len(positions):
+                return positions[index]
+            if not self.read_more():
+                return None
+
+    @staticmethod
+    def find_previous(positions, line):
+        """Returns the last position (e.g. of hunk_lines) before line (or None)"""
+        index = bisect_left(positions, line)
+        return positions[index - 1] if index > 0 else None
+
+    def find_file(self, path):
+        """Returns the line of the header of a file's diff, reading as needed (or None)"""
+        checked = 0
+        while True:
+            for i in range(checked, len(self.file_names)):
+                if self.file_names[i] == path:
+                    return self.file_lines[i]
+            checked = len(self.file_names)
+            if not self.read_more():
+                return None
+
+    def get_file_at(self, line):
+        """Returns (index, path) of the file whose diff contains line (or (-1, None))"""
+        index = bisect_right(self.file_lines, line) - 1
+        return (index, self.file_names[index]) if index >= 0 else (-1, None)
+
+    def close_process(self):
+        """Stops the diff command (if still running)"""
+        if self._process.poll() is None:
+            self._process.kill()
+        self._process.stdout.close()
+        self._process.wait()
+
+    def close(self):
+        """Stops the diff command and deletes the spool file"""
+        self.close_process()
+        self._spool.close()
+
+
+class DiffViewer:
+    """Scrolls through a DiffStream, drawing only the visible lines"""
+    def __init__(self, stream, title="Git Diff"):
+        self.stream = stream
+        self.title = title
+        self.top = 0
+        self._attributes = {}
+
+    def show(self, path=None):
+        """Shows the diff (starting at a file's diff, if given) until the viewer is quit"""
+        if path is not None:
+            self.top = self.stream.find_file(path) or 0
+        curses.wrapper(self.__run)
+
+    def __config_curses(self):
+        """Configures curses (colors, if available)"""
+        try:
+            curses.use_default_colors()
+            curses.curs_set(0)
+            if hasattr(curses, "set_escdelay"):
+                curses.set_escdelay(25)
+        except curses.error:
+            pass
+        self._attributes = {"header": curses.A_BOLD, "hunk": curses.A_NORMAL,
+            "added": curses.A_NORMAL, "removed": curses.A_NORMAL}
+        if curses.has_colors():
+            try:
+                curses.init_pair(1, curses.COLOR_GREEN, -1)
+                curses.init_pair(2, curses.COLOR_RED, -1)
+                curses.init_pair(3, curses.COLOR_CYAN, -1)
+                self._attributes.update(added=curses.color_pair(1),
+                    removed=curses.color_pair(2), hunk=curses.color_pair(3))
+            except curses.error:
+                pass
+
+    def __get_attribute(self, line):
+        """Returns the curses attribute of a diff line"""
+        if line.startswith(("diff --git", "index ", "--- ", "+++ ", "new file", "deleted file")):
+            return self._attributes["header"]
+        if line.startswith("@@"):
+            return self._attributes["hunk"]
+        if line.startswith("+"):
+            return self._attributes["added"]
+        if line.startswith("-"):
+            return self._attributes["removed"]
+        return curses.A_NORMAL
+
+    def draw(self, screen):
+        """Draws the title, the visible lines and the footer"""
+        max_y, max_x = screen.getmaxyx()
+        rows = max(1, max_y - 2)
+        lines = self.stream.get_lines(self.top, rows)
+        screen.erase()
+        file_index, path = self.stream.get_file_at(self.top)
+        file_total = f"{len(self.stream.file_names)}{'' if self.stream.is_complete else '+'}"
+        title = f"{self.title}: {path or '-'} (file {file_index + 1}/{file_total})"
+        screen.addnstr(0, 0, title, max_x - 1, curses.A_REVERSE)
+        for i, line in enumerate(lines):
+            text = line.expandtabs(TAB_SIZE).replace("\0", "")
+            screen.addnstr(i + 1, 0, text, max_x - 1, self.__get_attribute(line))
+        if not lines:
+            screen.addnstr(1, 0, "No changes.", max_x - 1)
+        position = f"line {self.top + 1}/{self.stream.line_count}" + (
+            "" if self.stream.is_complete else "+")
+        screen.addnstr(max_y - 1, 0, f"{position} {HELP}", max_x - 1, curses.A_REVERSE)
+        screen.refresh()
+
+    def __scroll_to(self, line):
+        """Moves the top of the view to line (if it exists)"""
+        if line is None:
+            return
+        self.stream.read_until(line + 1)
+        self.top = max(0, min(line, self.stream.line_count - 1))
+
+    def handle_key(self, key, rows):
+        """Applies one key press. Returns False to quit."""
+        stream = self.stream
+        if key in KEYS_QUIT:
+            return False
+        if key in KEYS_DOWN:
+            self.__scroll_to(self.top + 1)
+        elif key in KEYS_UP:
+            self.__scroll_to(self.top - 1)
+        elif key in KEYS_PAGE_DOWN:
+            self.__scroll_to(self.top + rows)
+        elif key in KEYS_PAGE_UP:
+            self.__scroll_to(max(0, self.top - rows))
+        elif key in KEYS_TOP:
+            self.top = 0
+        elif key in KEYS_BOTTOM:
+            stream.read_until(float("inf"))
+            self.__scroll_to(max(0, stream.line_count - rows))
+        elif key in KEYS_NEXT_FILE:
+            self.__scroll_to(stream.find_next(stream.file_lines, self.top))
+        elif key in KEYS_PREVIOUS_FILE:
+            self.__scroll_to(stream.find_previous(stream.file_lines, self.top))
+        elif key in KEYS_NEXT_HUNK:
+            self.__scroll_to(stream.find_next(stream.hunk_lines, self.top))
+        elif key in KEYS_PREVIOUS_HUNK:
+            self.__scroll_to(stream.find_previous(stream.hunk_lines, self.top))
+        return True
+
+    def __run(self, screen):
+        """The curses loop"""
+        self.__config_curses()
+        while True:
+            try:
+                self.draw(screen)
+            except curses.error:
+                # Terminal too small
+                pass
+            rows = max(1, screen.getmaxyx()[0] - 2)
+            if not self.handle_key(screen.getch(), rows):
+                return
+
+
+def show_diff(path=None, cwd=None):
+    """Shows the working tree's diff in the viewer, starting at a file's diff (if given)"""
+    stream = DiffStream(cwd=cwd)
+    try:
+        DiffViewer(stream).show(path)
+    finally:
+        stream.close()
@@ -0,0 +1,193 @@
+"""Fetches the current repo in the background (on launch, then at an interval),
+    so showing the status never waits on the network"""
+import os
+import time
+import atexit
+import threading
+import subprocess
+from contextlib import contextmanager
+from dataclasses import dataclass, replace
+from typing import Optional
+import app_utils as app
+import git_workers
+
+# Seconds between background fetches, unless configured (0 disables them)
+DEFAULT_INTERVAL = 300
+FETCH_TIMEOUT = 120
+FETCH_COMMAND = ["git", "fetch", "--quiet"]
+# Prints '<behind> <ahead>' compared to the upstream
+AHEAD_BEHIND_COMMAND = ["git", "rev-list", "--left-right", "--count", "@{upstream}...HEAD"]
+UPSTREAM_COMMAND = ["git", "rev-parse", "--abbrev-ref", "--symbolic-full-name", "@{upstream}"]
+
+@dataclass(frozen=True)
+class FetchState:
+    """The outcome of the latest background fetch (replaced as a whole, never modified)"""
+    is_fetching: bool = False
+    # When the latest fetch ended (time.time()), None before the first one
+    fetched_at: Optional[float] = None
+    error: Optional[str] = None
+    # None without an upstream branch
+    upstream: Optional[str] = None
+    ahead: int = 0
+    behind: int = 0
+
+
+class FetchScheduler:
+    """Runs 'git fetch' in a background thread: when started, every interval seconds
+        and whenever requested. At most one fetch is in flight."""
+    def __init__(self, root, interval=DEFAULT_INTERVAL):
+        self.root = root
+        self.interval = interval
+        self.state = FetchState()
+        self._wakeup = threading.Event()
+        self._is_stopping = False
+        self._thread = None
+        self._process = None
+        # Set when a foreground command stopped the current fetch (see hold())
+        self._is_interrupted = False
+        # Held while fetching (or while a foreground command must not overlap a fetch)
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Starts fetching in the background (fetches right away)"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self.__run, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Stops the background fetches (cancelling the current one, if any)"""
+        self._is_stopping = True
+        self._wakeup.set()
+        process = self._process
+        if process is not None and process.poll() is None:
+            process.terminate()
+
+    def request(self):
+        """Asks for a fetch as soon as possible, without waiting for it"""
+        self._wakeup.set()
+
+    def refresh_ahead_behind(self):
+        """Updates the ahead/behind counts right away (e.g. after a pull), without fetching"""
+        upstream, ahead, behind = self.__get_ahead_behind()
+        self.state = replace(self.state, upstream=upstream, ahead=ahead, behind=behind)
+
+    @contextmanager
+    def hold(self):
+        """Stops the current fetch (if any), then keeps new fetches from starting
+            within the block (e.g. around 'git pull', which fetches by itself).
+            Yields False if Ctrl-C was pressed while waiting for the fetch to stop."""
+        if not self._lock.acquire(blocking=False):
+            app.print_info("Stopping the background fetch...")
+            self._is_interrupted = True
+            process = self._process
+            if process is not None and process.poll() is None:
+                process.terminate()
+            try:
+                self._lock.acquire()
+            except KeyboardInterrupt:
+                app.print_warning("Cancelled while waiting for the background fetch.")
+                yield False
+                return
+        try:
+            self._is_interrupted = False
+            yield True
+        finally:
+            self._lock.release()
+
+    def __run(self):
+        """The background thread: fetch, then sleep until the interval ends or a request"""
+        while not self._is_stopping:
+            with self._lock:
+                self.__fetch()
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+
+    def __fetch(self):
+        """Fetches, then publishes the new state"""
+        self.state = replace(self.state, is_fetching=True)
+        self._is_interrupted = False
+        error = None
+        try:
+            self._process = subprocess.Popen(FETCH_COMMAND, cwd=self.root,
+                env=git_workers.get_batch_env(), stdin=subprocess.DEVNULL,
+                stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+            _, stderr = self._process.communicate(timeout=FETCH_TIMEOUT)
+            if self._process.returncode != 0:
+                error = git_workers.get_error_message(stderr, "'git fetch' failed")
+        except subprocess.TimeoutExpired:
+            self._process.kill()
+            self._process.communicate()
+            error = f"'git fetch' timed out after {FETCH_TIMEOUT}s"
+        except OSError as e:
+            error = str(e)
+        finally:
+            self._process = None
+        if self._is_stopping:
+            return
+        if self._is_interrupted:
+            # Stopped for a foreground command: not a failure, nor a completed fetch
+            self.state = replace(self.state, is_fetching=False)
+            return
+        upstream, ahead, behind = self.__get_ahead_behind()
+        self.state = FetchState(False, time.time(), error, upstream, ahead, behind)
+
+    def __get_ahead_behind(self):
+        """Returns (upstream, ahead, behind) of the current branch (upstream None without one)"""
+        import commands
+        upstream = commands.execute(UPSTREAM_COMMAND, cwd=self.root,
+            timeout=commands.QUERY_TIMEOUT)
+        counts = commands.execute(AHEAD_BEHIND_COMMAND, cwd=self.root,
+            timeout=commands.QUERY_TIMEOUT) if upstream.is_success() else None
+        try:
+            behind, ahead = counts.get_text().split()
+            return upstream.get_text().strip(), int(ahead), int(behind)
+        except (AttributeError, ValueError):
+            return None, 0, 0
+
+
+def format_age(timestamp, now=None):
+    """Returns how long ago a time.time() value was, e.g. 'just now' or '5 min ago'"""
+    seconds = (now or time.time()) - timestamp
+    if seconds < 60:
+        return "just now"
+    if seconds < 60 * 60:
+        return f"{int(seconds // 60)} min ago"
+    if seconds < 24 * 60 * 60:
+        return f"{int(seconds // (60 * 60))} h ago"
+    return f"{int(seconds // (24 * 60 * 60))} d ago"
+
+
+__scheduler = None
+__interval = DEFAULT_INTERVAL
+
+def set_interval(seconds):
+    """Sets the seconds between background fetches (0 disables them)"""
+    global __interval
+    __interval = max(0, seconds or 0)
+    if __scheduler is not None:
+        __scheduler.interval = __interval
+        if __interval == 0:
+            stop()
+
+def get_fetch_scheduler(root):
+    """Returns the background fetcher of a repo root, started on first use
+        (the previous repo's, if any, is stopped). None if background fetches are disabled."""
+    global __scheduler
+    if __interval == 0 or not root:
+        return None
+    root = os.path.normpath(root)
+    if __scheduler is not None and __scheduler.root == root:
+        return __scheduler
+    stop()
+    __scheduler = FetchScheduler(root, __interval)
+    __scheduler.start()
+    return __scheduler
+
+def stop():
+    """Stops the background fetches"""
+    global __scheduler
+    if __scheduler is not None:
+        __scheduler.stop()
+        __scheduler = None
+
+atexit.register(stop)
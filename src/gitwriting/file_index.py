@@ -0,0 +1,187 @@
+"""An index of the files in the working directory, for opening any file by (fuzzy) name.
+    Persisted between sessions and refreshed in a background thread."""
+import os
+import json
+import bisect
+import threading
+import app_utils as app
+import commands
+import git_workers
+from match_index import MatchIndex
+
+TRACKED_COMMAND = ["git", "ls-files", "-z", "--cached"]
+UNTRACKED_COMMAND = ["git", "ls-files", "-z", "--others", "--exclude-standard"]
+CACHE_VERSION = 1
+# Above this many added files, sorting all the files again beats inserting each one
+MAX_INSERTED_FILES = 1000
+# Outside of a repo (e.g. the home folder), the walk stops this deep, or at this many files
+MAX_WALK_DEPTH = 6
+MAX_WALKED_FILES = 20_000
+
+class FileIndex:
+    """Paths of the tracked and untracked (not ignored) files under root, relative to root.
+        The tracked files are only listed again when the Git index changes,
+        and the untracked files can be taken from an up-to-date repo snapshot.
+        Only the files added or removed since the last update change the sorted files.
+        Outside of a repo, the (non-hidden) folders are walked instead, up to a limit."""
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+        self.cache_path = app.get_user_cache_resource_path("files.json", repo_root=self.root)
+        self._tracked = []
+        self._untracked = []
+        self._index_stamp = None
+        # Sorted files & their match index, replaced together once an update completes
+        self._files = None
+        self._match_index = None
+        self._thread = None
+        self._lock = threading.Lock()
+        self.__load()
+
+    def __load(self):
+        """Loads the files indexed in a previous session (if any)"""
+        try:
+            with open(self.cache_path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if not isinstance(data, dict) or data.get("version") != CACHE_VERSION:
+            return
+        self._tracked = data.get("tracked", [])
+        self._untracked = data.get("untracked", [])
+        stamp = data.get("index_stamp")
+        self._index_stamp = tuple(stamp) if stamp else None
+        self._files = sorted(set(self._tracked).union(self._untracked))
+
+    def __save(self):
+        """Writes the index to the cache file (atomically)"""
+        data = {
+            "version": CACHE_VERSION,
+            "index_stamp": self._index_stamp,
+            "tracked": self._tracked,
+            "untracked": self._untracked
+        }
+        temp_path = f"{self.cache_path}.tmp"
+        try:
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, separators=(",", ":"))
+            os.replace(temp_path, self.cache_path)
+        except OSError:
+            pass
+
+    def __list(self, command):
+        """Returns the paths listed by a 'git ls-files -z' command (None on failure)"""
+        result = commands.execute(command, cwd=self.root, timeout=commands.QUERY_TIMEOUT)
+        if not result.is_success():
+            return None
+        return [os.fsdecode(path) for path in result.stdout.split(b"\0") if path]
+
+    def __get_index_stamp(self):
+        """Returns the stat() fingerprint of the Git index, or None outside of a repo"""
+        git_dirs = git_workers.get_default_pool().get_git_dirs(self.root)
+        if git_dirs is None:
+            return None
+        try:
+            st = os.stat(os.path.join(git_dirs[0], "index"))
+        except OSError:
+            # No index yet (nothing staged in a new repo)
+            return (0, 0, 0)
+        return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+    def __walk(self):
+        """Returns the files under root, skipping hidden files & folders
+            (up to MAX_WALK_DEPTH folders down, and MAX_WALKED_FILES files)"""
+        files = []
+        stack = [(self.root, 0)]
+        while stack and len(files) < MAX_WALKED_FILES:
+            directory, depth = stack.pop()
+            try:
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        if entry.name.startswith("."):
+                            continue
+                        if entry.is_dir(follow_symlinks=False):
+                            if depth < MAX_WALK_DEPTH:
+                                stack.append((entry.path, depth + 1))
+                        elif len(files) < MAX_WALKED_FILES:
+                            path = os.path.relpath(entry.path, self.root)
+                            files.append(path.replace(os.sep, "/"))
+            except OSError:
+                continue
+        return files
+
+    def __update(self, untracked):
+        """Brings the index up to date (runs in the background thread)"""
+        index_stamp = self.__get_index_stamp()
+        tracked = self._tracked
+        if index_stamp is None:
+            tracked, untracked = [], self.__walk()
+        elif index_stamp != self._index_stamp or self._files is None:
+            tracked = self.__list(TRACKED_COMMAND)
+            if tracked is None:
+                return
+        if untracked is None:
+            untracked = self.__list(UNTRACKED_COMMAND)
+            if untracked is None:
+                return
+        untracked = sorted(untracked)
+        files, match_index = self._files, self._match_index
+        # Only the files added or removed since the last update change the sorted files
+        new_files = set(tracked).union(untracked)
+        old_files = set(files or ())
+        removed, added = old_files - new_files, new_files - old_files
+        if files is None:
+            files = sorted(new_files)
+        elif len(added) > MAX_INSERTED_FILES:
+            files = sorted(new_files)
+        elif removed or added:
+            files = [path for path in files if path not in removed] if removed else list(files)
+            for path in added:
+                bisect.insort(files, path)
+        if files is not self._files or match_index is None:
+            match_index = MatchIndex(files)
+        is_changed = (files is not self._files or index_stamp != self._index_stamp
+            or untracked != self._untracked)
+        with self._lock:
+            self._files, self._match_index = files, match_index
+            self._tracked, self._untracked, self._index_stamp = tracked, untracked, index_stamp
+        if is_changed:
+            self.__save()
+
+    def refresh(self, untracked=None):
+        """Updates the index in a background thread (unless already updating).
+            untracked: the (root-relative) untracked files, if already known"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self.__update, args=(untracked,), daemon=True)
+            self._thread.start()
+
+    def is_refreshing(self):
+        """Returns whether the index is being updated"""
+        return self._thread is not None and self._thread.is_alive()
+
+    def wait(self, timeout=None):
+        """Waits for the current update to finish"""
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def get_files(self):
+        """Returns the indexed (root-relative) files and their match index (None until built).
+            The files are None if they were never indexed."""
+        with self._lock:
+            return self._files, self._match_index
+
+    def get_full_path(self, path):
+        """Returns the absolute path of an indexed file"""
+        return os.path.normpath(os.path.join(self.root, path))
+
+
+__indexes = {}
+
+def get_file_index(root):
+    """Returns the (shared) file index of a folder"""
+    root = os.path.abspath(root)
+    if root not in __indexes:
+        __indexes[root] = FileIndex(root)
+    return __indexes[root]
@@ -1,46 +1,129 @@
 """Contains various file management functions"""
 import os
+import time
+from collections import OrderedDict
+from collections.abc import Sequence
 import app_utils as app
 
+# Directory listings kept in memory (least recently used are dropped first)
+MAX_CACHED_LISTINGS = 64
+# Coarsest directory mtime resolution to expect (FAT: 2s)
+MTIME_RESOLUTION_NS = 2_000_000_000
+# path => DirectoryListing
+__listings = OrderedDict()
+
 def get_absolute_path(rel_path):
     """Returns the normalized, absolute path of a relative path (with spaces removed)"""
     norm_path = os.path.normpath(rel_path).replace(' ', '')
     return os.path.abspath(norm_path)
 
-def get_entries_in_directory(path, include_hidden=False):
-    """(Python 3.5+) Return a list of DirEntry object names,
-        each corresponding to the entries in the specified directory."""
-    results = []
+class SortedNames(Sequence):
+    """Entry names sorted case-insensitively (folders first), between optional fixed entries.
+        Only sorted once an entry is first read."""
+    def __init__(self, entries, head=(), tail=()):
+        # entries: (name, is_dir) tuples, in directory order
+        self._entries = entries
+        self._head = list(head)
+        self._tail = list(tail)
+        self._sorted = None
+
+    def __len__(self):
+        return len(self._head) + len(self._entries) + len(self._tail)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        if index < len(self._head):
+            return self._head[index]
+        index -= len(self._head)
+        if index >= len(self._entries):
+            return self._tail[index - len(self._entries)]
+        if self._sorted is None:
+            self._sorted = [name for name, _ in sorted(self._entries,
+                key=lambda entry: (not entry[1], entry[0].casefold(), entry[0]))]
+        return self._sorted[index]
+
+
+class DirectoryListing:
+    """The entries of one directory, listed once (with os.scandir())
+        and reused for as long as the directory's mtime doesn't change"""
+    def __init__(self, path):
+        self.path = path
+        self.mtime = os.stat(path).st_mtime_ns
+        self._scan_time = time.time_ns()
+        # (name, is_dir) for every entry
+        self._entries = self.__list()
+        # (include_hidden, folders_only, head, tail) => SortedNames
+        self._views = {}
+
+    def is_valid(self):
+        """Whether the directory is unchanged since it was listed"""
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            return False
+        # A change within the same (coarse) mtime tick as the scan would go unnoticed
+        return mtime == self.mtime and self._scan_time - mtime > MTIME_RESOLUTION_NS
+
+    def __list(self):
+        """Returns (name, is_dir) for every entry of the directory"""
+        entries = []
+        with os.scandir(self.path) as it:
+            for entry in it:
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    is_dir = False
+                entries.append((entry.name, is_dir))
+        return entries
+
+    def get_names(self, include_hidden=False, folders_only=False, head=(), tail=()):
+        """Returns the (lazily sorted) entry names, between the head and tail entries"""
+        key = (include_hidden, folders_only, tuple(head), tuple(tail))
+        if key not in self._views:
+            entries = [(name, is_dir) for name, is_dir in self._entries
+                if (include_hidden or not name.startswith('.')) and (is_dir or not folders_only)]
+            self._views[key] = SortedNames(entries, head=head, tail=tail)
+        return self._views[key]
+
+
+def get_directory_listing(path):
+    """Returns the (cached) listing of a directory, or None if it can't be read"""
+    path = os.path.abspath(path)
+    listing = __listings.get(path)
+    if listing is not None and listing.is_valid():
+        __listings.move_to_end(path)
+        return listing
+    __listings.pop(path, None)
     try:
         if not os.access(path, os.R_OK):
             raise PermissionError
-        for entry in os.scandir(path):
-            if not include_hidden:
-                if not entry.name.startswith('.'):
-                    results.append(entry.name)
-            else:
-                results.append(entry.name)
-    except PermissionError:
+        listing = DirectoryListing(path)
+    except OSError:
         return None
-    return results
+    __listings[path] = listing
+    if len(__listings) > MAX_CACHED_LISTINGS:
+        __listings.popitem(last=False)
+    return listing
+
+def get_entries_in_directory(path, include_hidden=False):
+    """Return the sorted names of the entries in the specified directory (None if unreadable)"""
+    listing = get_directory_listing(path)
+    if listing is None:
+        return None
+    return list(listing.get_names(include_hidden=include_hidden))
 
 def get_folders_in_directory(path, include_hidden=False):
-    """Return an list of names corresponding to the folder entries in the specified directory.
+    """Return the sorted names of the folders in the specified directory (None if unreadable).
         (DIRECTORIES ONLY)"""
-    results = []
-    try:
-        if not os.access(path, os.R_OK):
-            raise PermissionError
-        for entry in os.scandir(path):
-            if not include_hidden:
-                if not entry.name.startswith('.') and entry.is_dir():
-                    results.append(entry.name)
-            else:
-                if entry.is_dir():
-                    results.append(entry.name)
-    except PermissionError:
+    listing = get_directory_listing(path)
+    if listing is None:
         return None
-    return results
+    return list(listing.get_names(include_hidden=include_hidden, folders_only=True))
 
 def create_new_file(new_path):
     """Creates a new file if needed."""
@@ -82,3 +165,11 @@ def is_file(path):
 def is_directory(path):
     """Returns whether the specified path exists is a directory"""
     return bool(os.path.isdir(path))
+
+def count_words(path):
+    """Returns the number of (whitespace-separated) words in a text file, or None if unreadable"""
+    try:
+        with open(path, encoding="utf-8", errors="replace") as file:
+            return len(file.read().split())
+    except OSError:
+        return None
@@ -0,0 +1,246 @@
+"""Long-lived Git helper processes, reused across calls to avoid paying fork/exec per query"""
+import atexit
+import os
+import subprocess
+import threading
+import tracing
+
+class CatFileWorker:
+    """Wraps one long-lived 'git cat-file --batch' or '--batch-check' process.
+        The process is (re)started on demand, so a crashed helper is replaced transparently."""
+    def __init__(self, mode="--batch-check", cwd=None):
+        self.mode = mode
+        self.cwd = cwd
+        self._proc = None
+        self._lock = threading.Lock()
+
+    def _ensure_started(self):
+        """Starts the helper process if it isn't running"""
+        if self._proc is None or self._proc.poll() is not None:
+            self._proc = subprocess.Popen(
+                ["git", "cat-file", self.mode],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+                cwd=self.cwd)
+
+    def _request(self, rev):
+        """Sends one lookup and reads back the header (plus the contents in --batch mode)"""
+        self._ensure_started()
+        self._proc.stdin.write(rev.encode("utf-8") + b"\n")
+        self._proc.stdin.flush()
+        header = self._proc.stdout.readline()
+        if not header:
+            raise BrokenPipeError("git cat-file exited unexpectedly")
+        parts = header.decode("utf-8", errors="replace").rstrip("\n").split(" ")
+        if len(parts) != 3 or parts[-1] in ("missing", "ambiguous"):
+            return None
+        oid, obj_type, size = parts[0], parts[1], int(parts[2])
+        content = None
+        if self.mode == "--batch":
+            # Contents are followed by a single LF
+            content = self._proc.stdout.read(size + 1)[:-1]
+        return oid, obj_type, size, content
+
+    def query(self, rev):
+        """Returns (oid, type, size, contents) for a revision/object name, or None if missing.
+            Contents are only populated in --batch mode."""
+        if not rev or "\n" in rev:
+            return None
+        with self._lock:
+            try:
+                return self._request(rev)
+            except (OSError, ValueError):
+                # Restart once on a broken helper, then give up
+                self.close()
+                try:
+                    return self._request(rev)
+                except (OSError, ValueError):
+                    self.close()
+                    return None
+
+    def close(self):
+        """Stops the helper process"""
+        if self._proc is None:
+            return
+        try:
+            self._proc.stdin.close()
+        except OSError:
+            pass
+        try:
+            self._proc.wait(timeout=1)
+        except subprocess.TimeoutExpired:
+            self._proc.kill()
+        self._proc = None
+
+
+class GitWorkerPool:
+    """Keeps cat-file helpers per repository and memoizes the output of read-only commands.
+        Memoized output is dropped as soon as HEAD, the refs, the index, the stash or
+        .git/info/exclude change."""
+    # Files (relative to the Git dir) whose modification stamps identify the repo state
+    STATE_FILES = ("HEAD", "index", "packed-refs", "logs/HEAD", "logs/refs/stash", "FETCH_HEAD",
+        "info/exclude")
+    # The folder of the loose refs, stamped with every folder below it
+    # (a ref written, renamed or deleted in a folder changes that folder's mtime)
+    REFS_FOLDER = "refs"
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # cwd => (git dir, common git dir), and cwd => work tree root (None without one)
+        self._git_dirs = {}
+        self._roots = {}
+        self._workers = {}
+        self._outputs = {}
+
+    def __discover(self, cwd):
+        """Finds the repo containing cwd with a single 'git rev-parse' (remembered if found)"""
+        import commands
+        # Without a work tree (e.g. within .git), --show-toplevel fails after the git dirs
+        result = commands.execute(
+            ["git", "rev-parse", "--absolute-git-dir", "--git-common-dir", "--show-toplevel"],
+            cwd=cwd, timeout=commands.QUERY_TIMEOUT)
+        output = result.get_lines()
+        if len(output) < 2:
+            # Not a repo (yet). Don't remember, the user may run 'git init' later
+            return
+        git_dirs = (output[0], os.path.normpath(os.path.join(cwd, output[1])))
+        root = os.path.normpath(output[2]) if len(output) > 2 else None
+        self._git_dirs[cwd] = git_dirs
+        self._roots[cwd] = root
+        if root is not None:
+            # The app usually moves to the repo root next, no need to ask again
+            self._git_dirs.setdefault(root, git_dirs)
+            self._roots.setdefault(root, root)
+
+    def get_git_dirs(self, cwd=None):
+        """Returns the (git dir, common git dir) of the repo containing cwd, or None"""
+        cwd = os.path.abspath(cwd or os.getcwd())
+        if cwd not in self._git_dirs:
+            self.__discover(cwd)
+        return self._git_dirs.get(cwd)
+
+    def get_repo_root(self, cwd=None):
+        """Returns the root of the work tree containing cwd, or None"""
+        cwd = os.path.abspath(cwd or os.getcwd())
+        if cwd not in self._git_dirs:
+            self.__discover(cwd)
+        return self._roots.get(cwd)
+
+    def get_state_stamp(self, cwd=None):
+        """Returns a cheap fingerprint of the repo's refs & index, using stat() only"""
+        git_dirs = self.get_git_dirs(cwd)
+        if git_dirs is None:
+            return None
+        stamp = []
+        for git_dir in sorted(set(git_dirs)):
+            for name in self.STATE_FILES:
+                try:
+                    st = os.stat(os.path.join(git_dir, name))
+                    stamp.append((st.st_mtime_ns, st.st_size, st.st_ino))
+                except OSError:
+                    stamp.append(None)
+            stamp.append(self.__get_folders_stamp(os.path.join(git_dir, self.REFS_FOLDER)))
+        return tuple(stamp)
+
+    @staticmethod
+    def __get_folders_stamp(path):
+        """Returns the latest mtime of a folder & all its subfolders, and how many there are"""
+        latest, count = 0, 0
+        stack = [path]
+        while stack:
+            folder = stack.pop()
+            try:
+                latest = max(latest, os.stat(folder).st_mtime_ns)
+                count += 1
+                with os.scandir(folder) as entries:
+                    stack.extend(entry.path for entry in entries
+                        if entry.is_dir(follow_symlinks=False))
+            except OSError:
+                continue
+        return latest, count
+
+    def get_worker(self, mode="--batch-check", cwd=None):
+        """Returns the shared cat-file helper for the repo containing cwd"""
+        git_dirs = self.get_git_dirs(cwd)
+        if git_dirs is None:
+            return None
+        key = (git_dirs[0], mode)
+        with self._lock:
+            if key not in self._workers:
+                self._workers[key] = CatFileWorker(mode=mode, cwd=cwd or os.getcwd())
+            return self._workers[key]
+
+    def get_output(self, command, cwd=None, runner=None):
+        """Returns the (memoized) output lines of a read-only command,
+            or None if the command failed.
+            runner(command, cwd) runs the command when needed (returning lines or None)."""
+        stamp = self.get_state_stamp(cwd)
+        key = (os.path.abspath(cwd or os.getcwd()), tuple(command))
+        if stamp is not None:
+            with self._lock:
+                cached = self._outputs.get(key)
+            if cached is not None and cached[0] == stamp:
+                tracing.count_cache("git output", True)
+                return list(cached[1])
+        tracing.count_cache("git output", False)
+        if runner is not None:
+            output = runner(command, cwd=cwd)
+        else:
+            import commands
+            result = commands.execute(command, cwd=cwd, timeout=commands.QUERY_TIMEOUT)
+            output = result.get_lines() if result.is_success() else None
+        if output is None:
+            return None
+        if stamp is not None:
+            with self._lock:
+                self._outputs[key] = (stamp, output)
+        return list(output)
+
+    def forget_outputs(self):
+        """Forgets all memoized output (e.g. after a command that changed the repo)"""
+        with self._lock:
+            self._outputs.clear()
+
+    def close(self):
+        """Stops every helper process and forgets all memoized output"""
+        with self._lock:
+            for worker in self._workers.values():
+                worker.close()
+            self._workers.clear()
+            self._outputs.clear()
+            self._git_dirs.clear()
+            self._roots.clear()
+
+
+def get_batch_env():
+    """Returns the environment for Git processes that run unattended (e.g. in the background):
+        they must never wait for input (credentials, SSH passphrases, merge messages)"""
+    env = dict(os.environ, GIT_TERMINAL_PROMPT="0", GIT_MERGE_AUTOEDIT="no")
+    env.setdefault("GIT_SSH_COMMAND", "ssh -o BatchMode=yes")
+    return env
+
+
+def get_error_message(stderr, fallback):
+    """Returns the main error line of a failed Git command's stderr ('fatal: ...'), or fallback"""
+    lines = [line.strip() for line in stderr.splitlines() if line.strip()]
+    for line in lines:
+        if line.startswith(("fatal:", "error:")):
+            return line
+    return lines[0] if lines else fallback
+
+
+__default_pool = None
+
+def get_default_pool():
+    """Returns the app-wide worker pool (created on first use)"""
+    global __default_pool
+    if __default_pool is None:
+        __default_pool = GitWorkerPool()
+        atexit.register(__default_pool.close)
+    return __default_pool
+
+def forget_outputs():
+    """Forgets the memoized output of the app-wide pool (if it was ever used)"""
+    if __default_pool is not None:
+        __default_pool.forget_outputs()
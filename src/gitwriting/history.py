@@ -1,57 +1,205 @@
-"""Manage the "recent files" file operations"""
+"""Manage the "recent files" file operations.
+    The history is loaded once per session and ranked by frecency (frequency x recency).
+    Each visit is appended to a small log,
+    which is folded into the history file from time to time.
+    The log is locked while it's written or folded, as several sessions may share it."""
+import os
 import json
+import time
+from contextlib import contextmanager
 import app_utils as app
-import file_utils
-
-def read(reverse_for_display=False):
-    """Tries to read the history file"""
-    _path = app.get_user_config_resource_path("history.json")
-    try:
-        # Read JSON file
-        with open(_path, 'r', encoding="utf-8") as f:
-            data = json.load(f)
-        # Remove files that no longer exist
-        parsed_data = [d for d in data if file_utils.is_file(d)]
-        # If files have been deleted, update data file
-        if len(data) > len(parsed_data):
-            save(parsed_data)
-        if reverse_for_display:
-            parsed_data.reverse()
-        return parsed_data
-    except FileNotFoundError:
-        # Create empty JSON file since this isn't a file the user needs to interact with
-        save([])
-    except json.JSONDecodeError:
-        app.print_error(f"Error while decoding file history from '{_path}'.")
-    return None
-
-def save(data, message=""):
-    """Writes and saves a value to the history file using json.dump()"""
-    _path = app.get_user_config_resource_path("history.json")
-    try:
-        # Read JSON file
-        with open(_path, 'w', encoding="utf-8") as f:
-            json.dump(data, f, indent=4)
-        if message != "":
-            app.print_success(message)
-    except (FileNotFoundError, json.JSONDecodeError) as e:
-        app.print_error(f"Error while saving file history to '{_path}'. {e}")
+try:
+    import fcntl
+except ImportError:
+    # Windows: no locking (a visit logged by another session while folding may be lost)
+    fcntl = None
+
+# Number of remembered files, unless configured (see set_capacity)
+DEFAULT_CAPACITY = 500
+# The log is folded into the history file once it has this many lines
+MAX_LOG_LINES = 100
+# Weight of a visit by its age: (max age in days, weight), then OLD_VISIT_WEIGHT
+RECENCY_WEIGHTS = ((4, 100), (14, 70), (31, 50), (90, 30))
+OLD_VISIT_WEIGHT = 10
+DAY = 24 * 60 * 60
+
+class HistoryStore:
+    """The visited files: path => [visit count, last visit (unix time)]"""
+    def __init__(self, path, log_path, capacity=DEFAULT_CAPACITY):
+        self.path = path
+        self.log_path = log_path
+        self.capacity = capacity
+        self._entries = None
+        self._log_lines = 0
+
+    def __load(self):
+        """Reads the history file, then replays the log"""
+        try:
+            with self.__lock_log() as log:
+                self.__read(log)
+        except OSError:
+            # The log can't be created (e.g. a read-only config folder)
+            self.__read(None)
+        if self._log_lines >= MAX_LOG_LINES or len(self._entries) > self.capacity:
+            self.save()
+
+    def __read(self, log):
+        """Reads the history file, then replays the log (an open file, or None) over it"""
+        self._entries = {}
+        self._log_lines = 0
+        try:
+            with open(self.path, 'r', encoding="utf-8") as f:
+                data = json.load(f)
+            if isinstance(data, list):
+                # Before 0.8.9: a plain list of paths, oldest first
+                now = time.time()
+                for i, fpath in enumerate(data):
+                    self._entries[fpath] = [1, now - (len(data) - i)]
+            else:
+                for fpath, count, last in data.get("entries", []):
+                    self._entries[fpath] = [count, last]
+        except FileNotFoundError:
+            pass
+        except (json.JSONDecodeError, ValueError, TypeError, AttributeError):
+            app.print_error(f"Error while decoding file history from '{self.path}'.")
+        if log is None:
+            return
+        log.seek(0)
+        for line in log:
+            self._log_lines += 1
+            try:
+                self.__apply(*json.loads(line))
+            except (ValueError, TypeError):
+                # Probably a partial line (interrupted write)
+                continue
+
+    @contextmanager
+    def __lock_log(self):
+        """Opens the log (to append & read), locked against the other sessions until closed"""
+        os.makedirs(os.path.dirname(self.log_path), exist_ok=True)
+        with open(self.log_path, 'a+', encoding="utf-8") as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            yield f
+
+    def __get_entries(self):
+        """Returns the entries, loading them on first use"""
+        if self._entries is None:
+            self.__load()
+        return self._entries
+
+    def __apply(self, operation, fpath, timestamp=None):
+        """Applies one logged operation"""
+        if operation == "add":
+            entry = self._entries.setdefault(fpath, [0, 0])
+            entry[0] += 1
+            entry[1] = max(entry[1], timestamp)
+        elif operation == "remove":
+            self._entries.pop(fpath, None)
+
+    def __log(self, *operation):
+        """Applies an operation and appends it to the log"""
+        entries = self.__get_entries()
+        self.__apply(*operation)
+        try:
+            with self.__lock_log() as log:
+                log.write(json.dumps(operation) + "\n")
+            self._log_lines += 1
+        except OSError as e:
+            app.print_error(f"Error while saving file history to '{self.log_path}'. {e}")
+        if self._log_lines >= MAX_LOG_LINES or len(entries) > self.capacity + MAX_LOG_LINES:
+            self.save()
+
+    def get_score(self, fpath, now=None):
+        """Returns the frecency of a file: visit count x the weight of the last visit's age"""
+        count, last = self.__get_entries()[fpath]
+        age = ((now or time.time()) - last) / DAY
+        for max_age, weight in RECENCY_WEIGHTS:
+            if age <= max_age:
+                return count * weight
+        return count * OLD_VISIT_WEIGHT
+
+    def get_ranked(self):
+        """Returns the files, most relevant first (ties: most recent first)"""
+        entries = self.__get_entries()
+        now = time.time()
+        return sorted(entries, key=lambda fpath: (self.get_score(fpath, now), entries[fpath][1]),
+            reverse=True)
+
+    def add(self, fpath):
+        """Records a visit of a file"""
+        self.__log("add", fpath, time.time())
+
+    def remove(self, fpath):
+        """Forgets a file"""
+        if fpath in self.__get_entries():
+            self.__log("remove", fpath)
+
+    def save(self):
+        """Writes the history file (keeping the most relevant files up to capacity),
+            replacing it atomically, then clears the log.
+            The files & log are read again first (under the lock), so the visits other sessions
+            logged since this one loaded are kept."""
+        temp_path = f"{self.path}.tmp"
+        try:
+            with self.__lock_log() as log:
+                self.__read(log)
+                entries = self._entries
+                ranked = self.get_ranked()
+                for fpath in ranked[self.capacity:]:
+                    del entries[fpath]
+                data = {"version": 2,
+                    "entries": [[fpath, *entries[fpath]] for fpath in ranked[:self.capacity]]}
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                with open(temp_path, 'w', encoding="utf-8") as f:
+                    json.dump(data, f)
+                os.replace(temp_path, self.path)
+                # Everything logged so far is in the history file now
+                log.truncate(0)
+                self._log_lines = 0
+        except OSError as e:
+            app.print_error(f"Error while saving file history to '{self.path}'. {e}")
+
+
+__store = None
+
+def get_store():
+    """Returns the session's history store (loaded on first use)"""
+    global __store
+    if __store is None:
+        __store = HistoryStore(app.get_user_config_resource_path("history.json"),
+            app.get_user_config_resource_path("history.log"))
+    return __store
+
+def set_capacity(capacity):
+    """Sets how many files are remembered"""
+    if capacity and capacity > 0:
+        get_store().capacity = capacity
+
+def read(reverse_for_display=False, limit=None):
+    """Returns the recent files, least relevant first (most relevant first if reverse_for_display).
+        With a limit, only that many of the most relevant files are returned,
+        and only those are checked for existence (missing files are forgotten)."""
+    store = get_store()
+    ranked = store.get_ranked()
+    if limit is not None:
+        results = []
+        for fpath in ranked:
+            if len(results) >= limit:
+                break
+            if os.path.isfile(fpath):
+                results.append(fpath)
+            else:
+                store.remove(fpath)
+        ranked = results
+    if not reverse_for_display:
+        ranked.reverse()
+    return ranked
 
 def add(fpath):
     """Updates the file history with the specified path (if applicable)"""
-    _data = read(reverse_for_display=False)
-    if not _data:
-        # Initialize history as JSON array
-        save([fpath])
-    else:
-        if fpath in _data:
-            dupe_index = _data.index(fpath)
-            # If pending duplicate is already at the end of the list, ignore
-            if dupe_index < len(_data):
-                _data.append(_data.pop(dupe_index))
-        else:
-            # Delete the first (oldest) entry if adding a new, unique entry
-            if len(_data) not in range(0, 10):
-                del _data[0]
-            _data.append(fpath)
-        save(_data)
+    get_store().add(os.path.abspath(fpath))
+
+def remove(fpath):
+    """Removes the specified path from the file history"""
+    get_store().remove(os.path.abspath(fpath))
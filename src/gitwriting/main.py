@@ -2,30 +2,46 @@
 # Python Modules
 import os
 import sys
+import time
 # My Modules
-from config import AppConfig
-from commands import GitCommand, AppCommand
+# (everything else is imported when first needed, so the launch options stay fast)
 import app_utils as app
-import file_utils
-import menus
-import prompts
-import history
+from startup import StartupTimer
 
-app_cfg = AppConfig(quiet=True)
-git_cmd = GitCommand()
-app_cmd = AppCommand()
+START_TIME = time.perf_counter()
+# Run without the splash & menus (see cli.py)
+COMMANDS = ("status", "log", "commit", "stash", "daily-note", "recent", "workspace",
+    "words")
 
 def main():
     """Entry point method"""
-    # Check file history file
+    timer = StartupTimer(START_TIME)
+    is_startup_report = "--startup-report" in sys.argv
+    if is_startup_report:
+        sys.argv.remove("--startup-report")
+    if "--trace" in sys.argv:
+        __start_trace()
+    # Commands (e.g. 'status --json')
+    if len(sys.argv) > 1 and sys.argv[1] in COMMANDS:
+        import cli
+        sys.exit(cli.run(sys.argv[1:]))
     # Launch arguments
     while len(sys.argv) > 1:
         __handle_launch_args()
+    from config import get_app_config
+    from commands import GitCommand, get_git_command
+    import fetch_scheduler
+    import file_utils
+    import history
+    import prompts
+    app_cfg = get_app_config(quiet=True)
+    git_cmd = get_git_command()
+    timer.mark("Load modules")
     app.show_splash()
     # Check for a config file
     try:
         app_cfg.read()
-        history.read()
+        history.set_capacity(app_cfg.get_history_capacity())
         # Use the working directory from the config file
         working_dir = app_cfg.get_default_working_directory()
         # If working dir doesn't exist or is invalid format, should create new config
@@ -34,36 +50,70 @@ def main():
         app.change_working_directory(working_dir)
     except (FileNotFoundError, OSError):
         prompts.prompt_create_config()
+    GitCommand.enable_watcher(app_cfg.is_file_watcher_enabled())
+    timer.mark("Read config")
     # Set working directory to the root of the Git repo (if applicable)
-    if git_cmd.get_repo_root():
-        app_cfg.set_working_directory_to_repo()
+    # The file history is only read (and checked) once the recent files are shown
+    root = git_cmd.get_repo_root()
+    if root:
+        app_cfg.set_working_directory_to_repo(root)
+        # Fetch in the background from now on, so the status never waits on the network
+        fetch_scheduler.set_interval(app_cfg.get_fetch_interval())
+        fetch_scheduler.get_fetch_scheduler(root)
+    timer.mark("Find repo")
+    import menus
+    timer.mark("Load menus")
+    if is_startup_report:
+        timer.show()
     menus.main_menu()
 
 
+def __start_trace():
+    """Starts tracing the session (--trace FILE), removing the option from the launch arguments"""
+    i = sys.argv.index("--trace")
+    if i + 1 >= len(sys.argv):
+        app.print_error("Missing trace file: --trace FILE")
+        sys.exit(1)
+    path = sys.argv[i + 1]
+    del sys.argv[i:i + 2]
+    import tracing
+    tracing.start(path)
+
 def __handle_launch_args():
     """Handle launch arguments when the app is launched"""
     options_desc = "[Options] \nHelp: [-h | --help | -H] \
         \nSetup|View Config: [-c | --config | -C]  \
         \nVersion: [-v | --version | -V],  \
-        \nView README: [-r | --readme | -R]"
-    usage_desc = f"\n[Usage] \n{os.path.basename(sys.argv[0])} [OPTION]\n"
+        \nView README: [-r | --readme | -R] \
+        \nTime the startup: [--startup-report] \
+        \nTrace menus, pickers & commands: [--trace FILE] \
+        \n[Commands] (see COMMAND -h) \
+        \nstatus [--json] | log [--limit N] [--json] | commit -m MESSAGE [-a] \
+        \nstash push [-m MESSAGE] [--staged] | stash pop [STASH] \
+        \ndaily-note [--print-path] | recent [--limit N] [--json] \
+        \nworkspace status|fetch|pull [--json] | words [--files] [--limit N] [--json]"
+    usage_desc = f"\n[Usage] \n{os.path.basename(sys.argv[0])} [OPTION | COMMAND]\n"
 
     option = sys.argv[1]
     if option in ("-h", "--help", "-H"):
         print(usage_desc)
         print(options_desc)
     elif option in ("-c", "--config", "-C"):
+        from config import get_app_config
+        app_cfg = get_app_config(quiet=True)
         try:
             app_cfg.read()
             app_cfg.show()
         except FileNotFoundError:
             app.print_question("Would you like to create a new config file?")
             if app.prompt_continue():
+                import prompts
                 prompts.prompt_create_config(is_full_launch=False)
     elif option in ("-v", "--version", "-V"):
         app.print_version()
     elif option in ("-r", "--readme", "-R"):
-        app_cmd.show_readme()
+        from commands import get_app_command
+        get_app_command().show_readme()
     else:
         app.print_error(f"Unknown Option: {option}")
         print(usage_desc)
@@ -0,0 +1,170 @@
+"""Fuzzy (subsequence) matching over a fixed list of labels, built once and refined per keystroke"""
+import re
+from bisect import bisect_right
+from typing import Dict, List, Optional, Sequence
+
+class MatchIndex:
+    """Matches a query against every label as a case-insensitive subsequence
+        (e.g. 'chp3' matches 'chapters/chapter-03.md').
+        Labels are kept in rank order (shortest first) and joined into one string,
+        so contiguous matches are found by a C-level scan. Other subsequence matches
+        are only checked among candidates: the labels flagged by the (cached, ANDed)
+        byte masks of the query's characters and, when the query extends the previous one,
+        by the previous matches plus the labels the previous query hadn't checked yet.
+        Matches are materialized only as far as they are read."""
+    def __init__(self, labels: Sequence[str], enabled: Optional[Sequence[bool]] = None):
+        lowered = [label.lower().replace("\n", " ") for label in labels]
+        indexes = range(len(lowered))
+        if enabled is not None:
+            indexes = [i for i in indexes if enabled[i]]
+        # rank => original index
+        self.order = sorted(indexes, key=lambda i: (len(lowered[i]), i))
+        self.labels = [lowered[i] for i in self.order]
+        self.text = "\n".join(self.labels)
+        # Byte copy of text used to build character masks at C speed (ASCII only)
+        self._ascii_text = self.text.encode("ascii", errors="replace")
+        # rank => offset of the label in text
+        self.starts = []
+        offset = 0
+        for label in self.labels:
+            self.starts.append(offset)
+            offset += len(label) + 1
+        self._char_masks: Dict[str, int] = {}
+        self._last_results = None
+
+    def __len__(self):
+        return len(self.labels)
+
+    def _get_char_mask(self, char):
+        """Returns an int whose bytes flag (0/1) the labels containing char, in rank order"""
+        if char not in self._char_masks:
+            if char.isascii() and char != "\n":
+                # Delete every other byte, then each line is empty unless it contained char
+                others = bytes(b for b in range(256) if b not in (ord(char), ord("\n")))
+                lines = self._ascii_text.translate(None, delete=others).split(b"\n")
+                flags = bytes(map(bool, lines))
+            else:
+                flags = bytes([char in label for label in self.labels])
+            self._char_masks[char] = int.from_bytes(flags, "big")
+        return self._char_masks[char]
+
+    def get_candidates(self, query: str, restrict_to: Optional[int] = None) -> bytes:
+        """Returns one byte per rank, set (1) if the label contains every character of the query
+            (and is flagged in the restrict_to mask, if given)"""
+        mask = -1 if restrict_to is None else restrict_to
+        for char in set(query):
+            mask &= self._get_char_mask(char)
+        if mask < 0:
+            return b"\x01" * len(self.labels)
+        return mask.to_bytes(len(self.labels), "big")
+
+    def search(self, query: str) -> "MatchResults":
+        """Returns the (lazily materialized) matches of the query, best first"""
+        query = query.lower()
+        previous = self._last_results
+        restrict_to = None
+        if previous is not None and previous.query and query.startswith(previous.query):
+            # Every match of the new query also matches the previous one
+            restrict_to = previous.get_possible_mask()
+        self._last_results = MatchResults(self, query, restrict_to)
+        return self._last_results
+
+
+class MatchResults:
+    """The matches of one query, as original label indexes.
+        Contiguous matches come first, then other subsequence matches, each shortest first.
+        Only fetch() (or reading an item) does the matching work."""
+    def __init__(self, index: MatchIndex, query: str, restrict_to: Optional[int] = None):
+        self._index = index
+        self.query = query
+        # A mask (see MatchIndex.get_candidates) of the only labels that may match
+        self._restrict_to = restrict_to
+        self._matches: List[int] = []
+        # The rank of each match (position in the index's rank order)
+        self.ranks: List[int] = []
+        self._pending = self._generate()
+        self.is_complete = False
+        # The subsequence candidates (one byte per rank) once they are being checked,
+        # and the last rank checked so far
+        self._candidates: Optional[bytes] = None
+        self._checked_to = -1
+
+    def _generate(self):
+        """Yields matching ranks, best first"""
+        index, query, labels = self._index, self.query, self._index.labels
+        if not query:
+            yield from range(len(index))
+            return
+        # Contiguous matches: a C-level scan of the joined labels
+        # (they all match the previous query too, no need to restrict them)
+        contiguous = set()
+        pos = index.text.find(query)
+        while pos >= 0:
+            rank = bisect_right(index.starts, pos) - 1
+            contiguous.add(rank)
+            yield rank
+            if rank + 1 >= len(index.starts):
+                break
+            pos = index.text.find(query, index.starts[rank + 1])
+        if len(query) == 1:
+            return
+        # Other subsequence matches, only checked once the contiguous ones are exhausted
+        search = re.compile(".*?".join(re.escape(c) for c in query), re.S).search
+        self._candidates = index.get_candidates(query, self._restrict_to)
+        for rank in _iter_flagged(self._candidates):
+            self._checked_to = rank
+            if rank not in contiguous and search(labels[rank]):
+                yield rank
+
+    def get_possible_mask(self) -> Optional[int]:
+        """Returns a mask of the labels that may match: the matches found so far, plus the
+            candidates not checked yet. None if the search isn't narrowed down yet."""
+        if not self.is_complete and self._candidates is None:
+            # Still reading the contiguous matches: any candidate may match
+            return self._restrict_to
+        flags = bytearray(len(self._index))
+        if not self.is_complete:
+            unchecked = self._checked_to + 1
+            flags[unchecked:] = self._candidates[unchecked:]
+        for rank in self.ranks:
+            flags[rank] = 1
+        return int.from_bytes(flags, "big")
+
+    def fetch(self, count=-1):
+        """Materializes the first count matches (all of them if count < 0)"""
+        order = self._index.order
+        while not self.is_complete and (count < 0 or len(self._matches) < count):
+            rank = next(self._pending, None)
+            if rank is None:
+                self.is_complete = True
+                break
+            self.ranks.append(rank)
+            self._matches.append(order[rank])
+
+    def __len__(self):
+        """The number of matches materialized so far"""
+        return len(self._matches)
+
+    def __getitem__(self, i):
+        if i < 0:
+            self.fetch()
+        else:
+            self.fetch(i + 1)
+        return self._matches[i]
+
+    def __iter__(self):
+        i = 0
+        while True:
+            self.fetch(i + 1)
+            if i >= len(self._matches):
+                return
+            yield self._matches[i]
+            i += 1
+
+
+def _iter_flagged(flags: bytes):
+    """Yields the positions of the non-zero bytes"""
+    pos = flags.find(1)
+    while pos >= 0:
+        yield pos
+        pos = flags.find(1, pos + 1)
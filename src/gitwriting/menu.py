@@ -1,9 +1,11 @@
 """Contains a model for an interactive Menu object"""
-from readchar import readkey
 import app_utils as app
 
 class Menu:
     """The interactive, base Menu object"""
+    # Callbacks run before and after every selected action (e.g. to drop cached repo state)
+    action_hooks = []
+
     def __init__(self, title):
         self.options = {}
         self.title = title
@@ -15,21 +17,35 @@ class Menu:
     def show(self, post_action=None):
         """Display the menu and handle user choice."""
         while True:
-            print(f"\n[{self.title}]:")
-            options = self.options.items()
-            for key, (desc, _) in options:
-                print(f"{key}: {desc}")
+            self.render()
             try:
                 while True:
                     print("Select an option: ")
-                    k = int(readkey())
+                    k = int(app.readkey())
                     print(f"Selected: {k}")
                     if k not in self.options:
                         raise ValueError
-                    self.options[k][1]()
+                    self.run_option(k)
                     break
             except (ValueError, IndexError):
                 app.clear()
                 print("\nInvalid input.")
             if post_action is not None:
                 post_action()
+
+    def render(self):
+        """Prints the title and the options"""
+        print(f"\n[{self.title}]:")
+        for key, (desc, _) in self.options.items():
+            print(f"{key}: {desc}")
+
+    def run_option(self, key):
+        """Runs the action of an option, between the action hooks"""
+        self.__run_action_hooks()
+        self.options[key][1]()
+        self.__run_action_hooks()
+
+    def __run_action_hooks(self):
+        """Runs every registered action hook"""
+        for hook in self.action_hooks:
+            hook()
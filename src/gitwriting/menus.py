@@ -1,30 +1,38 @@
 """Contains the interactive menus"""
+import os
 import sys
+import time
 import functools
 from shutil import which
 
 import app_utils as app
 import file_utils
+import file_index
+import git_workers
 import history
-from config import AppConfig
-from commands import AppCommand, GitCommand
+from config import get_app_config
+from commands import GitCommand, get_app_command, get_git_command
 from menu import Menu
 import prompts
-from pickers import FileBrowser, DataPicker
 
-app_cmd = AppCommand()
-git_cmd = GitCommand()
-app_cfg = AppConfig()
+# The pickers (curses) and the search index (sqlite3) are imported when first used
+app_cmd = get_app_command()
+git_cmd = get_git_command()
+app_cfg = get_app_config()
+# Each menu action may change the repo, so verify the repo snapshot before reusing it
+Menu.action_hooks.append(GitCommand.expire)
 
 def main_menu():
     """The main menu of GitWriting"""
     menu = Menu("Main Menu")
     menu.add_option(1, "File", file_menu)
     menu.add_option(2, "Source Control", git_menu)
-    menu.add_option(3, "Settings", settings_menu)
-    menu.add_option(4, "Help", help_menu)
-    menu.add_option(5, "About GitWriting", functools.partial(app.show_splash, verbose=False))
-    menu.add_option(6, "Quit", sys.exit)
+    menu.add_option(3, "Workspace", workspace_menu)
+    menu.add_option(4, "Dashboard", __show_dashboard)
+    menu.add_option(5, "Settings", settings_menu)
+    menu.add_option(6, "Help", help_menu)
+    menu.add_option(7, "About GitWriting", functools.partial(app.show_splash, verbose=False))
+    menu.add_option(8, "Quit", sys.exit)
     menu.show()
 
 def file_menu():
@@ -37,6 +45,9 @@ def file_menu():
     menu.add_option(5, "Open Recent", recent_files_menu)
     if app_cfg.is_daily_notes_enabled():
         menu.add_option(6, "Open Daily Note", __open_daily_note)
+        menu.add_option(7, "Daily Notes Calendar", __daily_notes_calendar)
+    menu.add_option(len(menu.options) + 1, "Quick Open", __quick_open)
+    menu.add_option(len(menu.options) + 1, "Search", __search_notes)
     print(f"\nDIR: {app_cfg.get_default_working_directory()}")
     if not git_cmd.get_repo_root():
         menu.show()
@@ -78,6 +89,7 @@ def git_revert_menu():
 
 def __branch_picker():
     """Opens a Curses picker menu to select and change the active branch."""
+    from pickers import DataPicker
     if git_cmd.get_changes():
         app.print_warning("Cannot safely switch branches. "
             "Please commit, stash, or clean all changes first.")
@@ -96,31 +108,120 @@ def __branch_picker():
 
 def __diff_picker():
     """Opens a Curses picker menu to select one tracked file."""
+    from pickers import DataPicker
     if not git_cmd.get_diff_options():
         app.print_warning("No tracked changes to analyze.")
         return
     picker = DataPicker(
         title="[Git Diff]",
-        populator=functools.partial(git_cmd.get_diff_options))
+        populator=functools.partial(git_cmd.get_diff_options, with_stats=True))
     diff_file = picker.show()
     if diff_file:
         git_cmd.show_diff_for_file(diff_file)
 
 def __commit_picker():
     """Opens a Curses picker menu to select one commit from the Git repo's history."""
-    total_commits = git_cmd.get_total_commits()
-    if total_commits is None:
+    from pickers import DataPicker
+    if not git_cmd.has_commits():
         app.print_warning("No commits available to reset to.")
         return
-    picker = DataPicker(
-        title="[Git Commits]",
-        populator=git_cmd.get_commits,
-        total_entries=total_commits)
-    picker.show_paginated()
+    commit_index = git_cmd.get_commit_index()
+    if commit_index is not None:
+        picker = DataPicker(
+            title="[Git Commits]",
+            populator=commit_index.get_commits)
+        picker.show_paginated()
+    else:
+        # Fallback: stream the history without persisting it
+        cursor = git_cmd.get_commit_cursor()
+        picker = DataPicker(
+            title="[Git Commits]",
+            populator=cursor.get_commits,
+            prefetcher=cursor.prefetch)
+        picker.show_paginated()
+        cursor.close()
     commit = picker.current_option
     if commit:
         reset_menu(commit[:7])
 
+def __refresh_file_index():
+    """Updates the working directory's file index in the background
+        (only when it's used: outside of a repo, updating means walking the folders)"""
+    index = file_index.get_file_index(os.getcwd())
+    snapshot = git_cmd.get_snapshot()
+    # The snapshot already knows the untracked files (relative to the repo root)
+    untracked = snapshot.untracked if snapshot and snapshot.root == index.root else None
+    index.refresh(untracked=untracked)
+    return index
+
+def __quick_open():
+    """Opens a file from anywhere in the working directory by typing (part of) its name"""
+    from pickers import DataPicker
+    index = __refresh_file_index()
+    files, match_index = index.get_files()
+    if files is None:
+        # Never indexed: wait for the first update
+        app.print_info("Indexing files...")
+        index.wait()
+        files, match_index = index.get_files()
+    if files is None:
+        app.print_warning("Failed to index the files.")
+        return
+    if not files:
+        app.print_warning("No files found.")
+        return
+    picker = DataPicker(
+        title="[Quick Open]",
+        populator=lambda: files)
+    fpath = picker.show(filter_query="", match_index=match_index)
+    if fpath:
+        fpath = index.get_full_path(fpath)
+        if file_utils.is_file(fpath):
+            __open_app("editor", fpath)
+        else:
+            app.print_error(f"File '{fpath}' no longer exists.")
+
+def __search_notes():
+    """Searches the text of the notes in the working directory (and the daily notes)"""
+    import search_index
+    from pickers import DataPicker
+    query = input("Search notes (or pass empty text to cancel): ")
+    if not query.strip():
+        app.print_error("Canceled operation.")
+        return
+    files_index = __refresh_file_index()
+    # The search needs the current files (new notes included)
+    files_index.wait()
+    files, _ = files_index.get_files()
+    snapshot = git_cmd.get_snapshot()
+    modified = []
+    if snapshot is not None:
+        modified = [snapshot.get_full_path(path)
+            for path in set(snapshot.unstaged) | snapshot.untracked]
+    extra_dirs = []
+    if app_cfg.is_daily_notes_enabled():
+        extra_dirs.append(app_cfg.get_daily_notes_root_path())
+    notes = search_index.get_files_to_index(files_index.root, files or [],
+        modified=modified, extra_dirs=extra_dirs)
+    index = search_index.get_search_index(files_index.root)
+    def show_progress(done, total):
+        print(f"\rIndexing notes... {done}/{total}", end="" if done < total else "\n")
+    index.update(notes, progress=show_progress)
+    results = {}
+    for path in index.search(query):
+        label = (os.path.relpath(path, files_index.root)
+            if path.startswith(files_index.root + os.sep) else path)
+        results[f"{label}: {search_index.get_snippet(path, query)}"] = path
+    if not results:
+        app.print_warning(f"No notes contain '{query}'.")
+        return
+    picker = DataPicker(
+        title=f"[Search: {query}]",
+        populator=lambda: list(results))
+    selected = picker.show()
+    if selected and file_utils.is_file(results[selected]):
+        __open_app("editor", results[selected])
+
 def recent_files_menu():
     """Gives different options for how to view "recent" files."""
     menu = Menu("Open Recent")
@@ -133,14 +234,19 @@ def recent_files_menu():
         functools.partial(__recent_file_picker,
         title="[Git Changes]",
         is_git=True,
-        populator=functools.partial(git_cmd.get_changes, names_only=True, full_paths=True)))
+        populator=functools.partial(git_cmd.get_changes,
+            names_only=True, full_paths=True, with_stats=True)))
     menu.show()
 
 def __recent_file_picker(populator, title, is_git=False):
     """Opens a Curses picker menu to select a recently modified file."""
+    from pickers import DataPicker
     if is_git and not git_cmd.get_changes():
         app.print_warning("No changes available.")
         return
+    if not is_git and not history.read():
+        app.print_warning("No recent files.")
+        return
     picker = DataPicker(
         title=title,
         populator=populator)
@@ -148,6 +254,10 @@ def __recent_file_picker(populator, title, is_git=False):
     if fpath:
         if file_utils.is_file(fpath):
             __open_app("editor", fpath)
+        elif not is_git:
+            # Existence is only checked once a recent file is picked
+            app.print_warning(f"'{fpath}' no longer exists. Removed it from the recent files.")
+            history.remove(fpath)
 
 
 def git_diff_menu():
@@ -175,7 +285,8 @@ def git_stage_menu():
             functools.partial(__recent_file_picker,
             title="[Git Changes]",
             is_git=True,
-            populator=functools.partial(git_cmd.get_changes, names_only=True, full_paths=True)))
+            populator=functools.partial(git_cmd.get_changes,
+                names_only=True, full_paths=True, with_stats=True)))
         menu.add_option(3, "Stage All", git_cmd.stage_all_changes)
         menu.add_option(4, "Unstage All", git_cmd.unstage_all_changes)
         menu.add_option(5, "Interactive Stage", git_cmd.stage_interactive)
@@ -281,12 +392,122 @@ def __confirm_factory_reset():
     menu.add_option(2, "No", settings_menu)
     menu.show()
 
+def __show_dashboard():
+    """Shows the words written per day & week, the streaks and today's progress"""
+    import dashboard
+    if not git_cmd.has_commits():
+        app.print_warning("No commit history available.")
+        return
+    word_history = git_cmd.get_word_history()
+    if word_history is None:
+        app.print_warning("The word history is unavailable.")
+        return
+    # Today's uncommitted words count too
+    stats = git_cmd.get_diff_stats() or {}
+    uncommitted = sum(stat.get_word_delta() for stat in stats.values())
+    note_words = None
+    if app_cfg.is_daily_notes_enabled():
+        note_words = file_utils.count_words(app_cfg.get_today_note_path())
+    dashboard.show(dashboard.DashboardStats.build(word_history.get_daily_words(), uncommitted),
+        app_cfg.get_daily_target(), note_words)
+
+def workspace_menu():
+    """The multi-repo menu: status, fetch or pull every workspace repo at once"""
+    menu = Menu("Workspace")
+    menu.add_option(1, "Back to Main Menu", main_menu)
+    menu.add_option(2, "Status (All Repos)", functools.partial(__run_workspace, "status"))
+    menu.add_option(3, "Fetch (All Repos)", functools.partial(__run_workspace, "fetch"))
+    menu.add_option(4, "Pull (All Repos)", functools.partial(__run_workspace, "pull"))
+    menu.add_option(5, "Switch to Repo", __switch_workspace_repo)
+    menu.add_option(6, "Add Repo", __add_workspace_repo)
+    menu.add_option(7, "Remove Repo", __remove_workspace_repo)
+    __show_workspace_repos()
+    menu.show()
+
+def __show_workspace_repos():
+    """Prints the workspace's repos"""
+    repos = app_cfg.get_workspace_repos()
+    if not repos:
+        app.print_info("No repos in the workspace yet. Add one with 'Add Repo'.")
+        return
+    print(f"\nRepos ({len(repos)}):")
+    for path in repos:
+        print(f"  {path}")
+
+def __run_workspace(operation):
+    """Runs an operation on every workspace repo, printing each result as soon as it's ready"""
+    import workspace
+    repos = app_cfg.get_workspace_repos()
+    if not repos:
+        app.print_warning("No repos in the workspace. Add one with 'Add Repo'.")
+        return
+    width = max(len(os.path.basename(os.path.normpath(path))) for path in repos)
+    print(f"\n[{operation.capitalize()}] {len(repos)} repos...")
+    start = time.perf_counter()
+    failures = 0
+    for result in workspace.Workspace(repos, app_cfg.get_workspace_jobs()).run(operation):
+        if not result.is_success:
+            failures += 1
+        symbol = "\u2705" if result.is_success else "\u274C"
+        print(f"{symbol} {result.get_name():<{width}}  {result.get_summary()} "
+            f"({result.seconds:.1f}s)", flush=True)
+    print(f"\nDone in {time.perf_counter() - start:.1f}s"
+        + (f" ({failures} failed)" if failures else ""))
+
+def __switch_workspace_repo():
+    """Picks a workspace repo and makes it the working directory"""
+    from pickers import DataPicker
+    repos = app_cfg.get_workspace_repos()
+    if not repos:
+        app.print_warning("No repos in the workspace.")
+        return
+    picker = DataPicker(title="[Switch to Repo]", populator=lambda: repos)
+    path = picker.show()
+    if not path:
+        return
+    if not file_utils.is_directory(path):
+        app.print_error(f"'{path}' not found.")
+        return
+    app.change_working_directory(path)
+    app_cfg.set_default_working_directory(path)
+
+def __add_workspace_repo():
+    """Picks a folder and adds its Git repo to the workspace"""
+    from pickers import FileBrowser
+    browser = FileBrowser(app_cfg.get_default_working_directory())
+    browser.select_directory()
+    if not browser.current_path:
+        return
+    root = git_workers.get_default_pool().get_repo_root(cwd=browser.current_path)
+    if root is None:
+        app.print_error(f"'{browser.current_path}' is not within a Git repo.")
+        return
+    repos = app_cfg.get_workspace_repos()
+    if root in repos:
+        app.print_info(f"'{root}' is already in the workspace.")
+        return
+    app_cfg.set_workspace_repos(repos + [root])
+
+def __remove_workspace_repo():
+    """Picks a workspace repo and removes it from the workspace (the repo itself is kept)"""
+    from pickers import DataPicker
+    repos = app_cfg.get_workspace_repos()
+    if not repos:
+        app.print_warning("No repos in the workspace.")
+        return
+    picker = DataPicker(title="[Remove Repo]", populator=lambda: repos)
+    path = picker.show()
+    if path:
+        app_cfg.set_workspace_repos([repo for repo in repos if repo != path])
+
 def settings_menu():
     """Shows the app settings menu, each of which modify the GitWriting config file."""
     menu = Menu("Settings")
     menu.add_option(1, "Back to Main Menu", main_menu)
     menu.add_option(2, "Default Apps", __default_apps_menu)
     menu.add_option(3, "Daily Notes", __daily_notes_menu)
+    menu.add_option(4, "Background Fetch", prompts.set_fetch_interval)
+    menu.add_option(5, "Daily Word Target", prompts.set_daily_target)
     menu.add_option(0, "Factory Reset \u26A0",
         __confirm_factory_reset)
     app_cfg.read()
@@ -362,6 +583,7 @@ def __open_system_app(app_type, fpath=""):
 def __open_default_browser():
     """Opens the integrated file browser.
     (Windows) As of GitWriting 0.8.6, this will open the file browser instead of explorer.exe."""
+    from pickers import FileBrowser
     browser = FileBrowser(app_cfg.get_default_working_directory())
     browser.show()
 
@@ -393,6 +615,24 @@ def __open_daily_note():
         if file_utils.is_file(fpath):
             __open_app("editor", fpath)
 
+def __daily_notes_calendar():
+    """Shows a calendar of the daily notes, then opens (or creates) the picked day's note."""
+    from calendar_picker import CalendarPicker
+    from daily_notes_index import get_daily_notes_index
+    notes_index = get_daily_notes_index(app_cfg.get_daily_notes_root_path())
+    notes_index.refresh()
+    notes = notes_index.get_notes()
+    day = CalendarPicker(notes).show()
+    if day is None:
+        return
+    fpath = notes[day][0] if day in notes else app_cfg.get_note_path(day)
+    try:
+        file_utils.create_new_file(fpath)
+    except FileExistsError:
+        return
+    if file_utils.is_file(fpath):
+        __open_app("editor", fpath)
+
 def __set_daily_notes_status(new_status):
     """Helper function to enable or disable the Daily Notes feature."""
     if new_status in ("on","off"):
@@ -7,8 +7,9 @@ import curses
 import textwrap
 from collections import namedtuple
 from dataclasses import dataclass, field
+from match_index import MatchIndex, MatchResults
 from typing import (Any,
-    Container, Generic, Iterable, List,
+    Container, Dict, Generic, Iterable, List,
     Optional, Sequence, Tuple, TypeVar, Union)
 
 __all__ = ["Picker", "pick", "Option"]
@@ -29,6 +30,9 @@ KEYS_RIGHT = (curses.KEY_RIGHT, ord("d"))
 KEY_E = (101, ord("e"))
 KEY_H = (104, ord("h"))
 KEY_V = (118, ord("v"))
+KEY_FILTER = ord("/")
+KEY_ESC = 27
+KEYS_BACKSPACE = (curses.KEY_BACKSPACE, 127, 8)
 
 OptionT = TypeVar("OptionT", str, Option)
 # Option, index, char
@@ -51,6 +55,18 @@ class Picker(Generic[OptionT]):
     position: Position = Position(0, 0)
     option_keys: Optional[Union[Container[int], Iterable[int]]] = None
     quit_keys: Optional[Union[Container[int], Iterable[int]]] = None
+    # Type-to-filter query (None when not filtering). Press '/' to start filtering.
+    filter_query: Optional[str] = None
+    # Prebuilt match index of the options' labels (built on first filter otherwise)
+    match_index: Optional[MatchIndex] = None
+    # Render caches: wrapped title/footer per width, and what each screen row currently shows
+    _wrapped_lines: Dict[Tuple[str, int], List[str]] = field(
+        init=False, default_factory=dict, repr=False)
+    _drawn_rows: Dict[int, Tuple[str, str]] = field(init=False, default_factory=dict, repr=False)
+    _drawn_size: Tuple[int, int] = field(init=False, default=(0, 0), repr=False)
+    _description_present: Optional[bool] = field(init=False, default=None, repr=False)
+    # Filtering: the matches of the current query (None = all options)
+    _matches: Optional[MatchResults] = field(init=False, default=None, repr=False)
 
     def __post_init__(self) -> None:
         if len(self.options) == 0:
@@ -68,60 +84,113 @@ class Picker(Generic[OptionT]):
         option = self.options[self.index]
         if isinstance(option, Option) and not option.enabled:
             self.move_down()
+        if self.filter_query is not None:
+            self.set_filter(self.filter_query)
+
+    def get_row_count(self) -> int:
+        """Number of option rows currently listed (matches read so far when filtering)"""
+        if self._matches is None:
+            return len(self.options)
+        return len(self._matches)
+
+    def get_row(self, row: int) -> Tuple[OptionT, int]:
+        """Get the option listed at a row, with its index in options"""
+        index = row if self._matches is None else self._matches[row]
+        return self.options[index], index
 
     def move_up(self) -> None:
         """Move the cursor up"""
+        if self._matches is not None:
+            if self.index == 0:
+                # Wrapping around needs every match
+                self._matches.fetch()
+            if self.get_row_count() == 0:
+                return
         while True:
             self.index -= 1
             if self.index < 0:
-                self.index = len(self.options) - 1
-            option = self.options[self.index]
+                self.index = self.get_row_count() - 1
+            option, _ = self.get_row(self.index)
             if not isinstance(option, Option) or option.enabled:
                 break
 
     def move_down(self) -> None:
         """Move the cursor down"""
+        if self._matches is not None:
+            self._matches.fetch(self.index + 2)
+            if self.get_row_count() == 0:
+                return
         while True:
             self.index += 1
-            if self.index >= len(self.options):
+            if self.index >= self.get_row_count():
                 self.index = 0
-            option = self.options[self.index]
+            option, _ = self.get_row(self.index)
             if not isinstance(option, Option) or option.enabled:
                 break
 
     def get_selected(self) -> Union[List[PickReturnT], PickReturnT, PickReturnT]:
         """return the current selected option as a tuple: (option, index)"""
-        return self.options[self.index], self.index
+        return self.get_row(self.index)
+
+    def set_filter(self, query: Optional[str]) -> None:
+        """List only the options matching the query (fuzzy). None stops filtering."""
+        selected = self.get_selected()[1] if self.get_row_count() else None
+        self.filter_query = query
+        if not query:
+            self._matches = None
+            self.index = selected if selected is not None else self.default_index
+            return
+        if self.match_index is None:
+            self.match_index = MatchIndex(
+                [option.label if isinstance(option, Option) else str(option)
+                    for option in self.options],
+                enabled=[not isinstance(option, Option) or option.enabled
+                    for option in self.options])
+        self._matches = self.match_index.search(query)
+        self.index = 0
+
+    def _wrap(self, text: Optional[str], max_width: int) -> List[str]:
+        """Wrap the title or footer, memoized per text & width"""
+        key = (text, max_width)
+        if key not in self._wrapped_lines:
+            if text:
+                self._wrapped_lines[key] = textwrap.fill(text,
+                    max_width - 2,
+                    drop_whitespace=False).split("\n") + [""]
+            else:
+                self._wrapped_lines[key] = []
+        return self._wrapped_lines[key]
 
     def get_title_lines(self, *, max_width: int = 80) -> List[str]:
         """Get title lines"""
-        if self.title:
-            return textwrap.fill(self.title,
-                max_width - 2,
-                drop_whitespace=False).split("\n") + [""]
-        return []
+        return self._wrap(self.title, max_width)
 
     def get_footer_lines(self, *, max_width: int = 80) -> List[str]:
         """Get footer lines"""
-        if self.footer:
-            return textwrap.fill(self.footer,
-                max_width - 2,
-                drop_whitespace=False).split("\n") + [""]
-        return []
+        if self.filter_query is not None:
+            return self._wrap(f"Filter: {self.filter_query}_ (esc - clear, enter - select)",
+                max_width)
+        return self._wrap(self.footer, max_width)
+
+    def get_option_line(self, index: int) -> str:
+        """Get the line of a single option (by row)"""
+        if index == self.index:
+            prefix = self.indicator
+        else:
+            prefix = len(self.indicator) * " "
+        if self.get_row_count() == 0:
+            return f"{len(self.indicator) * ' '} No matches."
+        option, _ = self.get_row(index)
+        option_as_str = option.label if isinstance(option, Option) else option
+        return f"{prefix} {option_as_str}"
 
     def get_option_lines(self) -> List[str]:
         """Get option lines"""
-        lines: List[str] = []
-        for index, option in enumerate(self.options):
-            if index == self.index:
-                prefix = self.indicator
-            else:
-                prefix = len(self.indicator) * " "
+        return [self.get_option_line(index) for index in range(self.get_option_row_total())]
 
-            option_as_str = option.label if isinstance(option, Option) else option
-            lines.append(f"{prefix} {option_as_str}")
-
-        return lines
+    def get_option_row_total(self) -> int:
+        """Number of rows the options take (a 'No matches.' row when the filter matches nothing)"""
+        return max(self.get_row_count(), 1)
 
     def get_lines(self, *, max_width: int = 80) -> Tuple[List[str], int]:
         """Get total lines"""
@@ -132,47 +201,151 @@ class Picker(Generic[OptionT]):
         current_line = self.index + len(title_lines) + 1
         return lines, current_line
 
-    def draw(self, screen: "curses._CursesWindow") -> None:
-        """draw the curses ui on the screen, handle scroll if needed"""
-        screen.erase()
-        y, x = self.position  # start point
+    def is_description_present(self) -> bool:
+        """Whether any option has a description (scanned once per picker)"""
+        if self._description_present is None:
+            self._description_present = any(
+                isinstance(option, Option) and option.description is not None
+                for option in self.options)
+        return self._description_present
 
-        max_y, max_x = screen.getmaxyx()
-        max_rows = max_y - y  # the max rows we can draw
+    def get_line(self, line_index: int, *, max_width: int = 80) -> str:
+        """Get one line of get_lines() without building the others"""
+        title_lines = self.get_title_lines(max_width=max_width)
+        if line_index < len(title_lines):
+            return title_lines[line_index]
+        line_index -= len(title_lines)
+        if line_index < self.get_option_row_total():
+            return self.get_option_line(line_index)
+        line_index -= self.get_option_row_total() + 1
+        footer_lines = self.get_footer_lines(max_width=max_width)
+        if 0 <= line_index < len(footer_lines):
+            return footer_lines[line_index]
+        return ""
 
-        lines, current_line = self.get_lines(max_width=max_x)
+    def get_visible_rows(self, max_rows: int, max_x: int) -> List[Tuple[str, str]]:
+        """Get the (left, right) text of each visible row.
+        Only the visible options are formatted."""
+        title_length = len(self.get_title_lines(max_width=max_x))
+        if self._matches is not None:
+            # Only read as many matches as can be shown
+            self._matches.fetch(self.index + max_rows)
+        total_lines = (title_length + self.get_option_row_total() + 1
+            + len(self.get_footer_lines(max_width=max_x)))
+        current_line = self.index + title_length + 1
 
         # calculate how many lines we should scroll, relative to the top
         scroll_top = 0
         if current_line > max_rows:
             scroll_top = current_line - max_rows
 
-        lines_to_draw = lines[scroll_top : scroll_top + max_rows]
-
-        description_present = False
-        for option in self.options:
-            if isinstance(option, Option) and option.description is not None:
-                description_present = True
-                break
-
-        title_length = len(self.get_title_lines(max_width=max_x))
+        description_present = self.is_description_present()
+        description_lines: List[str] = []
+        option = self.get_selected()[0] if self.get_row_count() else None
+        if isinstance(option, Option) and option.description is not None:
+            description_lines = textwrap.fill(option.description, max_x // 2 - 2).split('\n')
 
-        for i, line in enumerate(lines_to_draw):
+        rows = []
+        for i, line_index in enumerate(range(scroll_top, min(scroll_top + max_rows, total_lines))):
+            line = self.get_line(line_index, max_width=max_x)
             if description_present and i > title_length:
-                screen.addnstr(y, x, line, max_x // 2 - 2)
-            else:
-                screen.addnstr(y, x, line, max_x - 2)
-            y += 1
+                line = line[:max_x // 2 - 2]
+            description = ""
+            if title_length <= i < title_length + len(description_lines):
+                description = description_lines[i - title_length]
+            rows.append((line, description))
+        return rows
 
-        option = self.options[self.index]
-        if isinstance(option, Option) and option.description is not None:
-            description_lines = textwrap.fill(option.description, max_x // 2 - 2).split('\n')
+    def draw(self, screen: "curses._CursesWindow") -> None:
+        """draw the curses ui on the screen, handle scroll if needed.
+            Only rows whose content changed since the last frame are redrawn."""
+        y, x = self.position  # start point
 
-            for i, line in enumerate(description_lines):
-                screen.addnstr(i + title_length, max_x // 2, line, max_x - 2)
+        max_y, max_x = screen.getmaxyx()
+        max_rows = max_y - y  # the max rows we can draw
+
+        if self._drawn_size != (max_y, max_x):
+            # First frame or terminal resized: start from a blank screen
+            screen.erase()
+            self._drawn_rows.clear()
+            self._drawn_size = (max_y, max_x)
+
+        rows = self.get_visible_rows(max_rows, max_x)
+        for i in range(max(len(rows), len(self._drawn_rows))):
+            row = rows[i] if i < len(rows) else ("", "")
+            if self._drawn_rows.get(i, ("", "")) == row:
+                continue
+            screen.move(y + i, x)
+            screen.clrtoeol()
+            line, description = row
+            screen.addnstr(y + i, x, line, max_x - 2)
+            if description:
+                screen.addnstr(i, max_x // 2, description, max_x - 2 - max_x // 2)
+            self._drawn_rows[i] = row
 
         screen.refresh()
 
+    def _read_buffered_moves(
+        self, screen: "curses._CursesWindow", key: int,
+        move_keys: Sequence[int] = KEYS_UP + KEYS_DOWN
+    ) -> List[int]:
+        """Collect the move keys (move_keys) already buffered after key (e.g. a held key),
+            so they are rendered as a single frame"""
+        keys = [key]
+        screen.nodelay(True)
+        try:
+            while True:
+                c = screen.getch()
+                if c == -1:
+                    break
+                if c not in move_keys:
+                    curses.ungetch(c)
+                    break
+                keys.append(c)
+        finally:
+            screen.nodelay(False)
+        return keys
+
+    def _read_buffered_chars(self, screen: "curses._CursesWindow", key: int) -> str:
+        """Collect the printable characters already buffered after key (e.g. a paste),
+            so the filter is only applied once"""
+        chars = [chr(key)]
+        screen.nodelay(True)
+        try:
+            while True:
+                c = screen.getch()
+                if c == -1:
+                    break
+                if not 32 <= c < 127:
+                    curses.ungetch(c)
+                    break
+                chars.append(chr(c))
+        finally:
+            screen.nodelay(False)
+        return "".join(chars)
+
+    def handle_filter_key(
+        self, screen: "curses._CursesWindow", c: int
+    ) -> Optional[Union[List[PickReturnT], PickReturnT, PickReturnT]]:
+        """Handle a key while filtering. Returns the selection once confirmed."""
+        if c == KEY_ESC:
+            self.set_filter(None)
+        elif c in KEYS_BACKSPACE:
+            self.set_filter(self.filter_query[:-1])
+        elif c in CONFIRM_KEYS:
+            if self.get_row_count():
+                return self.get_selected(), c
+        elif c in (curses.KEY_UP, curses.KEY_DOWN):
+            # Only the arrows move: 'w' & 's' are typed into the filter
+            for key in self._read_buffered_moves(screen, c, (curses.KEY_UP, curses.KEY_DOWN)):
+                if key == curses.KEY_UP:
+                    self.move_up()
+                else:
+                    self.move_down()
+        elif 32 <= c < 127:
+            self.set_filter(self.filter_query + self._read_buffered_chars(screen, c))
+        return None
+
     def run_loop(
         self, screen: "curses._CursesWindow"
     ) -> Union[List[PickReturnT], PickReturnT, PickReturnT]:
@@ -180,6 +353,14 @@ class Picker(Generic[OptionT]):
         while True:
             self.draw(screen)
             c = screen.getch()
+            if self.filter_query is not None:
+                selected = self.handle_filter_key(screen, c)
+                if selected is not None:
+                    return selected
+                continue
+            if c == KEY_FILTER:
+                self.set_filter("")
+                continue
             if self.quit_keys is not None and c in self.quit_keys:
                 return None, -1
             if self.option_keys is not None and c in self.option_keys:
@@ -187,10 +368,12 @@ class Picker(Generic[OptionT]):
             if self.is_paginated:
                 if c in KEYS_LEFT or c in KEYS_RIGHT:
                     return self.get_selected(), c
-            if c in KEYS_UP:
-                self.move_up()
-            elif c in KEYS_DOWN:
-                self.move_down()
+            if c in KEYS_UP or c in KEYS_DOWN:
+                for key in self._read_buffered_moves(screen, c):
+                    if key in KEYS_UP:
+                        self.move_up()
+                    else:
+                        self.move_down()
             elif c in CONFIRM_KEYS:
                 return self.get_selected(), c
 
@@ -201,6 +384,9 @@ class Picker(Generic[OptionT]):
             curses.use_default_colors()
             # hide the cursor
             curses.curs_set(0)
+            # esc quits (or clears the filter), don't wait for an escape sequence
+            if hasattr(curses, "set_escdelay"):
+                curses.set_escdelay(25)
         except curses.error:
             # Curses failed to initialize color support, eg. when TERM=vt100
             curses.initscr()
@@ -232,7 +418,9 @@ def pick(
     screen: Optional["curses._CursesWindow"] = None,
     position: Position = Position(0, 0),
     option_keys: Optional[Union[Container[int], Iterable[int]]] = None,
-    quit_keys: Optional[Union[Container[int], Iterable[int]]] = None
+    quit_keys: Optional[Union[Container[int], Iterable[int]]] = None,
+    filter_query: Optional[str] = None,
+    match_index: Optional[MatchIndex] = None
 ):
     """Define picker attributes"""
     picker: Picker = Picker(
@@ -245,6 +433,8 @@ def pick(
         screen,
         position,
         option_keys,
-        quit_keys
+        quit_keys,
+        filter_query,
+        match_index
     )
     return picker.start()
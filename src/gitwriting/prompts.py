@@ -4,12 +4,11 @@ from shutil import which
 
 import app_utils as app
 import file_utils
-from config import AppConfig
-from commands import GitCommand
-from pickers import FileBrowser
+from config import get_app_config
+from commands import get_git_command
 
-app_cfg = AppConfig()
-git_cmd = GitCommand()
+app_cfg = get_app_config()
+git_cmd = get_git_command()
 
 def prompt_create_config(is_full_launch=True):
     """Prompt to handle the config creation, followed by an optional app launch"""
@@ -23,29 +22,31 @@ def prompt_create_config(is_full_launch=True):
             print("\nBye.")
             sys.exit()
 
-    app.print_info("Generating config file...")
-    app_cfg.generate()
-    app_cfg.show()
-    app.print_question("Please enter your preferred file editor. "
-        "(Or press enter to use the default editor)")
-    set_app("editor")
-    app.print_question("Please enter your preferred file browser. "
-        "(Or press enter to use the default file browser)")
-    set_app("browser")
-    app.print_question("Enable daily notes? "
-        "This feature serves as a shortcut to create a new note each day, "
-        "neatly organized by date.")
-    if app.prompt_continue():
-        app_cfg.set_daily_notes_status("on")
-    else:
-        app_cfg.set_daily_notes_status("off")
-    if app_cfg.is_daily_notes_enabled():
-        app.print_question("Since you enabled daily notes, "
-            "you may set the default path for daily notes now. "
-            "(Or press enter to use the default path)")
-        set_daily_notes_path()
-    else:
-        app.print_info("Skipping daily notes path selection since it is disabled...")
+    # Every setting below is written to the config file at once
+    with app_cfg.batch():
+        app.print_info("Generating config file...")
+        app_cfg.generate()
+        app_cfg.show()
+        app.print_question("Please enter your preferred file editor. "
+            "(Or press enter to use the default editor)")
+        set_app("editor")
+        app.print_question("Please enter your preferred file browser. "
+            "(Or press enter to use the default file browser)")
+        set_app("browser")
+        app.print_question("Enable daily notes? "
+            "This feature serves as a shortcut to create a new note each day, "
+            "neatly organized by date.")
+        if app.prompt_continue():
+            app_cfg.set_daily_notes_status("on")
+        else:
+            app_cfg.set_daily_notes_status("off")
+        if app_cfg.is_daily_notes_enabled():
+            app.print_question("Since you enabled daily notes, "
+                "you may set the default path for daily notes now. "
+                "(Or press enter to use the default path)")
+            set_daily_notes_path()
+        else:
+            app.print_info("Skipping daily notes path selection since it is disabled...")
     app_cfg.show()
     app.print_success("Config setup complete.")
     app.print_info("These settings can be changed anytime under [Main Menu -> Settings].")
@@ -64,6 +65,8 @@ def prompt_select_folder():
     """Select a folder (working directory) using a directory picker.
         Raises prompt if the selected directory is not within a Git repo"""
     try:
+        # The browser (and curses) is only loaded when a folder is picked
+        from pickers import FileBrowser
         browser = FileBrowser(app_cfg.get_default_working_directory())
         browser.select_directory()
         new_path = browser.current_path
@@ -120,6 +123,39 @@ def set_daily_notes_path():
     else:
         app.print_error(f"Canceled. Keep current path: '{app_cfg.get_daily_notes_root_path()}'")
 
+def set_fetch_interval():
+    """Prompts to set the seconds between background fetches in the config file"""
+    import fetch_scheduler
+    value = input("Fetch in the background every how many seconds? "
+        "(0 = never, or pass empty text to cancel): ")
+    if not value:
+        app.print_error(f"Canceled. Keep current interval: {app_cfg.get_fetch_interval()}s")
+        return
+    try:
+        seconds = int(value)
+        if seconds < 0:
+            raise ValueError
+    except ValueError:
+        app.print_error(f"'{value}' is not a valid number of seconds.")
+        return
+    app_cfg.set_fetch_interval(seconds)
+    fetch_scheduler.set_interval(seconds)
+
+def set_daily_target():
+    """Prompts to set the dashboard's daily word target in the config file"""
+    value = input("How many words per day? (0 = no target, or pass empty text to cancel): ")
+    if not value:
+        app.print_error(f"Canceled. Keep current target: {app_cfg.get_daily_target()} words")
+        return
+    try:
+        words = int(value)
+        if words < 0:
+            raise ValueError
+    except ValueError:
+        app.print_error(f"'{value}' is not a valid number of words.")
+        return
+    app_cfg.set_daily_target(words)
+
 def set_app(app_type):
     """Prompts to set a new app in the config file"""
     while True:
@@ -0,0 +1,144 @@
+"""A point-in-time view of the Git repo, parsed from one 'git status --porcelain=v2' call"""
+import os
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set
+
+STATUS_COMMAND = ["git", "status", "--porcelain=v2", "--branch", "-z", "-u"]
+
+@dataclass
+class RepoSnapshot:
+    """Branch, upstream and change sets of a repo. Paths are relative to the repo root."""
+    root: str
+    branch: Optional[str] = None
+    oid: Optional[str] = None
+    upstream: Optional[str] = None
+    ahead: int = 0
+    behind: int = 0
+    # path => one-letter status (e.g. 'M', 'A', 'D', 'R')
+    staged: Dict[str, str] = field(default_factory=dict)
+    unstaged: Dict[str, str] = field(default_factory=dict)
+    untracked: Set[str] = field(default_factory=set)
+    unmerged: Set[str] = field(default_factory=set)
+    # new path => original path (renames & copies)
+    renames: Dict[str, str] = field(default_factory=dict)
+    stashes: List[str] = field(default_factory=list)
+
+    @classmethod
+    def parse(cls, root, status_output, stashes=None):
+        """Builds a snapshot from the raw (NUL-separated) porcelain v2 output"""
+        snapshot = cls(root=root, stashes=list(stashes or []))
+        records = status_output.split("\0")
+        i = 0
+        while i < len(records):
+            record = records[i]
+            i += 1
+            if not record:
+                continue
+            if record.startswith("# "):
+                snapshot._parse_header(record[2:])
+                continue
+            kind = record[0]
+            if kind == "1":
+                fields = record.split(" ", 8)
+                snapshot._add_change(fields[1], fields[8])
+            elif kind == "2":
+                fields = record.split(" ", 9)
+                snapshot._add_change(fields[1], fields[9])
+                # The original path follows as its own NUL-terminated record
+                snapshot.renames[fields[9]] = records[i]
+                i += 1
+            elif kind == "u":
+                fields = record.split(" ", 10)
+                snapshot.unmerged.add(fields[10])
+            elif kind == "?":
+                snapshot.untracked.add(record[2:])
+        return snapshot
+
+    def _parse_header(self, header):
+        """Parses one '# branch.*' header line"""
+        key, _, value = header.partition(" ")
+        match(key):
+            case "branch.oid":
+                self.oid = None if value == "(initial)" else value
+            case "branch.head":
+                # Mirrors 'git rev-parse --abbrev-ref HEAD' for a detached HEAD
+                self.branch = "HEAD" if value == "(detached)" else value
+            case "branch.upstream":
+                self.upstream = value
+            case "branch.ab":
+                ahead, behind = value.split(" ")
+                self.ahead = int(ahead)
+                self.behind = abs(int(behind))
+
+    def _add_change(self, xy, path):
+        """Records the staged (X) and unstaged (Y) status of a changed path"""
+        if xy[0] != ".":
+            self.staged[path] = xy[0]
+        if xy[1] != ".":
+            self.unstaged[path] = xy[1]
+
+    def replace_paths(self, paths, partial):
+        """Replaces the changes at (or below) the given paths
+            with those of a snapshot limited to the same paths"""
+        targets = set(paths)
+        prefixes = tuple(path.rstrip("/") + "/" for path in targets)
+        def is_affected(path):
+            return path in targets or path.startswith(prefixes)
+        for changes in (self.staged, self.unstaged, self.renames):
+            for path in [p for p in changes if is_affected(p)]:
+                del changes[path]
+        self.untracked = {p for p in self.untracked if not is_affected(p)}
+        self.unmerged = {p for p in self.unmerged if not is_affected(p)}
+        self.staged.update(partial.staged)
+        self.unstaged.update(partial.unstaged)
+        self.renames.update(partial.renames)
+        self.untracked |= partial.untracked
+        self.unmerged |= partial.unmerged
+        self.branch, self.oid, self.upstream = partial.branch, partial.oid, partial.upstream
+        self.ahead, self.behind = partial.ahead, partial.behind
+
+    def is_clean(self):
+        """Returns whether there are no staged, unstaged, untracked or unmerged changes"""
+        return not (self.staged or self.unstaged or self.untracked or self.unmerged)
+
+    def get_changed_paths(self):
+        """Returns every changed path (sorted), like 'git status -s -u' would list them"""
+        return sorted(set(self.staged) | set(self.unstaged) | self.untracked | self.unmerged)
+
+    def get_short_status(self):
+        """Returns the changes formatted like 'git status -s -u' (e.g. 'M  file.md')"""
+        lines = []
+        for path in self.get_changed_paths():
+            if path in self.untracked:
+                xy = "??"
+            elif path in self.unmerged:
+                xy = "UU"
+            else:
+                xy = self.staged.get(path, " ") + self.unstaged.get(path, " ")
+            if path in self.renames:
+                lines.append(f"{xy} {self.renames[path]} -> {path}")
+            else:
+                lines.append(f"{xy} {path}")
+        return lines
+
+    def to_dict(self):
+        """Returns the snapshot as a JSON-serializable dict (sets become sorted lists)"""
+        return {
+            "root": self.root,
+            "branch": self.branch,
+            "oid": self.oid,
+            "upstream": self.upstream,
+            "ahead": self.ahead,
+            "behind": self.behind,
+            "staged": dict(sorted(self.staged.items())),
+            "unstaged": dict(sorted(self.unstaged.items())),
+            "untracked": sorted(self.untracked),
+            "unmerged": sorted(self.unmerged),
+            "renames": dict(sorted(self.renames.items())),
+            "stashes": list(self.stashes),
+            "clean": self.is_clean()
+        }
+
+    def get_full_path(self, path):
+        """Returns the absolute path of a repo-relative path"""
+        return os.path.normpath(os.path.join(self.root, path))
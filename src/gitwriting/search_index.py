@@ -0,0 +1,310 @@
+"""Full-text search over the notes in the working directory (and the daily notes),
+    using an inverted index stored in SQLite and updated incrementally"""
+import os
+import re
+import math
+import sqlite3
+from array import array
+from collections import Counter
+import app_utils as app
+import commands
+
+# Files worth indexing
+TEXT_EXTENSIONS = (".md", ".markdown", ".txt", ".text", ".rst", ".org")
+# Files bigger than this are skipped (probably not notes)
+MAX_FILE_SIZE = 16 * 1024 * 1024
+MAX_RESULTS = 100
+MIN_PREFIX_LENGTH = 2
+# Files (re)indexed per segment
+SEGMENT_SIZE = 500
+# Segments are merged into one past this count
+MAX_SEGMENTS = 16
+SCHEMA_VERSION = "2"
+WORD_PATTERN = re.compile(r"\w+")
+
+def tokenize(text):
+    """Returns the (lowercase) words of a text"""
+    return WORD_PATTERN.findall(text.lower())
+
+def is_text_file(path):
+    """Returns whether a file should be indexed, based on its extension"""
+    return path.lower().endswith(TEXT_EXTENSIONS)
+
+def get_blob_ids(root):
+    """Returns repo-relative path => blob id of every file in the Git index
+        (empty outside of a repo)"""
+    result = commands.execute(["git", "ls-files", "-s", "-z"], cwd=root,
+        timeout=commands.QUERY_TIMEOUT)
+    if not result.is_success():
+        return {}
+    blobs = {}
+    for record in result.stdout.split(b"\0"):
+        if not record:
+            continue
+        # <mode> SP <object> SP <stage> TAB <path>
+        info, _, path = record.partition(b"\t")
+        blobs[os.fsdecode(path)] = info.split(b" ")[1].decode("ascii")
+    return blobs
+
+def find_text_files(top):
+    """Returns the text files under top (absolute paths), skipping hidden files & folders"""
+    files = []
+    stack = [top]
+    while stack:
+        directory = stack.pop()
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.name.startswith("."):
+                        continue
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif is_text_file(entry.name):
+                        files.append(entry.path)
+        except OSError:
+            continue
+    return files
+
+
+class SearchIndex:
+    """Maps every word to the files containing it (with the number of occurrences).
+        A file is only read again when its mtime or size changed,
+        and not even then if its Git blob id is still the indexed one.
+        Each update writes its postings as a new segment (one packed row per word),
+        so (re)indexing never rewrites the existing postings. A re-indexed file gets a new id;
+        the postings of old ids are skipped, then dropped when the segments are merged."""
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+        self.path = app.get_user_cache_resource_path("search.sqlite3", repo_root=self.root)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._db = sqlite3.connect(self.path)
+        self._db.executescript("""
+            PRAGMA journal_mode = WAL;
+            PRAGMA synchronous = NORMAL;
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+            CREATE TABLE IF NOT EXISTS files (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                path TEXT NOT NULL UNIQUE,
+                mtime INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                blob TEXT);
+            CREATE TABLE IF NOT EXISTS terms (id INTEGER PRIMARY KEY, term TEXT NOT NULL UNIQUE);
+            CREATE TABLE IF NOT EXISTS postings (
+                term_id INTEGER NOT NULL,
+                segment INTEGER NOT NULL,
+                data BLOB NOT NULL,
+                PRIMARY KEY (term_id, segment)) WITHOUT ROWID;
+            """)
+        if self.__get_meta("version") != SCHEMA_VERSION:
+            with self._db:
+                self._db.execute("DELETE FROM postings")
+                self._db.execute("DELETE FROM terms")
+                self._db.execute("DELETE FROM files")
+                self.__set_meta("version", SCHEMA_VERSION)
+                self.__set_meta("segments", "0")
+        # term => id, loaded on the first update
+        self._term_ids = None
+        self._last_term_id = 0
+        # Ids of the indexed files (postings of other ids are stale)
+        self._file_ids = None
+
+    def __get_meta(self, key):
+        """Returns a value from the meta table (or None)"""
+        row = self._db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def __set_meta(self, key, value):
+        """Sets a value in the meta table"""
+        self._db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def __get_term_ids(self, terms):
+        """Returns term => id, adding the missing terms"""
+        if self._term_ids is None:
+            self._term_ids = dict(self._db.execute("SELECT term, id FROM terms"))
+            self._last_term_id = max(self._term_ids.values(), default=0)
+        missing = [(term,) for term in terms if term not in self._term_ids]
+        if missing:
+            self._db.executemany("INSERT INTO terms (term) VALUES (?)", missing)
+            for term, term_id in self._db.execute(
+                    "SELECT term, id FROM terms WHERE id > ?", (self._last_term_id,)):
+                self._term_ids[term] = term_id
+                self._last_term_id = max(self._last_term_id, term_id)
+        return self._term_ids
+
+    def __get_file_ids(self):
+        """Returns the ids of the indexed files"""
+        if self._file_ids is None:
+            self._file_ids = {file_id for file_id, in self._db.execute("SELECT id FROM files")}
+        return self._file_ids
+
+    def __write_segment(self, postings):
+        """Stores term id => [file id, count, file id, count...] as a new segment"""
+        segment = int(self.__get_meta("segments") or 0)
+        self._db.executemany(
+            "INSERT INTO postings (term_id, segment, data) VALUES (?, ?, ?)",
+            ((term_id, segment, array("I", data).tobytes())
+                for term_id, data in sorted(postings.items())))
+        self.__set_meta("segments", str(segment + 1))
+
+    def __merge_segments(self):
+        """Rewrites every segment as one, without the postings of stale file ids"""
+        file_ids = self.__get_file_ids()
+        merged = {}
+        for term_id, data in self._db.execute("SELECT term_id, data FROM postings"):
+            values = array("I")
+            values.frombytes(data)
+            pairs = merged.setdefault(term_id, [])
+            for i in range(0, len(values), 2):
+                if values[i] in file_ids:
+                    pairs.extend(values[i:i + 2])
+        with self._db:
+            self._db.execute("DELETE FROM postings")
+            self.__set_meta("segments", "0")
+            self.__write_segment({term_id: pairs for term_id, pairs in merged.items() if pairs})
+
+    def update(self, files, progress=None):
+        """Brings the index in line with files: a list of (absolute path, blob id or None).
+            Pass a blob id only if the file is unmodified in the working tree.
+            progress(done, total) is called while (re)indexing. Returns the number of files read."""
+        indexed = {path: (file_id, mtime, size, blob) for file_id, path, mtime, size, blob
+            in self._db.execute("SELECT id, path, mtime, size, blob FROM files")}
+        changed = []
+        with self._db:
+            for path, blob in files:
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                if st.st_size > MAX_FILE_SIZE:
+                    continue
+                entry = indexed.pop(path, None)
+                if entry is not None:
+                    file_id, mtime, size, indexed_blob = entry
+                    if (mtime, size) == (st.st_mtime_ns, st.st_size):
+                        continue
+                    if blob is not None and blob == indexed_blob:
+                        # Touched (e.g. by a checkout) but the content is the same
+                        self._db.execute("UPDATE files SET mtime = ?, size = ? WHERE id = ?",
+                            (st.st_mtime_ns, st.st_size, file_id))
+                        continue
+                    indexed[path] = entry
+                changed.append((path, blob, st))
+            # Forget the files that are gone or changed (their postings become stale)
+            self._db.executemany("DELETE FROM files WHERE id = ?",
+                ((file_id,) for file_id, _, _, _ in indexed.values()))
+        self._file_ids = None
+        for start in range(0, len(changed), SEGMENT_SIZE):
+            postings = {}
+            with self._db:
+                for path, blob, st in changed[start:start + SEGMENT_SIZE]:
+                    file_id = self._db.execute(
+                        "INSERT INTO files (path, mtime, size, blob) VALUES (?, ?, ?, ?)",
+                        (path, st.st_mtime_ns, st.st_size, blob)).lastrowid
+                    try:
+                        with open(path, encoding="utf-8", errors="replace") as f:
+                            counts = Counter(tokenize(f.read()))
+                    except OSError:
+                        continue
+                    term_ids = self.__get_term_ids(counts)
+                    for term, count in counts.items():
+                        postings.setdefault(term_ids[term], []).extend((file_id, count))
+                self.__write_segment(postings)
+            if progress is not None:
+                progress(min(start + SEGMENT_SIZE, len(changed)), len(changed))
+        if int(self.__get_meta("segments") or 0) > MAX_SEGMENTS:
+            self.__merge_segments()
+        return len(changed)
+
+    def __get_postings(self, term, is_prefix=False):
+        """Returns file id => occurrences of a term (or of every term starting with it)"""
+        if is_prefix:
+            rows = self._db.execute(
+                "SELECT p.data FROM terms t JOIN postings p ON p.term_id = t.id "
+                "WHERE t.term >= ? AND t.term < ?", (term, term + "\uffff"))
+        else:
+            rows = self._db.execute(
+                "SELECT p.data FROM terms t JOIN postings p ON p.term_id = t.id "
+                "WHERE t.term = ?", (term,))
+        file_ids = self.__get_file_ids()
+        postings = {}
+        for data, in rows:
+            values = array("I")
+            values.frombytes(data)
+            for file_id, count in zip(values[0::2], values[1::2]):
+                if file_id in file_ids:
+                    postings[file_id] = postings.get(file_id, 0) + count
+        return postings
+
+    def search(self, query, limit=MAX_RESULTS):
+        """Returns the (absolute) paths of the files containing every word of the query, best first.
+            The last word also matches longer words (e.g. 'chap' matches 'chapter'),
+            if at least MIN_PREFIX_LENGTH characters long."""
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+        total = len(self.__get_file_ids())
+        scores = None
+        for i, term in enumerate(terms):
+            is_prefix = i == len(terms) - 1 and len(term) >= MIN_PREFIX_LENGTH
+            postings = self.__get_postings(term, is_prefix=is_prefix)
+            if not postings:
+                return []
+            idf = math.log(1 + total / len(postings))
+            if scores is None:
+                scores = {file_id: count * idf for file_id, count in postings.items()}
+            else:
+                scores = {file_id: score + postings[file_id] * idf
+                    for file_id, score in scores.items() if file_id in postings}
+            if not scores:
+                return []
+        best = sorted(scores, key=scores.get, reverse=True)[:limit]
+        paths = dict(self._db.execute(
+            f"SELECT id, path FROM files WHERE id IN ({','.join('?' * len(best))})", best))
+        return [paths[file_id] for file_id in best]
+
+    def close(self):
+        """Closes the index file"""
+        self._db.close()
+
+
+def get_snippet(path, query, max_length=80):
+    """Returns the first line of a file containing a word of the query (trimmed), or ''"""
+    terms = tokenize(query)
+    try:
+        with open(path, encoding="utf-8", errors="replace") as f:
+            for line in f:
+                lowered = line.lower()
+                if any(term in lowered for term in terms):
+                    return " ".join(line.split())[:max_length]
+    except OSError:
+        pass
+    return ""
+
+
+def get_files_to_index(root, files, modified=(), extra_dirs=()):
+    """Returns (absolute path, blob id or None) for each text file to index.
+        files: the root-relative files of the working directory (see FileIndex),
+        modified: the absolute paths of the files changed in the working tree (no blob id used),
+        extra_dirs: other folders to search (e.g. the daily notes)"""
+    blobs = get_blob_ids(root)
+    modified = set(modified)
+    results = {}
+    for path in files:
+        if is_text_file(path):
+            full_path = os.path.normpath(os.path.join(root, path))
+            results[full_path] = None if full_path in modified else blobs.get(path)
+    for directory in extra_dirs:
+        if os.path.isdir(directory):
+            for path in find_text_files(directory):
+                results.setdefault(os.path.normpath(path), None)
+    return list(results.items())
+
+
+__indexes = {}
+
+def get_search_index(root):
+    """Returns the (shared) search index of a folder"""
+    root = os.path.abspath(root)
+    if root not in __indexes:
+        __indexes[root] = SearchIndex(root)
+    return __indexes[root]
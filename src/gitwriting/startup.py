@@ -0,0 +1,26 @@
+"""Times the phases of the app's startup (see the --startup-report launch option)"""
+import time
+
+class StartupTimer:
+    """Records how long each startup phase took, from start (a time.perf_counter() value)"""
+    def __init__(self, start=None):
+        self.start = time.perf_counter() if start is None else start
+        self.phases = []
+        self._last = self.start
+
+    def mark(self, name):
+        """Ends a phase: the time since the previous mark (or the start) is counted as name"""
+        now = time.perf_counter()
+        self.phases.append((name, now - self._last))
+        self._last = now
+
+    def get_total(self):
+        """Returns the seconds from the start to the last mark"""
+        return self._last - self.start
+
+    def show(self):
+        """Prints the time spent in each phase"""
+        print("\n[Startup Report]:")
+        for name, seconds in self.phases:
+            print(f"{name:<24}{seconds * 1000:>8.1f} ms")
+        print(f"{'Total (first menu)':<24}{self.get_total() * 1000:>8.1f} ms")
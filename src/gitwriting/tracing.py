@@ -0,0 +1,287 @@
+"""Records what the app does (see the --trace launch option): menu actions, picker sessions,
+    commands, config & file history reads/writes, as spans in Chrome's trace-event JSON format
+    (open it in chrome://tracing or https://ui.perfetto.dev), then prints a summary on exit.
+    The hooks are only installed when tracing starts, so they cost nothing otherwise."""
+import os
+import sys
+import json
+import time
+import atexit
+import functools
+import threading
+from contextlib import redirect_stdout
+import app_utils as app
+
+# Rows of each "slowest" list in the summary
+SLOWEST_SHOWN = 10
+# The menu process spawns are counted against before the first menu shows
+STARTUP = "(startup)"
+# Spawned from another thread than the main one (e.g. the background fetch)
+BACKGROUND = "(background)"
+
+class Tracer:
+    """The spans & counters of a session, written to path as trace events"""
+    def __init__(self, path):
+        self.path = path
+        self.start = time.perf_counter()
+        self.pid = os.getpid()
+        self.events = []
+        # Thread id => name
+        self.threads = {}
+        # Menu title => [renders, process spawns]; the spawns count against the last rendered
+        self.menus = {STARTUP: [0, 0]}
+        self.menu = STARTUP
+        # Cache name => [hits, misses]
+        self.caches = {}
+        # Seconds spent waiting for the user (in menus & pickers), on the main thread
+        self.waited = 0
+        self._lock = threading.Lock()
+
+    def __get_timestamp(self, seconds):
+        """Returns a time.perf_counter() value as microseconds since the start"""
+        return round((seconds - self.start) * 1_000_000, 1)
+
+    def __add_event(self, event):
+        """Adds a trace event, on the current thread"""
+        thread = threading.current_thread()
+        event["pid"] = self.pid
+        event["tid"] = thread.ident
+        with self._lock:
+            self.threads.setdefault(thread.ident, thread.name)
+            self.events.append(event)
+
+    def add_span(self, name, category, start, end, args=None, waited=0):
+        """Records a span (a 'complete' event) from start to end (time.perf_counter() values).
+            waited: the seconds of it spent waiting for the user."""
+        event = {"name": name, "cat": category, "ph": "X",
+            "ts": self.__get_timestamp(start), "dur": round((end - start) * 1_000_000, 1)}
+        if waited:
+            args = dict(args or {}, **{"input wait ms": round(waited * 1000, 1)})
+        if args:
+            event["args"] = args
+        self.__add_event(event)
+
+    def add_instant(self, name, category, args=None):
+        """Records an instant event, now"""
+        event = {"name": name, "cat": category, "ph": "i", "s": "t",
+            "ts": self.__get_timestamp(time.perf_counter())}
+        if args:
+            event["args"] = args
+        self.__add_event(event)
+
+    def count_render(self, title):
+        """Counts a menu render. Process spawns count against this menu until the next one."""
+        with self._lock:
+            self.menus.setdefault(title, [0, 0])[0] += 1
+            self.menu = title
+
+    def count_spawn(self, argv):
+        """Counts a process spawn (against the current menu, unless in the background)"""
+        is_main = threading.current_thread() is threading.main_thread()
+        with self._lock:
+            self.menus.setdefault(self.menu if is_main else BACKGROUND, [0, 0])[1] += 1
+        self.add_instant(f"spawn {argv[0] if argv else ''}", "process",
+            {"argv": [str(arg) for arg in argv]})
+
+    def count_cache(self, name, is_hit):
+        """Counts a cache lookup"""
+        with self._lock:
+            self.caches.setdefault(name, [0, 0])[0 if is_hit else 1] += 1
+
+    def write(self):
+        """Writes the trace file. Returns whether it was written."""
+        with self._lock:
+            events = [{"name": "thread_name", "ph": "M", "pid": self.pid, "tid": ident,
+                "args": {"name": name}} for ident, name in self.threads.items()] + self.events
+        try:
+            with open(self.path, "w", encoding="utf-8") as f:
+                json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+            return True
+        except OSError as e:
+            app.print_error(f"Failed to write the trace to '{self.path}'. {e}")
+            return False
+
+    def __get_slowest(self, categories):
+        """Returns the slowest spans of some categories, as (ms, name),
+            not counting the time spent waiting for the user (nor the interactive spans)"""
+        spans = [(event["dur"] / 1000 - event.get("args", {}).get("input wait ms", 0),
+            event["name"]) for event in self.events
+            if event["ph"] == "X" and event["cat"] in categories
+            and not event.get("args", {}).get("interactive")]
+        return sorted(spans, reverse=True)[:SLOWEST_SHOWN]
+
+    def show_summary(self):
+        """Prints the counters: process spawns per menu render, cache hit rates & slowest spans"""
+        print(f"\n[Trace Summary]: {len(self.events):,} events in '{self.path}'")
+        total = sum(spawns for _, spawns in self.menus.values())
+        print(f"Process spawns: {total:,}")
+        for title, (renders, spawns) in self.menus.items():
+            if not renders and not spawns:
+                continue
+            per_render = f" {spawns / renders:>6.1f} per render" if renders else ""
+            print(f"  {title[:32]:<32}{renders:>6,} renders{spawns:>7,} spawns{per_render}")
+        if self.caches:
+            print("Cache hit rates:")
+            for name, (hits, misses) in sorted(self.caches.items()):
+                print(f"  {name:<32}{hits:>6,} / {hits + misses:<6,} "
+                    f"{100 * hits / (hits + misses):>5.1f}%")
+        for label, categories in (("Slowest actions (not waiting for input)", ("menu", "picker")),
+                ("Slowest commands", ("command",))):
+            slowest = self.__get_slowest(categories)
+            if slowest:
+                print(f"{label}:")
+                for ms, name in slowest:
+                    print(f"  {ms:>10.1f} ms  {name[:80]}")
+
+
+__tracer = None
+
+def is_enabled():
+    """Returns whether the session is traced"""
+    return __tracer is not None
+
+def count_cache(name, is_hit):
+    """Counts a cache lookup (only when tracing)"""
+    if __tracer is not None:
+        __tracer.count_cache(name, is_hit)
+
+def start(path):
+    """Starts tracing the session to path. The trace is written (and summed up) on exit."""
+    global __tracer
+    if __tracer is not None:
+        return
+    __tracer = Tracer(os.path.abspath(path))
+    __install_hooks()
+    atexit.register(__stop)
+
+def __stop():
+    """Writes the trace and prints the summary, on stderr (stdout may be parsed, e.g. --json)"""
+    with redirect_stdout(sys.stderr):
+        if __tracer.write():
+            __tracer.show_summary()
+
+def __patch(owner, name, make_wrapper):
+    """Replaces owner.name (a function or method) by make_wrapper(original)"""
+    original = getattr(owner, name)
+    setattr(owner, name, functools.wraps(original)(make_wrapper(original)))
+
+def __span(category, get_name, get_args=None, is_interactive=False):
+    """Returns a wrapper maker timing each call as a span.
+        get_name / get_args take the call's arguments (get_args also gets the result last).
+        is_interactive: the whole call counts as waiting for the user (e.g. a picker),
+            or a function of the call's arguments telling whether it does."""
+    def make_wrapper(function):
+        def wrapper(*args, **kwargs):
+            interactive = (is_interactive(*args, **kwargs) if callable(is_interactive)
+                else is_interactive)
+            start = time.perf_counter()
+            waited = __tracer.waited
+            result = None
+            try:
+                result = function(*args, **kwargs)
+                return result
+            finally:
+                end = time.perf_counter()
+                if interactive:
+                    __wait(end - start)
+                __tracer.add_span(get_name(*args, **kwargs), category, start, end,
+                    get_args(*args, result, **kwargs) if get_args else None,
+                    waited=__tracer.waited - waited)
+        return wrapper
+    return make_wrapper
+
+def __wait(seconds):
+    """Counts time spent waiting for the user (on the main thread)"""
+    if threading.current_thread() is threading.main_thread():
+        __tracer.waited += seconds
+
+def __get_command_name(argv, *_, **__):
+    """Returns the span name of an execute() call: the start of the command"""
+    return " ".join(str(arg) for arg in argv[:3])
+
+def __is_interactive_command(_argv, capture=True, *_, **__):
+    """Returns whether an execute() call uses the terminal (its time is the user's)"""
+    return not capture
+
+def __get_command_args(argv, *args, **kwargs):
+    """Returns the span arguments of an execute() call (its result is the last argument)"""
+    result = args[-1]
+    interactive = __is_interactive_command(argv, *args[:-1], **kwargs)
+    if result is None:
+        return {"argv": [str(arg) for arg in argv], "interactive": interactive}
+    return {"argv": result.argv, "returncode": result.returncode,
+        "stdout bytes": len(result.stdout), "stderr bytes": len(result.stderr.encode()),
+        "timed out": result.is_timed_out, "cancelled": result.is_cancelled,
+        "interactive": interactive}
+
+def __get_picker_name(picker, *_, **__):
+    """Returns the span name of a picker session"""
+    return f"{type(picker).__name__}: {getattr(picker, 'title', None) or '-'}"
+
+def __install_hooks():
+    """Wraps the traced functions (imported here: tracing is rare, and the TUI needs them anyway)"""
+    import subprocess
+    import calendar_picker
+    import commands
+    import config
+    import diff_viewer
+    import history
+    import menu
+    import picker
+    import pickers
+    # Process spawns, by anything (the execute() spans below have the details)
+    def make_init(original):
+        def init(self, *args, **kwargs):
+            argv = args[0] if args else kwargs.get("args", ())
+            __tracer.count_spawn([argv] if isinstance(argv, (str, bytes)) else list(argv))
+            original(self, *args, **kwargs)
+        return init
+    __patch(subprocess.Popen, "__init__", make_init)
+    # Every command of the app (see commands.execute)
+    # (those using the terminal count as waiting for the user, e.g. an editor)
+    __patch(commands, "execute", __span("command", __get_command_name, __get_command_args,
+        is_interactive=__is_interactive_command))
+    # Menus: renders, actions, and the refresh after each action (post_action)
+    def make_render(original):
+        def render(self):
+            __tracer.count_render(self.title)
+            original(self)
+        return render
+    __patch(menu.Menu, "render", make_render)
+    def make_readkey(original):
+        def readkey(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                __wait(time.perf_counter() - start)
+        return readkey
+    __patch(app, "readkey", make_readkey)
+    __patch(menu.Menu, "run_option", __span("menu",
+        lambda self, key: f"{self.title}: {self.options[key][0]}"))
+    def make_show(original):
+        def show(self, post_action=None):
+            if post_action is not None:
+                post_action = __span("menu", lambda: f"{self.title}: refresh")(post_action)
+            return original(self, post_action)
+        return show
+    __patch(menu.Menu, "show", make_show)
+    # Picker sessions
+    __patch(picker.Picker, "start", __span("picker", __get_picker_name, is_interactive=True))
+    __patch(pickers.DataPicker, "show", __span("picker", __get_picker_name))
+    __patch(pickers.DataPicker, "show_paginated", __span("picker", __get_picker_name))
+    __patch(pickers.FileBrowser, "show", __span("picker",
+        lambda self: f"FileBrowser: {self.start_path}"))
+    __patch(calendar_picker.CalendarPicker, "show", __span("picker", __get_picker_name,
+        is_interactive=True))
+    __patch(diff_viewer.DiffViewer, "show", __span("picker", __get_picker_name,
+        is_interactive=True))
+    # Config & file history
+    get_path = lambda store, *_, **__: {"path": getattr(store, "_path", None) or store.path}
+    __patch(config.Config, "read", __span("config", lambda self: "Config.read", get_path))
+    __patch(config.Config, "save", __span("config", lambda self, *_, **__: "Config.save",
+        get_path))
+    __patch(history, "read", __span("history", lambda *_, **__: "history.read",
+        lambda *args, **_: {"files": len(args[-1] or ())}))
+    __patch(history.HistoryStore, "save", __span("history", lambda self: "history.save",
+        get_path))
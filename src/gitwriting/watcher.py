@@ -0,0 +1,194 @@
+"""Watches a working tree for changes, so cached Git status can be reused when nothing changed.
+    Uses inotify on Linux (via ctypes) and falls back to an mtime scan everywhere else."""
+import ctypes
+import ctypes.util
+import os
+import struct
+import sys
+import threading
+
+# inotify(7) constants
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_EXCL_UNLINK = 0x04000000
+IN_ISDIR = 0x40000000
+WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO
+    | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR | IN_EXCL_UNLINK)
+EVENT_HEADER = struct.Struct("iIII")
+
+# Folders that never affect the working tree status
+SKIPPED_DIRS = (".git",)
+
+class Watcher:
+    """Base watcher. collect_changes() returns the set of changed paths (relative to root)
+        since the previous call, or None if the changes are unknown (refresh everything)."""
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+
+    def start(self):
+        """Starts watching"""
+
+    def collect_changes(self):
+        """Returns (and forgets) the changed paths since the last call, or None if unknown"""
+        return None
+
+    def close(self):
+        """Stops watching"""
+
+    def _relative(self, path):
+        """Returns a root-relative path using '/' separators (Git's pathspec format)"""
+        return os.path.relpath(path, self.root).replace(os.sep, "/")
+
+    def _walk_directories(self, top):
+        """Yields every directory under top (including top), skipping the Git dir"""
+        stack = [top]
+        while stack:
+            path = stack.pop()
+            yield path
+            try:
+                with os.scandir(path) as entries:
+                    for entry in entries:
+                        if entry.is_dir(follow_symlinks=False) and entry.name not in SKIPPED_DIRS:
+                            stack.append(entry.path)
+            except OSError:
+                continue
+
+
+class InotifyWatcher(Watcher):
+    """Linux watcher using one inotify watch per directory.
+        Watches are added in a background thread; changes are unknown until it finishes."""
+    def __init__(self, root):
+        super().__init__(root)
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._fd = -1
+        self._dirs = {}
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._overflowed = False
+
+    def start(self):
+        self._fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        threading.Thread(target=self._add_tree, args=(self.root, True), daemon=True).start()
+
+    def _add_tree(self, top, is_initial=False):
+        """Adds a watch for every directory under top"""
+        for path in self._walk_directories(top):
+            wd = self._libc.inotify_add_watch(self._fd, os.fsencode(path), WATCH_MASK)
+            if wd < 0:
+                # Usually ENOSPC (fs.inotify.max_user_watches reached).
+                # Never trust the watches again.
+                self._overflowed = True
+                continue
+            with self._lock:
+                self._dirs[wd] = path
+        if is_initial:
+            self._ready.set()
+
+    def _read_events(self):
+        """Drains the inotify queue, returning the changed absolute paths"""
+        changed = set()
+        while True:
+            try:
+                buffer = os.read(self._fd, 65536)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len(buffer):
+                wd, mask, _, length = EVENT_HEADER.unpack_from(buffer, offset)
+                offset += EVENT_HEADER.size
+                name = buffer[offset:offset + length].rstrip(b"\0")
+                offset += length
+                if mask & IN_Q_OVERFLOW:
+                    self._overflowed = True
+                    continue
+                with self._lock:
+                    directory = self._dirs.get(wd)
+                    if mask & IN_IGNORED:
+                        self._dirs.pop(wd, None)
+                if directory is None:
+                    continue
+                path = os.path.join(directory, os.fsdecode(name)) if name else directory
+                if os.path.basename(path) in SKIPPED_DIRS:
+                    continue
+                changed.add(path)
+                if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+                    # Watch the new folder (the whole folder is reported as changed)
+                    self._add_tree(path)
+        return changed
+
+    def collect_changes(self):
+        if self._fd < 0 or not self._ready.is_set():
+            return None
+        changed = self._read_events()
+        if self._overflowed:
+            return None
+        return {self._relative(path) for path in changed}
+
+    def close(self):
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+
+class PollingWatcher(Watcher):
+    """Portable watcher comparing the (mtime, size) of every file between calls"""
+    def __init__(self, root):
+        super().__init__(root)
+        self._stats = None
+
+    def _scan(self):
+        """Returns path => (mtime, size) for every entry in the working tree"""
+        stats = {}
+        for directory in self._walk_directories(self.root):
+            try:
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        if entry.name in SKIPPED_DIRS:
+                            continue
+                        try:
+                            st = entry.stat(follow_symlinks=False)
+                        except OSError:
+                            continue
+                        stats[entry.path] = (st.st_mtime_ns, st.st_size, st.st_mode)
+            except OSError:
+                continue
+        return stats
+
+    def start(self):
+        self._stats = self._scan()
+
+    def collect_changes(self):
+        if self._stats is None:
+            return None
+        stats = self._scan()
+        previous = self._stats
+        self._stats = stats
+        changed = {path for path, stat in stats.items() if previous.get(path) != stat}
+        changed.update(path for path in previous if path not in stats)
+        return {self._relative(path) for path in changed}
+
+
+def create_watcher(root):
+    """Returns a started watcher for the working tree at root (inotify if available)"""
+    if sys.platform.startswith("linux"):
+        try:
+            watcher = InotifyWatcher(root)
+            watcher.start()
+            return watcher
+        except (OSError, AttributeError):
+            pass
+    watcher = PollingWatcher(root)
+    watcher.start()
+    return watcher
@@ -0,0 +1,241 @@
+"""A persistent, incrementally updated history of the words written per commit & per file
+    (one SQLite file per repo). Each blob's words are counted once, whatever its history."""
+import os
+import time
+import sqlite3
+import subprocess
+import app_utils as app
+import commands
+import git_workers
+from diff_stats import count_words, is_binary
+
+# One record per commit: oid, author date (unix time) & subject, then its raw changes
+# (':<old mode> <new mode> <old blob> <new blob> <status>\0<path>\0' each)
+LOG_COMMAND = ["git", "log", "-z", "--raw", "--no-abbrev", "--no-renames",
+    "--format=%x1e%H%x1f%at%x1f%s"]
+# Submodules (their 'blob' is a commit of another repo)
+GITLINK_MODE = "160000"
+READ_SIZE = 256 * 1024
+SCHEMA_VERSION = "2"
+
+class WordHistory:
+    """Words added or removed (net) by each commit of a branch, per file and per day.
+        Only commits added since the last indexed HEAD are read from Git on update,
+        and only blobs never seen before (in any branch) are read and counted."""
+    def __init__(self, git_cmd, root, branch):
+        self.git_cmd = git_cmd
+        self.root = root
+        self.branch = branch
+        self.path = app.get_user_cache_resource_path("words.sqlite3", repo_root=root)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._db = sqlite3.connect(self.path)
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+            CREATE TABLE IF NOT EXISTS blobs (oid TEXT PRIMARY KEY, words INTEGER NOT NULL)
+                WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS commits (
+                branch TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+                oid TEXT NOT NULL,
+                date INTEGER NOT NULL,
+                subject TEXT NOT NULL,
+                words INTEGER NOT NULL,
+                PRIMARY KEY (branch, seq));
+            CREATE TABLE IF NOT EXISTS changes (
+                branch TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+                path TEXT NOT NULL,
+                words INTEGER NOT NULL);
+            CREATE INDEX IF NOT EXISTS changes_by_commit ON changes (branch, seq);
+            CREATE INDEX IF NOT EXISTS changes_by_path ON changes (branch, path);
+            CREATE TABLE IF NOT EXISTS days (
+                branch TEXT NOT NULL,
+                day TEXT NOT NULL,
+                words INTEGER NOT NULL,
+                commits INTEGER NOT NULL,
+                PRIMARY KEY (branch, day));
+            """)
+        if self.__get_meta("version") != SCHEMA_VERSION:
+            with self._db:
+                for table in ("meta", "blobs", "commits", "changes", "days"):
+                    self._db.execute(f"DELETE FROM {table}")
+                self.__set_meta("version", SCHEMA_VERSION)
+
+    def __get_meta(self, key):
+        """Returns a value from the meta table (or None)"""
+        row = self._db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def __set_meta(self, key, value):
+        """Sets a value in the meta table"""
+        self._db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def __clear(self):
+        """Forgets the branch's commits (the blob word counts stay valid)"""
+        self._db.execute("DELETE FROM commits WHERE branch = ?", (self.branch,))
+        self._db.execute("DELETE FROM changes WHERE branch = ?", (self.branch,))
+        self._db.execute("DELETE FROM days WHERE branch = ?", (self.branch,))
+        self._db.execute("DELETE FROM meta WHERE key = ?", (f"head:{self.branch}",))
+
+    def __stream_log(self, revision_range):
+        """Yields (oid, date, subject, [(path, old blob, new blob)]) per commit, newest first"""
+        with subprocess.Popen(LOG_COMMAND + [revision_range, "--"], cwd=self.root,
+                stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL) as proc:
+            partial = b""
+            while True:
+                data = proc.stdout.read1(READ_SIZE)
+                records = (partial + data).split(b"\x1e")
+                partial = records.pop() if data else b""
+                for record in records:
+                    if record:
+                        yield self.__parse_commit(record)
+                if not data:
+                    break
+
+    @staticmethod
+    def __parse_commit(record):
+        """Parses one commit of the log (see LOG_COMMAND)"""
+        fields = record.decode("utf-8", errors="replace").split("\0")
+        oid, date, subject = fields[0].split("\x1f", 2)
+        blobs = []
+        for i in range(1, len(fields) - 1, 2):
+            # ':<old mode> <new mode> <old blob> <new blob> <status>'
+            modes_and_blobs = fields[i].lstrip("\n").lstrip(":").split(" ")
+            if len(modes_and_blobs) != 5 or GITLINK_MODE in modes_and_blobs[:2]:
+                continue
+            _, _, old, new, _ = modes_and_blobs
+            blobs.append((fields[i + 1], old, new))
+        return oid, int(date or 0), subject, blobs
+
+    def __count_blobs(self, oids):
+        """Counts (and stores) the words of the blobs not counted yet. Returns {oid: words}."""
+        # Skipping the null oid (of an added or deleted file's missing side)
+        oids = {oid for oid in oids if oid.strip("0")}
+        words = {}
+        pending = list(oids)
+        # Blobs already counted (by any branch)
+        for i in range(0, len(pending), 500):
+            batch = pending[i:i + 500]
+            rows = self._db.execute("SELECT oid, words FROM blobs WHERE oid IN "
+                f"({','.join('?' * len(batch))})", batch)
+            words.update(rows)
+        missing = [oid for oid in pending if oid not in words]
+        if missing:
+            worker, is_shared = self.__get_cat_file_worker()
+            try:
+                for oid in missing:
+                    result = worker.query(oid)
+                    content = result[3] if result else None
+                    words[oid] = 0 if content is None or is_binary(content) else (
+                        count_words(content))
+            finally:
+                if not is_shared:
+                    worker.close()
+            self._db.executemany("INSERT OR REPLACE INTO blobs (oid, words) VALUES (?, ?)",
+                ((oid, words[oid]) for oid in missing))
+        return words
+
+    def __get_cat_file_worker(self):
+        """Returns ('git cat-file --batch' helper, whether it's shared with the app)"""
+        backend = self.git_cmd.backend
+        if backend is not None:
+            worker = backend.get_worker("--batch", cwd=self.root)
+            if worker is not None:
+                return worker, True
+        return git_workers.CatFileWorker(mode="--batch", cwd=self.root), False
+
+    def __is_ancestor(self, old, new):
+        """Returns whether commit old is reachable from commit new"""
+        result = commands.execute(["git", "merge-base", "--is-ancestor", old, new],
+            cwd=self.root, timeout=commands.QUERY_TIMEOUT)
+        return result.is_success()
+
+    def update(self):
+        """Ingests the commits added since the last update. Returns the number of new commits."""
+        head = self.git_cmd.resolve_object("HEAD")
+        head_key = f"head:{self.branch}"
+        indexed_head = self.__get_meta(head_key)
+        if head == indexed_head:
+            return 0
+        with self._db:
+            if head is None:
+                self.__clear()
+                return 0
+            if indexed_head and self.__is_ancestor(indexed_head, head):
+                commits = list(self.__stream_log(f"{indexed_head}..{head}"))
+                top = self._db.execute("SELECT COALESCE(MAX(seq), 0) FROM commits "
+                    "WHERE branch = ?", (self.branch,)).fetchone()[0]
+            else:
+                # First run, or the history was rewritten (rebase, reset, amend...)
+                self.__clear()
+                commits = list(self.__stream_log(head))
+                top = 0
+            words = self.__count_blobs(blob for commit in commits
+                for _, old, new in commit[3] for blob in (old, new))
+            # Newer commits get higher sequence numbers, so 'ORDER BY seq DESC' is newest first
+            commit_rows = []
+            change_rows = []
+            for i, (oid, date, subject, blobs) in enumerate(commits):
+                seq = top + len(commits) - i
+                total = 0
+                for path, old, new in blobs:
+                    delta = words.get(new, 0) - words.get(old, 0)
+                    if delta:
+                        change_rows.append((self.branch, seq, path, delta))
+                        total += delta
+                commit_rows.append((self.branch, seq, oid, date, subject, total))
+            self._db.executemany("INSERT OR REPLACE INTO commits "
+                "(branch, seq, oid, date, subject, words) VALUES (?, ?, ?, ?, ?, ?)", commit_rows)
+            self._db.executemany("INSERT INTO changes (branch, seq, path, words) "
+                "VALUES (?, ?, ?, ?)", change_rows)
+            self.__add_days(commit_rows)
+            self.__set_meta(head_key, head)
+        return len(commit_rows)
+
+    def __add_days(self, commit_rows):
+        """Adds the words & count of new commits to the totals of their (local) author day"""
+        days = {}
+        for _, _, _, date, _, words in commit_rows:
+            day = time.strftime("%Y-%m-%d", time.localtime(date))
+            day_words, day_commits = days.get(day, (0, 0))
+            days[day] = (day_words + words, day_commits + 1)
+        self._db.executemany("INSERT INTO days (branch, day, words, commits) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (branch, day) DO UPDATE SET words = words + excluded.words, "
+            "commits = commits + excluded.commits",
+            ((self.branch, day, words, commits) for day, (words, commits) in days.items()))
+
+    def get_daily_words(self, since=None):
+        """Returns {day (YYYY-MM-DD): net words} of the days with commits (since day, if given)"""
+        return dict(self._db.execute("SELECT day, words FROM days WHERE branch = ? AND day >= ?",
+            (self.branch, since or "")))
+
+    def get_commit_deltas(self, index=0, limit=-1):
+        """Returns up to limit commits as (oid, date, subject, net words), newest first"""
+        return self._db.execute(
+            "SELECT oid, date, subject, words FROM commits WHERE branch = ? "
+            "ORDER BY seq DESC LIMIT ? OFFSET ?", (self.branch, limit, index)).fetchall()
+
+    def get_file_deltas(self, limit=-1):
+        """Returns up to limit files as (path, net words), most words written first"""
+        return self._db.execute(
+            "SELECT path, SUM(words) AS total FROM changes WHERE branch = ? "
+            "GROUP BY path ORDER BY total DESC, path LIMIT ?", (self.branch, limit)).fetchall()
+
+    def get_file_history(self, path, limit=-1):
+        """Returns up to limit commits changing a file's words as (oid, date, net words),
+            newest first"""
+        return self._db.execute(
+            "SELECT commits.oid, commits.date, changes.words FROM changes "
+            "JOIN commits ON commits.branch = changes.branch AND commits.seq = changes.seq "
+            "WHERE changes.branch = ? AND changes.path = ? "
+            "ORDER BY changes.seq DESC LIMIT ?", (self.branch, path, limit)).fetchall()
+
+    def get_total(self):
+        """Returns the net words of the whole history (the words at HEAD)"""
+        return self._db.execute("SELECT COALESCE(SUM(words), 0) FROM commits WHERE branch = ?",
+            (self.branch,)).fetchone()[0]
+
+    def close(self):
+        """Closes the history file"""
+        self._db.close()
@@ -0,0 +1,109 @@
+"""Runs Git operations (status, fetch, pull) on every repo of the workspace at once,
+    on a bounded thread pool, yielding each repo's result as soon as it's done"""
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import Optional
+import commands
+import git_workers
+from repo_snapshot import RepoSnapshot, STATUS_COMMAND
+
+# Repos processed at the same time, unless configured
+# (mostly waiting on the network: enough for a typical workspace to run in one go)
+DEFAULT_JOBS = 32
+# Seconds before giving up on a repo
+TIMEOUTS = {"status": 30, "fetch": 120, "pull": 120}
+OPERATIONS = tuple(TIMEOUTS)
+
+@dataclass
+class RepoResult:
+    """The outcome of an operation on one repo"""
+    path: str
+    operation: str
+    is_success: bool
+    # Error message (if any)
+    message: str = ""
+    # The repo's status after the operation (if it succeeded)
+    snapshot: Optional[RepoSnapshot] = None
+    seconds: float = 0.0
+
+    def get_name(self):
+        """Returns the repo's folder name"""
+        return os.path.basename(os.path.normpath(self.path))
+
+    def get_summary(self):
+        """Returns a one-line summary: branch, ahead/behind and changes (or the error)"""
+        if not self.is_success:
+            return self.message
+        snapshot = self.snapshot
+        parts = [snapshot.branch or "(detached)"]
+        if snapshot.upstream:
+            parts.append(f"\u2191{snapshot.ahead} \u2193{snapshot.behind}")
+        changes = len(snapshot.get_changed_paths())
+        parts.append(f"{changes} change{'' if changes == 1 else 's'}" if changes else "clean")
+        return ", ".join(parts)
+
+    def to_dict(self):
+        """Returns the result as a JSON-serializable dict"""
+        return {
+            "path": self.path,
+            "operation": self.operation,
+            "success": self.is_success,
+            "message": self.message,
+            "seconds": round(self.seconds, 3),
+            "status": self.snapshot.to_dict() if self.snapshot is not None else None
+        }
+
+
+def __run_git(path, args, timeout):
+    """Runs a Git command in a repo. Returns its output, or raises RuntimeError with its error."""
+    result = commands.execute(["git", *args], cwd=path, env=git_workers.get_batch_env(),
+        timeout=timeout)
+    if result.is_timed_out:
+        raise RuntimeError(f"'git {args[0]}' timed out after {timeout}s")
+    if result.error:
+        raise RuntimeError(result.error)
+    if not result.is_success():
+        raise RuntimeError(
+            git_workers.get_error_message(result.stderr, f"'git {args[0]}' failed"))
+    return result.get_text()
+
+def run_operation(path, operation):
+    """Runs an operation (see OPERATIONS) on one repo, followed by a status. Never raises."""
+    start = time.perf_counter()
+    timeout = TIMEOUTS[operation]
+    try:
+        if not os.path.isdir(path):
+            raise RuntimeError("Folder not found")
+        if operation == "fetch":
+            __run_git(path, ["fetch", "--quiet"], timeout)
+        elif operation == "pull":
+            # Only fast-forwards: a merge (or a conflict) needs the user's attention
+            __run_git(path, ["pull", "--ff-only", "--quiet"], timeout)
+        status = __run_git(path, STATUS_COMMAND[1:], TIMEOUTS["status"])
+        snapshot = RepoSnapshot.parse(path, status)
+        return RepoResult(path, operation, True, snapshot=snapshot,
+            seconds=time.perf_counter() - start)
+    except RuntimeError as e:
+        return RepoResult(path, operation, False, message=str(e),
+            seconds=time.perf_counter() - start)
+
+
+class Workspace:
+    """A set of repos (paths), processed jobs at a time"""
+    def __init__(self, repos, jobs=DEFAULT_JOBS):
+        self.repos = list(repos)
+        self.jobs = max(1, jobs or DEFAULT_JOBS)
+
+    def run(self, operation):
+        """Runs an operation on every repo. Yields each RepoResult as soon as it's ready
+            (the slowest repo comes last, the total time is about the slowest repo's)."""
+        if operation not in OPERATIONS:
+            raise ValueError(f"Unknown workspace operation '{operation}'")
+        if not self.repos:
+            return
+        with ThreadPoolExecutor(max_workers=min(self.jobs, len(self.repos))) as pool:
+            futures = [pool.submit(run_operation, path, operation) for path in self.repos]
+            for future in as_completed(futures):
+                yield future.result()